@@ -1,116 +1,109 @@
-from locale import currency
-import os
 
-from flask import Flask, render_template, request, flash, redirect, session, g, abort
-from flask_debugtoolbar import DebugToolbarExtension
-from numpy import nanmax
+from flask import Blueprint, Flask, current_app, render_template, request, flash, redirect, session, g, abort, jsonify
+from flask_migrate import Migrate
 from sqlalchemy.exc import IntegrityError
-from sympy import preview
-from time import sleep
-from threading import Timer
-from datetime import datetime, timedelta
+import time
 import html
 
+from auth import user_contexts
+from config import get_config
 from forms import UserAddForm, LoginForm, EditUserForm
-from models import db, connect_db, User, Organization, SavedOrgs, Animal, SavedAnimals
-import requests
+from models import db, connect_db, User
+from petfinder import petfinder_client, petfinder_cache, petfinder_quota, PetfinderError
+from quota import QuotaExhausted
+from taxonomy import taxonomy
+import http_cache
+from http_cache import render_conditional
+from images import image_proxy
+import fragments
+import details
+import metrics
+import sessions
+from details import animal_store, organization_store
+from hydrate import hydrate_animals, hydrate_organizations
+from likes import animal_likes_for, org_likes_for, like_counts, user_with_liked_animals, user_with_liked_orgs
+from likes import save_animal, save_org, save_animals, save_orgs, forget_saves
+from likes import clean_animal_id, clean_org_id
+from mirror import mirror_animals, mirror_organizations, parse_time
+from pagination import Page
+from passwords import password_hasher, login_throttle, HasherBusy
+from popularity import leaderboard
 
 CURR_USER_KEY = "curr_user"
+USER_VERSION_KEY = "user_v"
+PER_PAGE = 42
 
-app = Flask(__name__)
+bp = Blueprint("pets", __name__)
+migrate = Migrate()
 
-# Get DB_URI from environ variable (useful for production/testing) or,
-# if not set there, use development local db.
-app.config["SQLALCHEMY_DATABASE_URI"] = os.environ.get(
-    "DATABASE_URL", "postgresql:///adopt_a_pet"
-)
 
-app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
-app.config["SQLALCHEMY_ECHO"] = False
-app.config["DEBUG_TB_INTERCEPT_REDIRECTS"] = False
-app.config["SECRET_KEY"] = os.environ.get("SECRET_KEY", "it's a secret")
-app.config['PERMANENT_SESSION_LIFETIME'] = timedelta(minutes=60)
+def create_app(config=None):
+    """Build the app.
 
-toolbar = DebugToolbarExtension(app)
-
-connect_db(app)
+    `config` is a class from config.py, or its name ("development",
+    "production"); by default FLASK_ENV decides.
+    """
 
+    app = Flask(__name__)
+    app.config.from_object(get_config(config))
 
+    if app.config["DEBUG_TB_ENABLED"]:
+        # Only imported where it is used, to keep production workers small
+        from flask_debugtoolbar import DebugToolbarExtension
+        DebugToolbarExtension(app)
 
+    connect_db(app)
+    migrate.init_app(app, db)
+    taxonomy.init_app(app)
+    password_hasher.init_app(app)
+    http_cache.init_app(app)
+    image_proxy.init_app(app)
+    fragments.init_app(app)
+    details.init_app(app)
+    metrics.init_app(app)
+    sessions.init_app(app)
+    app.register_blueprint(bp)
 
-###########################################
-#global variables for api
-BASE_URL = "https://api.petfinder.com/v2"
-
-#api functions
-def retrieve_new_token():
-    # Implement the logic to retrieve a new OAuth token from your authentication provider
-    # Return the new token as a string
-    # TODO: Implement the token retrieval logic in your application
-    res = requests.post(
-                "https://api.petfinder.com/v2/oauth2/token", json=token_request
-            )
-    # session["token"] = res.json()["access_token"]
-    return res.json()["access_token"]
-
-# Example implementation of token_expired function
-def token_expired():
-    expiration_time = retrieve_token_expiration_time()
-    current_time = datetime.now()
-    return current_time > expiration_time
-
-# Example implementation of retrieve_token_expiration_time function
-def retrieve_token_expiration_time():
-    expiration_time = session.get('token_expiration_time')
-    return expiration_time
-
-# Function to refresh the token
-def refresh_token():
-    new_token = retrieve_new_token()
-    session['oauth_token'] = new_token
-    expiration_time = datetime.now() + timedelta(minutes=60)  # Set the new token expiration time (e.g., 30 minutes from now)
-    session['token_expiration_time'] = expiration_time
-
-# Function to make an API request with token refresh
-def make_api_request(url, method='GET', headers=None, params=None, data=None):
-    if 'oauth_token' not in session:
-        # No token in session, retrieve a new one
-        new_token = retrieve_new_token()
-        session['oauth_token'] = new_token
-        expiration_time = datetime.now() + timedelta(minutes=60)
-        session['token_expiration_time'] = expiration_time
-    elif token_expired():
-        # Token has expired, refresh it
-        refresh_token()
-
-    # Construct the request headers
-    request_headers = {'Authorization': f'Bearer {session["oauth_token"]}'} if headers is None else headers
-
-    # Make the API request
-    response = requests.request(method, url, headers=request_headers, params=params, data=data)
-
-    # Return the API response
-    return response
+    return app
 
 
 ##############################################################################
 # User signup/login/logout
 
 
-@app.before_request
+@bp.before_app_request
 def add_user_to_g():
-    """If we're logged in, add curr user to Flask global."""
+    """If we're logged in, add curr user context to Flask global.
+
+    This is a cached UserContext, not the User row; see auth.py.
+    """
+
+    if request.endpoint == "static":
+        return
 
     if CURR_USER_KEY in session:
-        g.user = User.query.get(session[CURR_USER_KEY])
+        g.user = user_contexts.get(
+            session[CURR_USER_KEY], session.get(USER_VERSION_KEY, 0)
+        )
 
     else:
         g.user = None
 
 
+def user_changed():
+    """Make every worker reload the curr user context on this session's next request.
+
+    The user's other sessions see the change once their cached context
+    expires (auth.UserContextCache.ttl).
+    """
+
+    session[USER_VERSION_KEY] = int(time.time() * 1000)
+
+
 def do_login(user):
     """Log in user."""
 
+    sessions.regenerate()
     session[CURR_USER_KEY] = user.id
 
 
@@ -121,7 +114,7 @@ def do_logout():
         del session[CURR_USER_KEY]
 
 
-@app.route("/signup", methods=["GET", "POST"])
+@bp.route("/signup", methods=["GET", "POST"])
 def signup():
     """Handle user signup.
 
@@ -148,6 +141,10 @@ def signup():
             flash("Username already taken", "danger")
             return render_template("users/signup.html", form=form)
 
+        except HasherBusy:
+            flash("We're very busy right now. Please try again in a moment.", "danger")
+            return render_template("users/signup.html", form=form), 503
+
         do_login(user)
 
         return redirect("/")
@@ -156,24 +153,30 @@ def signup():
         return render_template("users/signup.html", form=form)
 
 
-token_request = {
-    "grant_type": "client_credentials",
-    "client_id": "LCoVVX137txFqzFIgK9dfOLACO3fPyUxgxGkeqG0JcC5pzOzav",
-    "client_secret": "3IziiMSRjQiLrniOuKOKXi1VPQ8zRd7hqxEU69eh",
-}
-
-
-
-@app.route("/login", methods=["GET", "POST"])
+@bp.route("/login", methods=["GET", "POST"])
 def login():
     """Handle user login."""
 
     form = LoginForm()
 
     if form.validate_on_submit():
-        user = User.authenticate(form.username.data, form.password.data)
+        # Turn away repeated attempts before spending a bcrypt hash on them
+        wait = login_throttle.retry_after(request.remote_addr, form.username.data)
+        if wait:
+            flash(f"Too many login attempts. Try again in {wait // 60 + 1} minutes.", "danger")
+            return render_template("users/login.html", form=form), 429
+
+        try:
+            user = User.authenticate(form.username.data, form.password.data)
+        except HasherBusy:
+            flash("We're very busy right now. Please try again in a moment.", "danger")
+            return render_template("users/login.html", form=form), 503
+
+        login_throttle.attempted(request.remote_addr, form.username.data, bool(user))
 
         if user:
+            # Saves a rehashed password if the bcrypt cost changed
+            db.session.commit()
             do_login(user)
             flash(f"Hello, {user.username}!", "success")
             return redirect("/")
@@ -183,7 +186,7 @@ def login():
     return render_template("users/login.html", form=form)
 
 
-@app.route("/logout")
+@bp.route("/logout")
 def logout():
     """Handle logout of user."""
     if CURR_USER_KEY not in session:
@@ -199,28 +202,38 @@ def logout():
 
 
 
-@app.route("/users/<int:user_id>")
+@bp.route("/users/<int:user_id>")
 def users_show(user_id):
     """Show user profile."""
 
     user = User.query.get_or_404(user_id)
 
-    
-    return render_template("users/show.html", user=user)
+    return render_template("users/show.html", user=user, saved_counts=like_counts(user.id))
 
 
-@app.route("/users/profile", methods=["GET", "POST"])
+@bp.route("/users/profile", methods=["GET", "POST"])
 def profile():
     """Update profile for current user."""
     curr_user = User.query.get(session[CURR_USER_KEY])
     form = EditUserForm(obj=curr_user)
     if form.validate_on_submit():
-        user = User.authenticate(curr_user.username, form.password.data)
+        if login_throttle.retry_after(request.remote_addr, curr_user.username):
+            flash("Too many attempts. Please try again later.", "danger")
+            return redirect("/")
+
+        try:
+            user = User.authenticate(curr_user.username, form.password.data)
+        except HasherBusy:
+            flash("We're very busy right now. Please try again in a moment.", "danger")
+            return render_template("users/edit.html", form=form), 503
+
+        login_throttle.attempted(request.remote_addr, curr_user.username, bool(user))
 
         if user:
             user.username = form.username.data
             user.email = form.email.data
             db.session.commit()
+            user_changed()
             flash("Your profile was edited", "success")
             return redirect(f"/users/{session[CURR_USER_KEY]}")
 
@@ -229,7 +242,7 @@ def profile():
     return render_template("users/edit.html", form=form)
 
 
-@app.route("/users/delete", methods=["POST"])
+@bp.route("/users/delete", methods=["POST"])
 def delete_user():
     """Delete user."""
 
@@ -239,32 +252,41 @@ def delete_user():
 
     do_logout()
 
-    db.session.delete(g.user)
+    forget_saves(g.user.id)
+    db.session.delete(g.user.row)
     db.session.commit()
 
     return redirect("/signup")
 
-@app.route("/users/<int:user_id>/organizations")
+@bp.route("/users/<int:user_id>/organizations")
 def show_liked_orgs(user_id):
 
-    user = User.query.get_or_404(user_id)
-    org_likes = [saved_org.org_id for saved_org in SavedOrgs.query.filter_by(user_id=g.user.id).all()]
+    user = user_with_liked_orgs(user_id)
+    org_likes = org_likes_for(g.user)
+
+    # Refresh stale saved records from the API in one concurrent batch
+    hydrate_organizations([org.id for org in user.org_likes], loaded=user.org_likes)
 
     return render_template(
-        "/organizations/liked_organizations.html", orgs=user.org_likes, org_likes=org_likes, user=user
+        "/organizations/liked_organizations.html", orgs=user.org_likes, org_likes=org_likes, user=user,
+        saved_counts=like_counts(user.id),
     )
 
-@app.route("/users/<int:user_id>/animals")
+@bp.route("/users/<int:user_id>/animals")
 def show_liked_animals(user_id):
 
-    user = User.query.get_or_404(user_id)
-    animal_likes = [saved_animal.animal_id for saved_animal in SavedAnimals.query.filter_by(user_id=g.user.id).all()]
+    user = user_with_liked_animals(user_id)
+    animal_likes = animal_likes_for(g.user)
+
+    # Refresh stale saved records from the API in one concurrent batch
+    hydrate_animals([animal.id for animal in user.animal_likes], loaded=user.animal_likes)
 
     return render_template(
-        "/animals/liked_animals.html", animals=user.animal_likes, animal_likes=animal_likes, user=user
+        "/animals/liked_animals.html", animals=user.animal_likes, animal_likes=animal_likes, user=user,
+        saved_counts=like_counts(user.id),
     )
 
-@app.route("/organizations/<int:page_num>")
+@bp.route("/organizations/<int:page_num>")
 def list_organizations(page_num):
     """Page with listing of organizations from API.
 
@@ -273,6 +295,7 @@ def list_organizations(page_num):
     
     location = request.args.get("location")
     state = request.args.get("state")
+    distance = request.args.get("distance", type=int)
     
     states = ["AL", "AK", "AZ", "AR", "CA", "CO", "CT", "DC", "DE", "FL", "GA", 
           "HI", "ID", "IL", "IN", "IA", "KS", "KY", "LA", "ME", "MD", 
@@ -280,26 +303,44 @@ def list_organizations(page_num):
           "NM", "NY", "NC", "ND", "OH", "OK", "OR", "PA", "RI", "SC", 
           "SD", "TN", "TX", "UT", "VT", "VA", "WA", "WV", "WI", "WY"]
 
-    params = {"page": page_num, "limit": 42}
+    params = {"page": page_num, "limit": PER_PAGE}
     
     if location:
         params["location"] = location
+        params["sort"] = "distance"
+        if distance:
+            params["distance"] = min(distance, 500)
 
     if state:
         params["state"] = state
         
-    url = f"{BASE_URL}/organizations"
-    res = make_api_request(url, params=params)
-    data = res.json()
-    organizations = data["organizations"]
+    page = None
+    use_mirror = current_app.config["LISTING_SOURCE"] == "mirror" or petfinder_quota.degraded()
+    if use_mirror:
+        page = mirror_organizations(params)
 
-    org_likes = [saved_org.id for saved_org in g.user.org_likes]
+    if not page or not page.items:
+        try:
+            data = petfinder_cache.get_json("/organizations", params=params)
+        except QuotaExhausted:
+            page = None if use_mirror else mirror_organizations(params)
+            if not page or not page.items:
+                raise
+        else:
+            page = Page.from_api(data, "organizations", PER_PAGE)
+            if page.has_next:
+                petfinder_cache.prefetch("/organizations", dict(params, page=page_num + 1))
+
+    page.link("/organizations", request.args)
+    organizations = page.items
+
+    org_likes = org_likes_for(g.user)
 
     return render_template(
-        "organizations/index.html", organizations=organizations, page_num=page_num + 1, org_likes=org_likes, states=states, state=state, location=location
+        "organizations/index.html", organizations=organizations, page=page, org_likes=org_likes, states=states, state=state, location=location, distance=distance
     )
 
-@app.route("/animals/<int:page_num>")
+@bp.route("/animals/<int:page_num>")
 def list_animals(page_num):
     """Page with listing of organizations from API.
 
@@ -309,15 +350,19 @@ def list_animals(page_num):
     name = request.args.get("name")
     type = request.args.get("type")
     gender = request.args.get('gender')
+    breed = request.args.get("breed")
+    color = request.args.get("color")
+    location = request.args.get("location")
+    distance = request.args.get("distance", type=int)
+
+    types = taxonomy.types()
+    selected_type = taxonomy.get(type)
+
+    params = {"page": page_num, "limit": PER_PAGE}
     
-    url_types = f"{BASE_URL}/types"
-    response_types = make_api_request(url_types)
-    data = response_types.json()
-    types = data['types']
-    
-    params = {"page": page_num, "limit": 42}
-    
-    if type:
+    if selected_type:
+        params["type"] = selected_type["name"]
+    elif type:
         params["type"] = type
         
     if name:
@@ -326,17 +371,75 @@ def list_animals(page_num):
     if gender:
         params["gender"] = gender
 
-    url_animals = f"{BASE_URL}/animals"
-    response_animals = make_api_request(url_animals, params=params)
-    data = response_animals.json()
-    animals = data['animals']
+    if breed and selected_type and breed in selected_type["breeds"]:
+        params["breed"] = breed
+
+    if color and selected_type and color in selected_type["colors"]:
+        params["color"] = color
+
+    if location:
+        params["location"] = location
+        if distance:
+            params["distance"] = min(distance, 500)
+
+    page = None
+    use_mirror = current_app.config["LISTING_SOURCE"] == "mirror" or petfinder_quota.degraded()
+    if use_mirror:
+        try:
+            page = mirror_animals(params, cursor=request.args.get("cursor"))
+        except ValueError:
+            abort(400)
+
+    if not page or not page.items:
+        try:
+            data = petfinder_cache.get_json("/animals", params=params)
+        except QuotaExhausted:
+            # Out of calls, or Petfinder wants us to back off: a mirrored
+            # page beats a 503.
+            page = None if use_mirror else mirror_animals(params)
+            if not page or not page.items:
+                raise
+        else:
+            page = Page.from_api(data, "animals", PER_PAGE)
+            if page.has_next:
+                # Warm the next page so clicking Next is served from cache
+                petfinder_cache.prefetch("/animals", dict(params, page=page_num + 1))
+
+    page.link("/animals", request.args)
+    animals = page.items
     
-    animal_likes = [int(saved_animal.id) for saved_animal in g.user.animal_likes]
+    animal_likes = animal_likes_for(g.user)
 
-    return render_template("animals/index.html", animals=animals, page_num=page_num + 1, animal_likes=animal_likes, name=name, types=types, type=type, gender=gender, html=html)
+    return render_template("animals/index.html", animals=animals, page=page, animal_likes=animal_likes, name=name, types=types, type=type, gender=gender, breed=breed, color=color, location=location, distance=distance, selected_type=selected_type, html=html)
     
 
-@app.route("/animals/details/<int:animal_id>")
+@bp.route("/animals/popular")
+def popular_animals():
+    """Show the most saved animals."""
+
+    top = leaderboard.top("animal", PER_PAGE)
+    rows = hydrate_animals([animal_id for animal_id, _ in top])
+    animals = [(rows[animal_id], saves) for animal_id, saves in top if animal_id in rows]
+
+    return render_template(
+        "animals/popular.html", animals=animals, animal_likes=animal_likes_for(g.user)
+    )
+
+
+@bp.route("/organizations/popular")
+def popular_organizations():
+    """Show the most saved organizations."""
+
+    top = leaderboard.top("organization", PER_PAGE)
+    rows = hydrate_organizations([org_id for org_id, _ in top])
+    orgs = [(rows[org_id], saves) for org_id, saves in top if org_id in rows]
+
+    return render_template(
+        "organizations/popular.html", orgs=orgs, org_likes=org_likes_for(g.user)
+    )
+
+
+@bp.route("/animals/details/<int:animal_id>")
 def animal_details(animal_id):
     """Page with listing of organizations from API.
 
@@ -345,17 +448,14 @@ def animal_details(animal_id):
     
     search = request.args.get("q")
     
-    url = f"{BASE_URL}/animals/{animal_id}"
-
     if not search:
-        res = make_api_request(url)
-        data = res.json()
-        animal = data['animal']
+        animal = detail_or_404(animal_store, animal_id)
 
-    return render_template("animals/details.html", animal=animal)
+    last_modified = parse_time(animal.get("status_changed_at") or animal.get("published_at"))
+    return render_conditional("animals/details.html", animal, last_modified, animal=animal)
 
 
-@app.route("/organizations/details/<org_id>")
+@bp.route("/organizations/details/<org_id>")
 def organization_details(org_id):
     """Page with listing of organizations from API.
 
@@ -364,152 +464,130 @@ def organization_details(org_id):
 
     search = request.args.get("q")
     
-    url = f"{BASE_URL}/organizations/{org_id}"
-
     if not search:
-        res = make_api_request(url)
-        data = res.json()
-        organization = data['organization']
+        organization = detail_or_404(organization_store, org_id)
+
+    return render_conditional("organizations/details.html", organization, org=organization)
+
+
+def detail_or_404(store, item_id):
+    """Payload from a DetailStore, or a 404 page if Petfinder doesn't have it."""
+
+    try:
+        return store.get(item_id)
+    except PetfinderError as e:
+        if e.status_code == 404:
+            abort(404)
+        raise
+
+
+@bp.route("/images/<size>/<signature>")
+def proxied_image(size, signature):
+    """A pet or shelter photo, resized and served from our image cache."""
+
+    return image_proxy.response(size, signature, request.args.get("url"))
+
+
+def wants_json():
+    """Did a fetch() call ask for JSON rather than a page?"""
+
+    return request.is_json or request.accept_mimetypes.best == "application/json"
+
+
+def login_required_response():
+    if wants_json():
+        return jsonify(error="Please login first!"), 401
+    flash("Please login first!", "danger")
+    return redirect("/login")
+
+
+def saved_response(saved):
+    if wants_json():
+        return jsonify(saved=saved)
+    return redirect(request.referrer or "/")
+
+
+def posted_ids(clean):
+    """IDs sent to a bulk save endpoint, as JSON {"ids": [...]} or form fields.
+
+    Each ID goes through `clean`; if any isn't a valid ID, it's a 400.
+    """
+
+    if request.is_json:
+        body = request.get_json(silent=True)
+        ids = body.get("ids") if isinstance(body, dict) else None
+    else:
+        ids = request.form.getlist("ids")
 
-    return render_template("organizations/details.html", org=organization)
+    if not isinstance(ids, list) or not ids or len(ids) > PER_PAGE:
+        abort(400)
+    ids = [clean(i) for i in ids]
+    if None in ids:
+        abort(400)
+    return ids
 
-@app.route("/animal/save/<animal_id>", methods=["POST"])
+
+@bp.route("/animal/save/<animal_id>", methods=["POST"])
 def add_to_saved_animals(animal_id):
-    """add to saved animals."""
+    """Save or unsave an animal."""
     if not g.user:
-        flash("Please login first!", "danger")
-        return redirect("/login")
-    else:
-        animal = Animal.query.get(animal_id)
-
-        if animal == None:
-            get_animal = get_the_animal(animal_id)
-            new_animal = Animal(
-                id=animal_id,
-                name=get_animal["name"],
-                img_url=get_animal["img_url"],
-                description=get_animal["description"],
-            )
-            db.session.add(new_animal)
-            db.session.commit()
-            new_user_animal = SavedAnimals(user_id=g.user.id, animal_id=animal_id)
-            db.session.add(new_user_animal)
-            db.session.commit()
-        else:
-            liked_animal = Animal.query.get_or_404(animal_id)
-            animal_likes = g.user.animal_likes
-            
-            if liked_animal in animal_likes:
-                g.user.animal_likes = [animal for animal in animal_likes if animal != liked_animal]
-            else:
-                g.user.animal_likes.append(liked_animal)
-            db.session.commit()
-        
-        return redirect(request.referrer)
-    
-@app.route("/organization/save/<org_id>", methods=["POST"])
+        return login_required_response()
+    animal_id = clean_animal_id(animal_id)
+    if animal_id is None:
+        abort(400)
+
+    saved = save_animal(g.user.id, animal_id)
+    user_changed()
+    if saved:
+        # Saved lists and detail pages will want the full record
+        animal_store.prefetch(animal_id)
+    return saved_response(saved)
+
+
+@bp.route("/organization/save/<org_id>", methods=["POST"])
 def add_to_saved_orgs(org_id):
-    """add to collection."""
+    """Save or unsave an organization."""
     if not g.user:
-        flash("Please login first!", "danger")
-        return redirect("/login")
-    else:
-        org = Organization.query.get(org_id)
-
-        if org == None:
-            get_org = get_the_org(org_id)
-            new_org = Organization(
-                id=org_id,
-                name=get_org["name"],
-                img_url=get_org["img_url"],
-                mission_statement=get_org["mission_statement"],
-            )
-            db.session.add(new_org)
-            db.session.commit()
-            new_user_org = SavedOrgs(user_id=g.user.id, org_id=org_id)
-            db.session.add(new_user_org)
-            db.session.commit()
-        else:
-            liked_org = Organization.query.get_or_404(org_id)
-            org_likes = g.user.org_likes
-            
-            if liked_org in org_likes:
-                g.user.org_likes = [org for org in org_likes if org != liked_org]
-            else:
-                g.user.org_likes.append(liked_org)
-            db.session.commit()
-        return redirect(request.referrer)
+        return login_required_response()
+    org_id = clean_org_id(org_id)
+    if org_id is None:
+        abort(400)
+
+    saved = save_org(g.user.id, org_id)
+    user_changed()
+    if saved:
+        # Saved lists and detail pages will want the full record
+        organization_store.prefetch(org_id)
+    return saved_response(saved)
+
+
+@bp.route("/animal/save", methods=["POST"])
+def bulk_save_animals():
+    """Save several animals at once."""
+    if not g.user:
+        return login_required_response()
 
+    saved = save_animals(g.user.id, posted_ids(clean_animal_id))
+    user_changed()
+    return saved_response(saved)
 
 
-def get_the_org(org_id):
-    """get the details for an organizationn"""
-    org = Organization.query.get(
-        org_id
-    )  # see if we have it in the db and if not call the api
+@bp.route("/organization/save", methods=["POST"])
+def bulk_save_orgs():
+    """Save several organizations at once."""
+    if not g.user:
+        return login_required_response()
+
+    saved = save_orgs(g.user.id, posted_ids(clean_org_id))
+    user_changed()
+    return saved_response(saved)
 
-    if org is None:
-        try:
-            url = f"{BASE_URL}/organizations/{org_id}"
-            res = make_api_request(url)
-            data = res.json()
-            j_org = data['organization']
-          
-            org = {
-                "id": org_id,
-                "name": j_org["name"],
-                "mission_statement": j_org["mission_statement"],
-            }
-            
-            if len(j_org['photos']) == 0:
-                org['img_url'] = 'https://img.freepik.com/free-vector/cute-dog-sitting-cartoon-vector-icon-illustration-animal-nature-icon-concept-isolated-premium-vector-flat-cartoon-style_138676-3671.jpg'
-            else:
-                org['img_url'] = j_org["photos"][0]["medium"]
-           
-            return org
-        except Exception as e:
-            flash("An unexpected error occurred.", "danger")
-            session["return"] = "failed"
-            return
-    session["return"] = "success"
-    return org
-
-def get_the_animal(animal_id):
-    """get the details for an animal when we are not sure if the animal is within our database"""
-    animal = Organization.query.get(
-        animal_id
-    )  # see if we have it in the db and if not call the api
-
-    if animal == None:
-        try:
-            url = f"{BASE_URL}/animals/{animal_id}"
-            res = make_api_request(url)
-            data = res.json()
-            j_animal = data['animal']
-            
-            animal = {
-                "id": animal_id,
-                "name": j_animal["name"],
-                "description": j_animal["description"],
-            }
-            
-            if len(j_animal['photos']) == 0:
-                animal['img_url'] = 'https://img.freepik.com/free-vector/cute-dog-sitting-cartoon-vector-icon-illustration-animal-nature-icon-concept-isolated-premium-vector-flat-cartoon-style_138676-3671.jpg'
-            else:
-                animal['img_url'] = j_animal["photos"][0]["medium"]
-            return animal
-        except Exception as e:
-            flash("An unexpected error occurred.", "danger")
-            session["return"] = "failed"
-            return
-    session["return"] = "success"
-    return animal
 
 ##############################################################################
 # Homepage and error pages
 
 
-@app.route("/")
+@bp.route("/")
 def homepage():
     """Show homepage:
 
@@ -525,21 +603,25 @@ def homepage():
         return render_template("home-anon.html")
 
 
-##############################################################################
-# Turn off all caching in Flask
-#   (useful for dev; in production, this kind of stuff is typically
-#   handled elsewhere)
-#
-# https://stackoverflow.com/questions/34066804/disabling-caching-in-flask
+@bp.route("/status/petfinder")
+def petfinder_status():
+    """Counters for calls made to the Petfinder API by this worker.
 
+    "quota" is shared by every worker using the same PETFINDER_QUOTA_URL,
+    except its "denied" and "rate_limit_wait_seconds" counters.
+    """
 
-@app.after_request
-def add_header(req):
-    """Add non-caching headers on every request."""
+    return jsonify(dict(petfinder_client.snapshot(), cache=petfinder_cache.snapshot()))
 
-    req.headers["Cache-Control"] = "no-cache, no-store, must-revalidate"
-    req.headers["Pragma"] = "no-cache"
-    req.headers["Expires"] = "0"
-    req.headers["Cache-Control"] = "public, max-age=0"
-    return req
 
+@bp.app_errorhandler(QuotaExhausted)
+def petfinder_quota_exhausted(error):
+    """Out of Petfinder calls and nothing cached: ask the client to come back."""
+
+    if wants_json():
+        response = jsonify({"error": "petfinder_quota_exhausted"})
+    else:
+        response = current_app.make_response(render_template("unavailable.html"))
+    response.status_code = 503
+    response.headers["Retry-After"] = str(error.retry_after)
+    return response
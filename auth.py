@@ -0,0 +1,94 @@
+"""Lightweight context for the logged-in user."""
+
+import threading
+import time
+
+from likes import liked_ids
+from models import db, User
+
+
+class UserContext:
+    """What most requests need to know about the logged-in user.
+
+    Holds the id, username and the IDs of everything the user saved. The
+    full `User` row is only loaded when something reads `.row` or an
+    attribute that is not kept here (email, animal_likes, ...).
+    """
+
+    def __init__(self, id, username, animal_like_ids, org_like_ids):
+        self.id = id
+        self.username = username
+        self.animal_like_ids = animal_like_ids
+        self.org_like_ids = org_like_ids
+        self._row = None
+
+    @property
+    def row(self):
+        """The `User` row, loaded on first use."""
+
+        if self._row is None:
+            self._row = User.query.get(self.id)
+        return self._row
+
+    def __getattr__(self, name):
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return getattr(self.row, name)
+
+    def __repr__(self):
+        return f"<UserContext #{self.id}: {self.username}>"
+
+
+class UserContextCache:
+    """Short-lived per-process cache of UserContext data.
+
+    Entries are keyed on (user id, version). The version is kept in the
+    user's session and bumped whenever their likes or profile change, so
+    the session that made a change sees it on its next request, whichever
+    worker serves it.
+
+    Other sessions of the same user (another browser or device) carry
+    their own version, so they can keep seeing the old likes and username
+    for up to `ttl` seconds after the change.
+    """
+
+    def __init__(self, ttl=60, max_entries=10000):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def get(self, user_id, version=0):
+        """UserContext for `user_id`, or None if there is no such user."""
+
+        key = (user_id, version)
+        now = time.time()
+        entry = self._entries.get(key)
+
+        if entry is None or entry[0] < now:
+            data = self._load(user_id)
+            if data is None:
+                return None
+            entry = (now + self.ttl, data)
+            with self._lock:
+                if len(self._entries) >= self.max_entries:
+                    self._entries = {
+                        k: v for k, v in self._entries.items() if v[0] >= now
+                    }
+                    if len(self._entries) >= self.max_entries:
+                        self._entries.clear()
+                self._entries[key] = entry
+
+        username, animal_like_ids, org_like_ids = entry[1]
+        return UserContext(user_id, username, set(animal_like_ids), set(org_like_ids))
+
+    def _load(self, user_id):
+        username = db.session.query(User.username).filter(User.id == user_id).scalar()
+        if username is None:
+            return None
+
+        animal_like_ids, org_like_ids = liked_ids(user_id)
+        return username, frozenset(animal_like_ids), frozenset(org_like_ids)
+
+
+user_contexts = UserContextCache()
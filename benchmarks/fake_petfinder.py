@@ -0,0 +1,229 @@
+"""A stand-in for the Petfinder API, for benchmarks and local load tests.
+
+Serves the endpoints the app uses (OAuth token, /types, breeds,
+/animals, /organizations and their detail endpoints) with made-up records
+shaped and sized like Petfinder's, about 3 KB per animal. It can add
+latency to every response and answer a share of calls with an error, to
+imitate the real API on a bad day:
+
+    python benchmarks/fake_petfinder.py --port 8081 --latency 0.2 --error-rate 0.02
+    PETFINDER_BASE_URL=http://127.0.0.1:8081/v2 flask run
+
+Animal ids ending in 404 answer 404, like an adopted animal.
+"""
+
+import argparse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+import random
+import re
+import sys
+import threading
+import time
+from urllib.parse import parse_qs, urlparse
+
+TYPES = [
+    {"name": "Dog", "coats": ["Short", "Long"], "colors": ["Black", "White", "Brown"],
+     "genders": ["Male", "Female"]},
+    {"name": "Cat", "coats": ["Short"], "colors": ["Gray", "Black"],
+     "genders": ["Male", "Female"]},
+    {"name": "Rabbit", "coats": ["Short"], "colors": ["White"], "genders": ["Male", "Female"]},
+]
+BREEDS = ["Beagle", "Labrador Retriever", "Pug", "Tabby", "Siamese", "Lop"]
+TOTAL_ANIMALS = 5000
+TOTAL_ORGS = 600
+
+
+def photo_urls(kind, i, n):
+    base = f"https://dl5zpyw5k3jeb.cloudfront.net/photos/{kind}/{i}/{n}/"
+    return {
+        "small": f"{base}?bust=1546042081&width=100",
+        "medium": f"{base}?bust=1546042081&width=300",
+        "large": f"{base}?bust=1546042081&width=600",
+        "full": f"{base}?bust=1546042081",
+    }
+
+
+def animal(i):
+    org = i % TOTAL_ORGS
+    species = "Dog" if i % 3 else "Cat"
+    return {
+        "id": i,
+        "organization_id": f"TX{org:04d}",
+        "url": f"https://www.petfinder.com/{species.lower()}/pet-{i}/tx/austin/rescue-society-tx{org:04d}/?referrer_id=d7e3700b-2e07-11e9-b3f3-0800275f82b1",
+        "type": species,
+        "species": species,
+        "breeds": {"primary": BREEDS[i % len(BREEDS)], "secondary": None, "mixed": bool(i % 2),
+                   "unknown": False},
+        "colors": {"primary": "Black", "secondary": None, "tertiary": None},
+        "age": ["Baby", "Young", "Adult", "Senior"][i % 4],
+        "gender": "Female" if i % 2 else "Male",
+        "size": "Medium",
+        "coat": "Short",
+        "attributes": {"spayed_neutered": True, "house_trained": bool(i % 2), "declawed": None,
+                       "special_needs": False, "shots_current": True},
+        "environment": {"children": True, "dogs": bool(i % 3), "cats": None},
+        "tags": ["Friendly", "Playful", "Affectionate", "Gentle"],
+        "name": f"Pet {i}",
+        "description": "Friendly &amp; playful, great with kids and other dogs. Loves long walks "
+                       "and belly rubs, and is already crate trained...",
+        "organization_animal_id": f"A{i:07d}",
+        "photos": [photo_urls("pets", i, n) for n in range(1, 2 + i % 4)],
+        "primary_photo_cropped": photo_urls("pets", i, 1),
+        "videos": [],
+        "status": "adoptable",
+        "status_changed_at": "2026-01-01T00:00:00+0000",
+        "published_at": f"2026-01-{1 + i % 28:02d}T00:00:00+0000",
+        "distance": None,
+        "contact": {
+            "email": "adopt@example.org",
+            "phone": "(512) 555-0100",
+            "address": {"address1": None, "address2": None, "city": "Austin", "state": "TX",
+                        "postcode": "78701", "country": "US"},
+        },
+        "_links": {
+            "self": {"href": f"/v2/animals/{i}"},
+            "type": {"href": f"/v2/types/{species.lower()}"},
+            "organization": {"href": f"/v2/organizations/tx{org:04d}"},
+        },
+    }
+
+
+def organization(i):
+    return {
+        "id": f"TX{i:04d}",
+        "name": f"Rescue Society {i}",
+        "email": "hello@example.org",
+        "phone": "(512) 555-0199",
+        "address": {"address1": None, "address2": None, "city": "Austin", "state": "TX",
+                    "postcode": "78701", "country": "US"},
+        "hours": dict.fromkeys(
+            ["monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday"],
+            "10am - 6pm",
+        ),
+        "url": f"https://www.petfinder.com/member/us/tx/austin/rescue-society-tx{i:04d}/",
+        "website": f"https://rescue-society-{i}.example.org",
+        "mission_statement": "We find loving homes for animals in need. Every animal is "
+                             "vaccinated, microchipped and spayed or neutered before adoption.",
+        "adoption": {"policy": "Adoption fees help cover medical care.", "url": None},
+        "social_media": {"facebook": f"https://www.facebook.com/rescue{i}", "twitter": None,
+                         "youtube": None, "instagram": None, "pinterest": None},
+        "photos": [photo_urls("organizations", i, 1)] if i % 3 == 0 else [],
+        "distance": None,
+        "_links": {
+            "self": {"href": f"/v2/organizations/tx{i:04d}"},
+            "animals": {"href": f"/v2/animals?organization=tx{i:04d}"},
+        },
+    }
+
+
+def page_of(kind, make, total, query):
+    page = int(query.get("page", 1))
+    limit = min(int(query.get("limit", 20)), 100)
+    start = (page - 1) * limit
+    items = [make(i) for i in range(start + 1, min(start + limit, total) + 1)]
+    return {
+        kind: items,
+        "pagination": {
+            "count_per_page": limit,
+            "total_count": total,
+            "current_page": page,
+            "total_pages": -(-total // limit),
+            "_links": {},
+        },
+    }
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        self._reply({"token_type": "Bearer", "expires_in": 3600, "access_token": "fake"})
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        query = {k: v[0] for k, v in parse_qs(url.query).items()}
+        path = re.sub(r"^/v2", "", url.path)
+        self.server.calls += 1
+        if self.server.error_rate and random.random() < self.server.error_rate:
+            self.server.errors += 1
+            return self._reply({"status": 503, "title": "Service Unavailable"}, 503)
+
+        if path == "/types":
+            return self._reply({"types": TYPES})
+        if re.fullmatch(r"/types/\w+/breeds", path):
+            return self._reply({"breeds": [{"name": name} for name in BREEDS]})
+        if path == "/animals":
+            return self._reply(page_of("animals", animal, TOTAL_ANIMALS, query))
+        if path == "/organizations":
+            return self._reply(page_of("organizations", organization, TOTAL_ORGS, query))
+
+        match = re.fullmatch(r"/animals/(\d+)", path)
+        if match:
+            if match.group(1).endswith("404"):
+                return self._reply({"status": 404, "title": "Not Found"}, 404)
+            return self._reply({"animal": animal(int(match.group(1)))})
+        match = re.fullmatch(r"/organizations/TX(\d+)", path, re.IGNORECASE)
+        if match and int(match.group(1)) < TOTAL_ORGS:
+            return self._reply({"organization": organization(int(match.group(1)))})
+
+        self._reply({"status": 404, "title": "Not Found"}, 404)
+
+    def _reply(self, body, status=200):
+        if self.server.latency:
+            time.sleep(self.server.latency)
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+class FakePetfinder(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 1024
+
+    def __init__(self, port=0, latency=0.0, error_rate=0.0):
+        super().__init__(("127.0.0.1", port), Handler)
+        self.latency = latency
+        self.error_rate = error_rate
+        self.calls = 0
+        self.errors = 0
+
+    def handle_error(self, request, client_address):
+        # Clients that hang up mid-response (e.g. a worker being stopped)
+        # are expected; don't print their tracebacks.
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self.server_port}/v2"
+
+    def start(self):
+        """Serve on a daemon thread; returns the base URL for PETFINDER_BASE_URL."""
+
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self.base_url
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds per response")
+    parser.add_argument("--error-rate", type=float, default=0.0,
+                        help="share of API calls answered with a 503")
+    args = parser.parse_args()
+
+    server = FakePetfinder(args.port, args.latency, args.error_rate)
+    print(f"PETFINDER_BASE_URL={server.base_url}")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
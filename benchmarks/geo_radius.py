@@ -0,0 +1,54 @@
+"""Benchmark radius queries on the in-memory GridIndex.
+
+Scatters organizations around real ZIP centroids from the bundled table
+and times "near me" queries at several radii.
+
+    python benchmarks/geo_radius.py --orgs 100000
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from geo import GridIndex, gazetteer  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--orgs", type=int, default=100000)
+    parser.add_argument("--queries", type=int, default=500)
+    args = parser.parse_args()
+
+    gazetteer.geocode(postcode="00000")  # load the ZIP table
+    zips = list(gazetteer._zips.values())
+    random.seed(1)
+
+    start = time.perf_counter()
+    index = GridIndex()
+    for i in range(args.orgs):
+        lat, lon = random.choice(zips)
+        index.insert(f"OR{i}", lat + random.uniform(-0.05, 0.05), lon + random.uniform(-0.05, 0.05))
+    print(f"indexed {index.size} organizations in {time.perf_counter() - start:.2f}s")
+
+    for radius in (10, 25, 50, 100):
+        samples, found = [], []
+        for _ in range(args.queries):
+            lat, lon = random.choice(zips)
+            t = time.perf_counter()
+            found.append(len(index.within(lat, lon, radius)))
+            samples.append((time.perf_counter() - t) * 1000)
+        samples.sort()
+        print(
+            f"radius {radius:>3} mi: p50 {statistics.median(samples):.2f} ms, "
+            f"p95 {samples[int(len(samples) * 0.95)]:.2f} ms, "
+            f"mean hits {statistics.mean(found):.0f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
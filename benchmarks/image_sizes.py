@@ -0,0 +1,53 @@
+"""Bytes and resize time for each image proxy size, against the source.
+
+Takes photo URLs or local files:
+
+    python benchmarks/image_sizes.py https://photos.petfinder.com/photos/pets/.../1/?width=300
+    python benchmarks/image_sizes.py photo1.jpg photo2.jpg
+
+The source column is what pages loaded before the proxy; the rest is
+what each rendition served from /images/<size>/... weighs.
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from images import SIZES, resize  # noqa: E402
+
+
+def load(source):
+    if os.path.exists(source):
+        with open(source, "rb") as f:
+            return f.read()
+    res = requests.get(source, timeout=10)
+    res.raise_for_status()
+    return res.content
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("sources", nargs="+")
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'image':<30}{'source':>10}" + "".join(f"{size:>18}" for size in SIZES))
+    for source in args.sources:
+        data = load(source)
+        cells = []
+        for size in SIZES:
+            start = time.perf_counter()
+            for _ in range(args.runs):
+                out = resize(data, size)
+            ms = (time.perf_counter() - start) / args.runs * 1000
+            cells.append(f"{len(out):>9} B {ms:>4.0f}ms")
+        print(f"{os.path.basename(source.rstrip('/'))[:28]:<30}{len(data):>8} B" + "".join(f"{c:>18}" for c in cells))
+
+
+if __name__ == "__main__":
+    main()
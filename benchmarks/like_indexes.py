@@ -0,0 +1,132 @@
+"""Benchmark like-table lookups before and after keying them on (user, item).
+
+Builds two copies of animal_likes in a scratch database, one shaped like
+the original table (surrogate id, no other index) and one like the
+current model (primary key (user_id, animal_id) plus an
+(animal_id, user_id) index), fills both with the same rows and times the
+lookups the app makes.
+
+    python benchmarks/like_indexes.py                  # 10M rows
+    python benchmarks/like_indexes.py --rows 1000000
+    BENCH_DATABASE_URL=postgresql:///adopt_a_pet_bench python benchmarks/like_indexes.py
+
+Never point BENCH_DATABASE_URL at a database you care about: the two
+benchmark tables are dropped and recreated.
+"""
+
+import argparse
+import os
+import random
+import statistics
+import time
+
+from sqlalchemy import (
+    Column, Index, Integer, MetaData, PrimaryKeyConstraint, Table, Text,
+    create_engine, func, select,
+)
+
+metadata = MetaData()
+
+before = Table(
+    "bench_likes_before", metadata,
+    Column("id", Integer, primary_key=True),
+    Column("user_id", Integer),
+    Column("animal_id", Text),
+)
+
+after = Table(
+    "bench_likes_after", metadata,
+    Column("user_id", Integer, nullable=False),
+    Column("animal_id", Text, nullable=False),
+    PrimaryKeyConstraint("user_id", "animal_id"),
+    Index("ix_bench_likes_after_animal_user", "animal_id", "user_id"),
+)
+
+
+def lookups(table):
+    """The like queries the app runs, keyed by label."""
+
+    return {
+        "user's saved IDs": lambda u, a: select([table.c.animal_id]).where(
+            table.c.user_id == u
+        ),
+        "user's saved count": lambda u, a: select([func.count()]).select_from(
+            table
+        ).where(table.c.user_id == u),
+        "is it saved (toggle)": lambda u, a: select([table.c.user_id]).where(
+            (table.c.user_id == u) & (table.c.animal_id == a)
+        ),
+        "who saved this animal": lambda u, a: select([table.c.user_id]).where(
+            table.c.animal_id == a
+        ),
+    }
+
+
+def fill(engine, rows, users, animals, batch=50000):
+    metadata.drop_all(engine)
+    metadata.create_all(engine)
+
+    rng = random.Random(42)
+    seen = set()
+    with engine.begin() as conn:
+        while len(seen) < rows:
+            chunk = []
+            while len(chunk) < batch and len(seen) < rows:
+                pair = (rng.randrange(users), str(rng.randrange(animals)))
+                if pair not in seen:
+                    seen.add(pair)
+                    chunk.append({"user_id": pair[0], "animal_id": pair[1]})
+            conn.execute(before.insert(), chunk)
+            conn.execute(after.insert(), chunk)
+
+    with engine.begin() as conn:
+        conn.execute("ANALYZE")
+
+
+def time_ms(conn, make_query, users, animals, repeat):
+    rng = random.Random(7)
+    samples = []
+    for _ in range(repeat):
+        query = make_query(rng.randrange(users), str(rng.randrange(animals)))
+        start = time.perf_counter()
+        conn.execute(query).fetchall()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--rows", type=int, default=10000000)
+    parser.add_argument("--users", type=int, default=None, help="default rows / 100")
+    parser.add_argument("--animals", type=int, default=None, help="default rows / 10")
+    parser.add_argument("--repeat", type=int, default=200)
+    parser.add_argument(
+        "--repeat-unindexed", type=int, default=5,
+        help="repeats for the original table, whose lookups scan every row",
+    )
+    parser.add_argument("--no-fill", action="store_true", help="reuse existing rows")
+    args = parser.parse_args()
+
+    users = args.users or max(1, args.rows // 100)
+    animals = args.animals or max(1, args.rows // 10)
+    engine = create_engine(
+        os.environ.get("BENCH_DATABASE_URL", "sqlite:////tmp/pet_adopter_bench.sqlite")
+    )
+
+    if not args.no_fill:
+        print(f"filling {args.rows} likes ({users} users, {animals} animals) into {engine.url} ...")
+        start = time.perf_counter()
+        fill(engine, args.rows, users, animals)
+        print(f"  done in {time.perf_counter() - start:.0f} s")
+
+    with engine.connect() as conn:
+        print(f"\n{'query':<24}{'original p50':>16}{'keyed p50':>14}")
+        old, new = lookups(before), lookups(after)
+        for label in old:
+            old_ms = time_ms(conn, old[label], users, animals, args.repeat_unindexed)
+            new_ms = time_ms(conn, new[label], users, animals, args.repeat)
+            print(f"{label:<24}{old_ms:>13.2f} ms{new_ms:>11.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
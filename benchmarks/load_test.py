@@ -0,0 +1,431 @@
+"""Load test the app's main routes against a local Petfinder stand-in.
+
+Starts benchmarks/fake_petfinder.py, prepares a database (tables plus
+`--users` accounts), runs the app under gunicorn with gunicorn.conf.py,
+and drives each scenario in turn with `--concurrency` clients for
+`--duration` seconds:
+
+- animals: /animals/<page>, over `--pages` pages
+- organizations: /organizations/<page>
+- details: animal and organization detail pages, mostly of new ids
+- save: logged-in users saving and unsaving animals (JSON API)
+- login: the login form, CSRF token included, at the app's bcrypt cost
+
+For each scenario it reports throughput, p50/p95/p99 latency, errors,
+and requests the app shed on purpose (429 or 503 from the login throttle,
+the password hasher's queue limit or the Petfinder quota). With
+`--json` the results, the commit and the settings are written to a file;
+`--compare` prints the change between two such files:
+
+    python benchmarks/load_test.py
+    python benchmarks/load_test.py --scenarios animals details --concurrency 64
+    python benchmarks/load_test.py --json bench/$(git rev-parse --short HEAD).json
+    python benchmarks/load_test.py --compare bench/before.json bench/after.json
+
+By default the app uses a new SQLite file. `--database` points it at
+another database, e.g. Postgres; use a scratch one, since tables are
+created and users added. `--url` skips starting the app and drives one
+that is already running (its PETFINDER_BASE_URL is then up to you).
+"""
+
+import argparse
+from contextlib import contextmanager
+import json
+import os
+import platform
+import random
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import requests
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks.fake_petfinder import FakePetfinder, TOTAL_ANIMALS, TOTAL_ORGS  # noqa: E402
+
+PASSWORD = "benchmark-password"
+
+PREPARE = """
+import sys
+from sqlalchemy.exc import IntegrityError
+from app import create_app
+from models import db, User
+
+app = create_app()
+with app.app_context():
+    db.create_all()
+    for i in range(int(sys.argv[1])):
+        try:
+            User.signup(username=f"bench{i}", email=f"bench{i}@example.org", password=sys.argv[2])
+            db.session.commit()
+        except IntegrityError:
+            db.session.rollback()
+"""
+
+
+##############################################################################
+# Running the app
+
+
+def server_env(upstream_url, database, workdir, **settings):
+    """Environment for the app: the fake upstream, no quota limits, `settings`."""
+
+    env = dict(
+        os.environ,
+        FLASK_ENV="production",
+        DATABASE_URL=database,
+        PETFINDER_BASE_URL=upstream_url,
+        # Measure the app, not the quota or the login throttle.
+        PETFINDER_DAILY_BUDGET=str(10 ** 9),
+        PETFINDER_RATE_PER_SECOND=str(10 ** 6),
+        LOGIN_MAX_PER_CLIENT=str(10 ** 5),
+        TEMPLATE_BYTECODE_DIR=os.path.join(workdir, "templates"),
+        IMAGE_CACHE_DIR=os.path.join(workdir, "images"),
+        GUNICORN_TIMEOUT="120",
+    )
+    # The slow-request log would drown out the results; set it to see it.
+    env.setdefault("SLOW_REQUEST_SAMPLE_RATE", "0")
+    env.update({key: str(value) for key, value in settings.items()})
+    return env
+
+
+def prepare(env, users):
+    """Create the tables and `users` accounts named bench0, bench1, ..."""
+
+    subprocess.run([sys.executable, "-c", PREPARE, str(users), PASSWORD],
+                   cwd=ROOT, env=env, check=True)
+
+
+def gunicorn_script():
+    """Path of the `gunicorn` console script, preferring this interpreter's."""
+
+    # gunicorn 19.x (the pinned version) can't be run with `python -m`.
+    script = os.path.join(os.path.dirname(sys.executable), "gunicorn")
+    if os.access(script, os.X_OK):
+        return script
+    script = shutil.which("gunicorn")
+    if script is None:
+        raise RuntimeError("gunicorn is not installed (pip install -r requirements.txt)")
+    return script
+
+
+@contextmanager
+def running_server(env, port):
+    """Run gunicorn with gunicorn.conf.py; yields (base URL, master process)."""
+
+    env = dict(env, GUNICORN_BIND=f"127.0.0.1:{port}")
+    server = subprocess.Popen(
+        [gunicorn_script(), "-c", "gunicorn.conf.py", "--log-level", "warning", "wsgi:app"],
+        cwd=ROOT, env=env,
+    )
+    try:
+        base_url = f"http://127.0.0.1:{port}"
+        wait_until_up(base_url + "/")
+        yield base_url, server
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def wait_until_up(url, timeout=30):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            if requests.get(url, timeout=5).status_code < 500:
+                return
+        except requests.ConnectionError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"server at {url} did not start")
+
+
+def worker_rss_kb(master_pid):
+    """Summed VmRSS of the gunicorn master's child processes."""
+
+    with open(f"/proc/{master_pid}/task/{master_pid}/children") as f:
+        pids = f.read().split()
+    total = 0
+    for pid in pids:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    total += int(line.split()[1])
+    return total
+
+
+##############################################################################
+# Scenarios
+#
+# Each takes a Client and the client's request counter and makes one
+# request, returning whether it succeeded.
+
+
+class Client:
+    """One simulated user: a cookie session, and an account if it needs one."""
+
+    def __init__(self, base_url, username=None, pages=50):
+        self.base_url = base_url
+        self.username = username
+        self.pages = pages
+        self.random = random.Random()
+        self.session = requests.Session()
+        self.last_status = None
+
+    def get(self, path, **kwargs):
+        res = self.session.get(self.base_url + path, timeout=60, **kwargs)
+        self.last_status = res.status_code
+        return res
+
+    def post(self, path, **kwargs):
+        res = self.session.post(self.base_url + path, timeout=60, allow_redirects=False,
+                                **kwargs)
+        self.last_status = res.status_code
+        return res
+
+    def login(self):
+        form = self.get("/login").text
+        token = re.search(r'name="csrf_token"[^>]*value="([^"]+)"', form).group(1)
+        res = self.post("/login", data={
+            "csrf_token": token, "username": self.username, "password": PASSWORD,
+        })
+        return res.status_code == 302
+
+
+def animals(client, n):
+    return client.get(f"/animals/{1 + client.random.randrange(client.pages)}").ok
+
+
+def organizations(client, n):
+    return client.get(f"/organizations/{1 + client.random.randrange(client.pages)}").ok
+
+
+def details(client, n):
+    if n % 2:
+        org_id = f"TX{client.random.randrange(1, TOTAL_ORGS):04d}"
+        return client.get(f"/organizations/details/{org_id}").ok
+    res = client.get(f"/animals/details/{client.random.randrange(1, TOTAL_ANIMALS)}")
+    # The fake answers 404 for ids ending in 404, like an adopted animal.
+    return res.ok or res.status_code == 404
+
+
+def save(client, n):
+    # A handful of ids per user, so most requests toggle an earlier save
+    animal_id = 1 + client.random.randrange(20)
+    res = client.post(f"/animal/save/{animal_id}", headers={"Accept": "application/json"})
+    return res.ok
+
+
+def login(client, n):
+    return client.login()
+
+
+# name: (scenario, needs a logged-in user)
+SCENARIOS = {
+    "animals": (animals, False),
+    "organizations": (organizations, False),
+    "details": (details, False),
+    "save": (save, True),
+    "login": (login, False),
+}
+
+
+##############################################################################
+# Measuring
+
+
+def percentile(sorted_values, share):
+    """Nearest-rank percentile of an already sorted list."""
+
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, max(0, int(round(share * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+
+def run_load(make_client, scenario, concurrency, duration):
+    """Run `scenario` from `concurrency` clients for `duration` seconds."""
+
+    lock = threading.Lock()
+    latencies = []
+    errors = [0]
+    shed = [0]
+    clients = [make_client(i) for i in range(concurrency)]
+    deadline = time.time() + duration
+
+    def drive(client):
+        n = 0
+        while time.time() < deadline:
+            client.last_status = None
+            start = time.perf_counter()
+            try:
+                ok = scenario(client, n)
+            except (requests.RequestException, AttributeError):
+                ok = False
+            elapsed = time.perf_counter() - start
+            with lock:
+                if ok:
+                    latencies.append(elapsed)
+                elif client.last_status in (429, 503):
+                    shed[0] += 1
+                else:
+                    errors[0] += 1
+            n += 1
+
+    threads = [threading.Thread(target=drive, args=(client,)) for client in clients]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+
+    def ms(share):
+        value = percentile(latencies, share)
+        return round(value * 1000, 2) if value is not None else None
+
+    return {
+        "requests": len(latencies),
+        "errors": errors[0],
+        "shed": shed[0],
+        "requests_per_second": round(len(latencies) / elapsed, 2),
+        "mean_ms": round(sum(latencies) / len(latencies) * 1000, 2) if latencies else None,
+        "p50_ms": ms(0.50),
+        "p95_ms": ms(0.95),
+        "p99_ms": ms(0.99),
+    }
+
+
+def bench(base_url, args):
+    results = {}
+    for name in args.scenarios:
+        scenario, needs_user = SCENARIOS[name]
+
+        def make_client(i):
+            client = Client(base_url, f"bench{i % args.users}", args.pages)
+            if needs_user and not client.login():
+                raise RuntimeError(f"could not log in as {client.username}")
+            return client
+
+        if args.warmup:
+            run_load(make_client, scenario, min(args.concurrency, 8), args.warmup)
+        results[name] = run_load(make_client, scenario, args.concurrency, args.duration)
+        print_row(name, results[name])
+    return results
+
+
+def print_row(name, r):
+    print(f"{name:<15}{r['requests_per_second']:>9.1f}"
+          + "".join(f"{r[key] or 0:>9.1f}" for key in ("p50_ms", "p95_ms", "p99_ms"))
+          + f"{r['errors']:>8}{r.get('shed', 0):>7}")
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL, check=True,
+        ).stdout.decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(old_path, new_path, threshold):
+    """Print the change per scenario; returns how many got worse than `threshold`."""
+
+    with open(old_path) as f:
+        old = json.load(f)
+    with open(new_path) as f:
+        new = json.load(f)
+
+    print(f"{old.get('commit')} -> {new.get('commit')}")
+    print(f"{'scenario':<15}{'req/s':>16}{'p50 ms':>16}{'p95 ms':>16}{'p99 ms':>16}")
+    regressions = 0
+    for name, after in new["results"].items():
+        before = old["results"].get(name)
+        if before is None:
+            continue
+        cells = []
+        for key, higher_is_better in [("requests_per_second", True), ("p50_ms", False),
+                                      ("p95_ms", False), ("p99_ms", False)]:
+            a, b = before[key], after[key]
+            if not a or b is None:
+                cells.append(f"{'-':>16}")
+                continue
+            change = (b - a) / a
+            worse = change < -threshold if higher_is_better else change > threshold
+            regressions += worse
+            cells.append(f"{b:>9.1f} {change:>+5.0%}" + ("!" if worse else " "))
+        print(f"{name:<15}" + "".join(cells))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--scenarios", nargs="+", default=list(SCENARIOS), choices=list(SCENARIOS))
+    parser.add_argument("--concurrency", type=int, default=16, help="clients at once")
+    parser.add_argument("--duration", type=float, default=15, help="seconds per scenario")
+    parser.add_argument("--warmup", type=float, default=3, help="unmeasured seconds first")
+    parser.add_argument("--users", type=int, default=8, help="accounts to log in with")
+    parser.add_argument("--pages", type=int, default=50, help="listing pages to spread over")
+    parser.add_argument("--latency", type=float, default=0.1, help="upstream seconds per call")
+    parser.add_argument("--error-rate", type=float, default=0.0,
+                        help="share of upstream calls that fail with a 503")
+    parser.add_argument("--database", help="DATABASE_URL (default: a new SQLite file)")
+    parser.add_argument("--worker-class", default="gevent", choices=["gevent", "sync"])
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--url", help="drive this running app instead of starting one")
+    parser.add_argument("--json", help="write the results to this file")
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"),
+                        help="compare two --json files instead of running")
+    parser.add_argument("--threshold", type=float, default=0.1,
+                        help="relative change --compare flags as a regression")
+    args = parser.parse_args()
+
+    if args.compare:
+        sys.exit(1 if compare(*args.compare, args.threshold) else 0)
+
+    print(f"{'scenario':<15}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'errors':>8}{'shed':>7}")
+    if args.url:
+        results = bench(args.url.rstrip("/"), args)
+    else:
+        upstream = FakePetfinder(latency=args.latency, error_rate=args.error_rate)
+        upstream_url = upstream.start()
+        with tempfile.TemporaryDirectory() as workdir:
+            env = server_env(
+                upstream_url,
+                args.database or f"sqlite:///{os.path.join(workdir, 'bench.sqlite')}",
+                workdir,
+                GUNICORN_WORKER_CLASS=args.worker_class,
+                WEB_CONCURRENCY=args.workers,
+                GUNICORN_WORKER_CONNECTIONS=max(args.concurrency, 100),
+            )
+            prepare(env, args.users)
+            with running_server(env, args.port) as (base_url, _):
+                results = bench(base_url, args)
+
+    if args.json:
+        settings = {k: v for k, v in vars(args).items() if k not in ("json", "compare")}
+        if settings.get("database"):
+            settings["database"] = settings["database"].split(":")[0]
+        with open(args.json, "w") as f:
+            json.dump({
+                "commit": git_commit(),
+                "time": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+                "python": platform.python_version(),
+                "cpus": os.cpu_count(),
+                "settings": settings,
+                "results": results,
+            }, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+"""Measure bytes transferred per page view against a running server.
+
+Plays a browser: loads each page plus the same-origin stylesheets,
+scripts and images it references, then loads it again the way a browser
+with a warm cache would, skipping assets that are still fresh and
+sending If-None-Match / If-Modified-Since for the rest. Counts header and
+body bytes as they came over the wire, i.e. compressed.
+
+    python benchmarks/page_bytes.py http://localhost:5000 /animals/details/123 /organizations/1
+
+Log in first with --username/--password to measure the pages users see.
+"""
+
+import argparse
+import gzip
+import re
+import time
+from urllib.parse import urljoin, urlparse
+
+import requests
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+ASSET_RE = re.compile(rb'(?:href|src)="(/static/[^"]+)"')
+
+
+class Browser:
+    """Tiny HTTP cache that honours Cache-Control max-age and validators."""
+
+    def __init__(self, base_url):
+        self.base_url = base_url
+        self.session = requests.Session()
+        self.session.headers["Accept-Encoding"] = "gzip, br" if brotli else "gzip"
+        self.cache = {}
+
+    def get(self, path):
+        """Fetch `path`; returns (bytes over the wire, body, from_cache)."""
+
+        url = urljoin(self.base_url, path)
+        cached = self.cache.get(url)
+        headers = {}
+        if cached:
+            if cached["expires"] > time.time():
+                return 0, cached["body"], True
+            if cached["etag"]:
+                headers["If-None-Match"] = cached["etag"]
+            if cached["last_modified"]:
+                headers["If-Modified-Since"] = cached["last_modified"]
+
+        resp = self.session.get(url, headers=headers, stream=True)
+        raw = resp.raw.read(decode_content=False)
+        header_bytes = sum(len(k) + len(v) + 4 for k, v in resp.headers.items()) + 17
+
+        if resp.status_code == 304 and cached:
+            body = cached["body"]
+        else:
+            body = _decode(resp, raw)
+
+        cache_control = resp.headers.get("Cache-Control", "")
+        max_age = re.search(r"max-age=(\d+)", cache_control)
+        fresh_for = int(max_age.group(1)) if max_age and "no-cache" not in cache_control else 0
+        if "no-store" not in cache_control:
+            self.cache[url] = {
+                "body": body,
+                "etag": resp.headers.get("ETag") or (cached or {}).get("etag"),
+                "last_modified": resp.headers.get("Last-Modified"),
+                "expires": time.time() + fresh_for,
+            }
+        return header_bytes + len(raw), body, False
+
+
+def _decode(resp, raw):
+    encoding = resp.headers.get("Content-Encoding")
+    if encoding == "gzip":
+        return gzip.decompress(raw)
+    if encoding == "br":
+        return brotli.decompress(raw)
+    return raw
+
+
+def page_view(browser, path):
+    """Bytes for the page and its same-origin assets."""
+
+    total, body, _ = browser.get(path)
+    for asset in dict.fromkeys(ASSET_RE.findall(body)):
+        asset_path = asset.decode().replace("&amp;", "&")
+        if urlparse(asset_path).netloc:
+            continue
+        sent, _, _ = browser.get(asset_path)
+        total += sent
+    return total
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("base_url")
+    parser.add_argument("paths", nargs="+")
+    parser.add_argument("--username")
+    parser.add_argument("--password")
+    args = parser.parse_args()
+
+    browser = Browser(args.base_url)
+    if args.username:
+        browser.session.post(
+            urljoin(args.base_url, "/login"),
+            data={"username": args.username, "password": args.password},
+        )
+
+    print(f"{'page':<40}{'first view':>14}{'repeat view':>14}")
+    first_total = repeat_total = 0
+    for path in args.paths:
+        first = page_view(browser, path)
+        repeat = page_view(browser, path)
+        first_total += first
+        repeat_total += repeat
+        print(f"{path:<40}{first:>12} B{repeat:>12} B")
+    print(f"{'total':<40}{first_total:>12} B{repeat_total:>12} B")
+
+
+if __name__ == "__main__":
+    main()
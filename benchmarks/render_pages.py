@@ -0,0 +1,117 @@
+"""Time rendering the animal and organization listing pages.
+
+Renders each listing template with a full page of made-up records (no
+database rows or API calls are involved) and reports the median time
+per page three ways: without the card fragment cache, with an empty
+cache (first view of a page), and with a warm cache (later views, by
+any user).
+
+    python benchmarks/render_pages.py
+    python benchmarks/render_pages.py --runs 500 --json render.json
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+from flask import render_template  # noqa: E402
+
+from app import PER_PAGE, create_app  # noqa: E402
+from cache import MemoryBackend  # noqa: E402
+import fragments  # noqa: E402
+from pagination import Page  # noqa: E402
+
+DESCRIPTION = "Friendly &amp; playful, great with kids and other dogs. " * 3
+
+
+def make_animal(i):
+    return {
+        "id": 50000000 + i,
+        "name": f"Pet {i}",
+        "description": DESCRIPTION,
+        "photos": [{"medium": f"https://photos.petfinder.com/photos/pets/{i}/1/?width=300"}],
+        "status_changed_at": "2026-01-01T00:00:00+0000",
+    }
+
+
+def make_org(i):
+    return {
+        "id": f"TX{i:03d}",
+        "name": f"Rescue Society {i}",
+        "mission_statement": "We find loving homes for animals in need. " * 4,
+        "photos": [] if i % 3 else [{"medium": f"https://photos.petfinder.com/photos/organizations/{i}/1/?width=300"}],
+        "distance": i * 1.7,
+    }
+
+
+PAGES = {
+    "animals/index.html": lambda items, liked: dict(
+        animals=items, animal_likes=liked, types=[], selected_type=None,
+    ),
+    "organizations/index.html": lambda items, liked: dict(
+        organizations=items, org_likes=liked, states=["TX"],
+    ),
+}
+MAKERS = {"animals/index.html": make_animal, "organizations/index.html": make_org}
+
+
+def time_render(app, template, context, runs, before_each=None):
+    samples = []
+    with app.test_request_context("/"):
+        app.preprocess_request()
+        for _ in range(runs):
+            if before_each:
+                before_each()
+            start = time.perf_counter()
+            render_template(template, **context)
+            samples.append(time.perf_counter() - start)
+    return statistics.median(samples) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--runs", type=int, default=200)
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args()
+
+    app = create_app("production")
+    caches = [fragments.animal_cards, fragments.org_cards]
+
+    def clear():
+        for cache in caches:
+            cache.backend = MemoryBackend(cache.backend.max_bytes)
+
+    results = {}
+    print(f"{'page':<28}{'no cache':>12}{'cold':>12}{'warm':>12}")
+    for template, make_context in PAGES.items():
+        items = [MAKERS[template](i) for i in range(PER_PAGE)]
+        liked = {str(item["id"]) for item in items[::4]}
+        context = dict(make_context(items, liked), page=Page(items, 1, PER_PAGE, 500))
+
+        max_bytes = [cache.backend.max_bytes for cache in caches]
+        for cache in caches:
+            cache.backend = MemoryBackend(0)
+        uncached = time_render(app, template, context, args.runs)
+        for cache, size in zip(caches, max_bytes):
+            cache.backend = MemoryBackend(size)
+
+        cold = time_render(app, template, context, args.runs, before_each=clear)
+        warm = time_render(app, template, context, args.runs)
+
+        results[template] = {"uncached_ms": uncached, "cold_ms": cold, "warm_ms": warm}
+        print(f"{template:<28}{uncached:>9.2f} ms{cold:>9.2f} ms{warm:>9.2f} ms")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"runs": args.runs, "per_page": PER_PAGE, "pages": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""Benchmark local animal search and print the query plans it uses.
+
+Fills a scratch database with synthetic mirrored animals, then times
+combined-filter searches (first page and keyset follow-up pages) and
+prints the plan the database picked for each one.
+
+    python benchmarks/search_plans.py --rows 200000
+    BENCH_DATABASE_URL=postgresql:///adopt_a_pet_bench python benchmarks/search_plans.py
+
+Never point BENCH_DATABASE_URL at a database you care about: its tables
+are dropped and recreated.
+"""
+
+import argparse
+from datetime import datetime, timedelta
+import json
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ["DATABASE_URL"] = os.environ.get(
+    "BENCH_DATABASE_URL", "sqlite:////tmp/pet_adopter_bench.sqlite"
+)
+
+from app import create_app  # noqa: E402
+from models import db, Animal  # noqa: E402
+from search import animal_query, search_animals  # noqa: E402
+
+TYPES = ["Dog", "Cat", "Rabbit", "Bird", "Horse", "Small & Furry"]
+GENDERS = ["Male", "Female", "Unknown"]
+STATUSES = ["adoptable"] * 9 + ["adopted"]
+NAMES = ["Buddy", "Luna", "Max", "Bella", "Charlie", "Daisy", "Milo", "Coco", "Rocky", "Nala"]
+
+QUERIES = {
+    "no filters": {},
+    "type": {"type": "Dog"},
+    "type + gender": {"type": "Cat", "gender": "Female"},
+    "type + gender + name": {"type": "Dog", "gender": "Male", "name": "max"},
+    "organization": {"organization_id": "OR17"},
+    "description words": {"q": "house trained"},
+}
+
+
+def fill(rows, batch=5000):
+    db.drop_all()
+    db.create_all()
+
+    start = datetime(2026, 1, 1)
+    for offset in range(0, rows, batch):
+        db.session.bulk_insert_mappings(Animal, [
+            {
+                "id": str(i),
+                "name": f"{random.choice(NAMES)} {i}",
+                "description": random.choice(
+                    ["Loves walks", "House trained and calm", "Shy at first", "Good with kids"]
+                ),
+                "type": random.choice(TYPES),
+                "gender": random.choice(GENDERS),
+                "status": random.choice(STATUSES),
+                "organization_id": f"OR{random.randrange(500)}",
+                "published_at": start + timedelta(minutes=i),
+                "payload": json.dumps({"id": i, "photos": []}),
+            }
+            for i in range(offset, min(offset + batch, rows))
+        ])
+        db.session.commit()
+
+    if db.engine.dialect.name == "postgresql":
+        db.session.execute("ANALYZE animals")
+    else:
+        db.session.execute("ANALYZE")
+    db.session.commit()
+
+
+def plan(filters):
+    query = animal_query(filters).order_by(
+        Animal.published_at.desc(), Animal.id.desc()
+    ).limit(43)
+    compiled = query.statement.compile(db.engine, compile_kwargs={"literal_binds": True})
+
+    if db.engine.dialect.name == "postgresql":
+        rows = db.session.execute(f"EXPLAIN ANALYZE {compiled}")
+    else:
+        rows = db.session.execute(f"EXPLAIN QUERY PLAN {compiled}")
+    return "\n".join("    " + " ".join(str(col) for col in row) for row in rows)
+
+
+def time_ms(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--repeat", type=int, default=50)
+    parser.add_argument("--no-fill", action="store_true", help="reuse existing rows")
+    args = parser.parse_args()
+
+    with create_app().app_context():
+        if not args.no_fill:
+            print(f"filling {args.rows} animals into {db.engine.url} ...")
+            fill(args.rows)
+
+        for label, filters in QUERIES.items():
+            first = search_animals(filters)
+            first_ms = time_ms(lambda: search_animals(filters), args.repeat)
+            next_ms = None
+            if first.next_cursor:
+                next_ms = time_ms(
+                    lambda: search_animals(filters, cursor=first.next_cursor), args.repeat
+                )
+
+            print(f"\n{label}: {filters}")
+            print(f"  first page p50 {first_ms:.2f} ms", end="")
+            print(f", next page p50 {next_ms:.2f} ms" if next_ms is not None else "")
+            print(plan(filters))
+
+
+if __name__ == "__main__":
+    main()
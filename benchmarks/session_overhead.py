@@ -0,0 +1,128 @@
+"""Measure session cookie size and per-request session overhead.
+
+Compares Flask's signed-cookie session (SESSION_STORE=cookie) with the
+server-side store in sessions.py (SESSION_STORE=sql), for a logged-in
+user with a CSRF token, with and without a flashed message pending. For
+each it reports the bytes of the Cookie header the browser sends on
+every request, and the time to open and save the session for a request
+that only reads it and for one that changes it. The server-side store is
+timed with its in-memory LRU warm (the usual case) and cold (the first
+request a worker sees from that user).
+
+    python benchmarks/session_overhead.py
+    python benchmarks/session_overhead.py --runs 5000 --json sessions.json
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+from flask import request  # noqa: E402
+from flask.sessions import SecureCookieSessionInterface  # noqa: E402
+
+from app import create_app  # noqa: E402
+from cache import MemoryBackend  # noqa: E402
+from models import db  # noqa: E402
+import sessions  # noqa: E402
+
+LOGGED_IN = {
+    "curr_user": 12345,
+    "user_v": 1760000000000,
+    "csrf_token": "5e4c3f0c6a1b2d9e8f7a6b5c4d3e2f1a0b9c8d7e",
+}
+FLASHED = dict(LOGGED_IN, _flashes=[("success", "Hello, sammy_the_seal!")])
+
+
+def cookie_for(app, data):
+    """The session cookie value `app` would set for `data`."""
+
+    interface = app.session_interface
+    with app.test_request_context("/"):
+        session = interface.session_class(data)
+        session.modified = True
+        response = app.response_class()
+        interface.save_session(app, session, response)
+    header = response.headers["Set-Cookie"]
+    return header.split(";")[0].split("=", 1)[1]
+
+
+def time_request(app, cookie, runs, change=False, before_each=None):
+    """Median seconds to open and save the session for one request.
+
+    With `change`, each request changes the session and the next one
+    sends the cookie it got back, like a browser would.
+    """
+
+    interface = app.session_interface
+    samples = []
+    for _ in range(runs):
+        headers = {"Cookie": f"{app.session_cookie_name}={cookie}"}
+        with app.test_request_context("/", headers=headers):
+            if before_each:
+                before_each()
+            response = app.response_class()
+            start = time.perf_counter()
+            session = interface.open_session(app, request)
+            if change:
+                session["user_v"] = session["user_v"] + 1
+            interface.save_session(app, session, response)
+            samples.append(time.perf_counter() - start)
+        if "Set-Cookie" in response.headers:
+            cookie = response.headers["Set-Cookie"].split(";")[0].split("=", 1)[1]
+    return statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--runs", type=int, default=2000)
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args()
+
+    results = {}
+    for store in ("cookie", "sql"):
+        app = create_app("production")
+        app.config["SESSION_STORE"] = store
+        app.session_interface = SecureCookieSessionInterface()
+        sessions.init_app(app)
+
+        with app.app_context():
+            db.create_all()
+
+            for label, data in [("logged in", LOGGED_IN), ("+ flash", FLASHED)]:
+                cookie = cookie_for(app, data)
+                row = {
+                    "cookie_header_bytes": len(f"Cookie: {app.session_cookie_name}={cookie}"),
+                    "read_us": time_request(app, cookie, args.runs) * 1e6,
+                    "write_us": time_request(app, cookie, args.runs // 10, change=True) * 1e6,
+                }
+                if store == "sql":
+                    server_store = app.session_interface.store
+
+                    def clear():
+                        server_store.cache = MemoryBackend(server_store.cache.max_bytes)
+
+                    row["read_cold_us"] = time_request(
+                        app, cookie, args.runs, before_each=clear
+                    ) * 1e6
+                results[f"{store}, {label}"] = row
+
+    print(f"{'session':<22}{'Cookie header':>15}{'read':>12}{'read, cold':>13}{'write':>12}")
+    for name, r in results.items():
+        cold = f"{r['read_cold_us']:>10.1f} us" if "read_cold_us" in r else f"{'-':>13}"
+        print(f"{name:<22}{r['cookie_header_bytes']:>13} B{r['read_us']:>9.1f} us{cold}"
+              f"{r['write_us']:>9.1f} us")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"runs": args.runs, "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
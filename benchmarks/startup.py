@@ -0,0 +1,75 @@
+"""Measure worker startup: import time and resident memory of a fresh app.
+
+Each sample is a new Python process that builds the app the way a
+production worker does (`import wsgi`) and reports how long that took
+and its RSS afterwards.
+
+    python benchmarks/startup.py
+    python benchmarks/startup.py --env development --runs 10
+    python benchmarks/startup.py --preload numpy sympy   # cost of extra imports
+
+`--preload` imports the given modules first, to show what dependencies
+that are not needed to serve requests would add to every worker.
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PROBE = """
+import json, sys, time
+start = time.perf_counter()
+for name in sys.argv[1:]:
+    __import__(name)
+import wsgi
+elapsed = time.perf_counter() - start
+
+rss_kb = None
+try:
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                rss_kb = int(line.split()[1])
+except OSError:
+    import resource
+    rss_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+print(json.dumps({"seconds": elapsed, "rss_kb": rss_kb, "modules": len(sys.modules)}))
+"""
+
+
+def sample(env, preload):
+    out = subprocess.run(
+        [sys.executable, "-c", PROBE] + preload,
+        cwd=ROOT,
+        env=dict(os.environ, FLASK_ENV=env),
+        check=True,
+        stdout=subprocess.PIPE,
+    ).stdout
+    return json.loads(out.decode().strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--env", default="production", choices=["production", "development"])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--preload", nargs="*", default=[], help="modules to import first")
+    args = parser.parse_args()
+
+    samples = [sample(args.env, args.preload) for _ in range(args.runs)]
+    seconds = statistics.median(s["seconds"] for s in samples)
+    rss_mb = statistics.median(s["rss_kb"] for s in samples) / 1024
+
+    label = args.env + (f" + {' '.join(args.preload)}" if args.preload else "")
+    print(f"{label}: {args.runs} runs")
+    print(f"  startup p50 {seconds * 1000:.0f} ms")
+    print(f"  RSS p50     {rss_mb:.1f} MB per worker")
+    print(f"  modules     {samples[-1]['modules']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""Load test: sync vs gevent gunicorn workers in front of a slow Petfinder.
+
+Starts benchmarks/fake_petfinder.py with `--latency` seconds per call,
+then, for each worker class, runs gunicorn with gunicorn.conf.py and the
+same number of worker processes (so about the same memory) and keeps
+`--concurrency` clients requesting pages for `--duration` seconds. Every
+request uses a new query string, so each one misses the response cache
+and waits on the upstream call. Reports throughput, latency and the
+workers' resident memory.
+
+    python benchmarks/worker_load.py
+    python benchmarks/worker_load.py --workers 2 --concurrency 400 --json load.json
+    python benchmarks/worker_load.py --path "/animals/details/{n}"
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks.fake_petfinder import FakePetfinder  # noqa: E402
+from benchmarks.load_test import (  # noqa: E402
+    Client, prepare, run_load, running_server, server_env, worker_rss_kb,
+)
+
+
+def bench(worker_class, args, upstream_url, workdir):
+    env = server_env(
+        upstream_url, f"sqlite:///{os.path.join(workdir, worker_class)}.sqlite", workdir,
+        GUNICORN_WORKER_CLASS=worker_class,
+        WEB_CONCURRENCY=args.workers,
+        GUNICORN_WORKER_CONNECTIONS=max(args.concurrency, 100),
+    )
+    prepare(env, users=0)
+
+    def fetch(client, n):
+        return client.get(args.path.format(n=f"{id(client)}-{n}")).ok
+
+    with running_server(env, args.port) as (base_url, server):
+        # Load the taxonomy and compile templates in every worker first.
+        run_load(lambda i: Client(base_url), fetch, args.workers * 4, 2)
+        result = run_load(lambda i: Client(base_url), fetch, args.concurrency, args.duration)
+        result["rss_mb"] = worker_rss_kb(server.pid) / 1024
+        return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--workers", type=int, default=4, help="processes per worker class")
+    parser.add_argument("--concurrency", type=int, default=200, help="clients at once")
+    parser.add_argument("--duration", type=float, default=20, help="seconds per run")
+    parser.add_argument("--latency", type=float, default=0.2, help="upstream seconds per call")
+    parser.add_argument("--path", default="/animals/1?name=pet{n}",
+                        help="page to request; {n} is replaced with a unique request id")
+    parser.add_argument("--classes", nargs="+", default=["sync", "gevent"])
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args()
+
+    upstream = FakePetfinder(latency=args.latency)
+    upstream_url = upstream.start()
+
+    results = {}
+    with tempfile.TemporaryDirectory() as workdir:
+        for worker_class in args.classes:
+            results[worker_class] = bench(worker_class, args, upstream_url, workdir)
+
+    print(f"{args.workers} workers, {args.concurrency} clients, "
+          f"{args.latency * 1000:.0f} ms upstream latency")
+    print(f"{'workers':<10}{'RSS':>10}{'req/s':>10}{'p50':>12}{'p95':>12}{'errors':>8}")
+    for worker_class, r in results.items():
+        print(f"{worker_class:<10}{r['rss_mb']:>7.1f} MB{r['requests_per_second']:>10.1f}"
+              f"{r['p50_ms'] or 0:>9.0f} ms{r['p95_ms'] or 0:>9.0f} ms{r['errors']:>8}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"settings": vars(args), "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
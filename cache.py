@@ -0,0 +1,320 @@
+"""TTL response cache for Petfinder API calls."""
+
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+import json
+import os
+import sqlite3
+import threading
+import time
+
+
+class MemoryBackend:
+    """In-process LRU cache bounded by the total size of stored values."""
+
+    def __init__(self, max_bytes=32 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Return (value, stored_at, expires_at) or None."""
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[2] <= time.time():
+                self._remove(key)
+                return None
+            self._entries.move_to_end(key)
+            return entry
+
+    def set(self, key, value, stored_at, expires_at):
+        if len(value) > self.max_bytes:
+            return
+
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (value, stored_at, expires_at)
+            self.size += len(value)
+            while self.size > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+
+    def delete(self, key):
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+
+    def _remove(self, key):
+        value, _, _ = self._entries.pop(key)
+        self.size -= len(value)
+
+
+class SQLiteConnection:
+    """One connection to a SQLite file per process, used by one caller at a time.
+
+    Not one per thread: under gevent every request is a greenlet with its
+    own `threading.local`, which would mean a connection per request.
+    sqlite3 blocks in C, so while it waits on another process's write lock
+    (up to `timeout` seconds) nothing else in a gevent worker runs; keep
+    work done under `connect()` short.
+    """
+
+    def __init__(self, path, *pragmas, timeout=5):
+        self.path = path
+        self.pragmas = pragmas
+        self.timeout = timeout
+        self._conn = None
+        self._pid = None
+        self._lock = threading.RLock()
+
+    @contextmanager
+    def connect(self):
+        with self._lock:
+            # A connection must not be used on both sides of a fork.
+            if self._pid != os.getpid():
+                self._conn = sqlite3.connect(
+                    self.path, timeout=self.timeout, isolation_level=None,
+                    check_same_thread=False,
+                )
+                for pragma in self.pragmas:
+                    self._conn.execute(pragma)
+                self._pid = os.getpid()
+            yield self._conn
+
+
+class SQLiteBackend:
+    """Cache stored in a SQLite file, shared by every worker on the box.
+
+    Entries are evicted least-recently-used once their total size passes
+    `max_bytes`.
+    """
+
+    # Only record a hit if the last one is older than this, so reads don't
+    # all take the write lock
+    TOUCH_INTERVAL = 60
+
+    def __init__(self, path, max_bytes=256 * 1024 * 1024):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._db = SQLiteConnection(
+            path, "PRAGMA journal_mode=WAL", "PRAGMA synchronous=NORMAL"
+        )
+        with self._db.connect() as conn:
+            conn.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS response_cache (
+                    key TEXT PRIMARY KEY,
+                    value BLOB NOT NULL,
+                    size INTEGER NOT NULL,
+                    stored_at REAL NOT NULL,
+                    expires_at REAL NOT NULL,
+                    accessed_at REAL NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS response_cache_accessed_at
+                    ON response_cache (accessed_at);
+                """
+            )
+
+    def get(self, key):
+        with self._db.connect() as conn:
+            row = conn.execute(
+                "SELECT value, stored_at, expires_at, accessed_at FROM response_cache"
+                " WHERE key = ?",
+                (key,),
+            ).fetchone()
+            if row is None:
+                return None
+
+            now = time.time()
+            if row[2] <= now:
+                conn.execute("DELETE FROM response_cache WHERE key = ?", (key,))
+                return None
+
+            if now - row[3] > self.TOUCH_INTERVAL:
+                conn.execute(
+                    "UPDATE response_cache SET accessed_at = ? WHERE key = ?", (now, key)
+                )
+        return bytes(row[0]), row[1], row[2]
+
+    def set(self, key, value, stored_at, expires_at):
+        if len(value) > self.max_bytes:
+            return
+
+        with self._db.connect() as conn, conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO response_cache VALUES (?, ?, ?, ?, ?, ?)",
+                (key, value, len(value), stored_at, expires_at, time.time()),
+            )
+            self._evict(conn)
+
+    def delete(self, key):
+        with self._db.connect() as conn:
+            conn.execute("DELETE FROM response_cache WHERE key = ?", (key,))
+
+    def _evict(self, conn):
+        conn.execute("DELETE FROM response_cache WHERE expires_at <= ?", (time.time(),))
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM response_cache").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+
+        freed = 0
+        doomed = []
+        for key, size in conn.execute(
+            "SELECT key, size FROM response_cache ORDER BY accessed_at"
+        ):
+            doomed.append((key,))
+            freed += size
+            if total - freed <= self.max_bytes:
+                break
+        conn.executemany("DELETE FROM response_cache WHERE key = ?", doomed)
+
+
+def backend_from_url(url):
+    """Build a backend from a setting like "memory" or "sqlite:////tmp/cache.db"."""
+
+    if not url or url == "memory":
+        return MemoryBackend()
+    if url.startswith("sqlite:///"):
+        return SQLiteBackend(url[len("sqlite:///"):])
+    raise ValueError(f"Unknown cache backend: {url}")
+
+
+def endpoint_name(path):
+    """Name the endpoint a path belongs to, for looking up its TTL.
+
+    "/animals" -> "animals", "/animals/123" -> "animals/:id",
+    "/types/dog/breeds" -> "types/:id/breeds".
+    """
+
+    parts = path.strip("/").split("/")
+    return "/".join(part if i % 2 == 0 else ":id" for i, part in enumerate(parts))
+
+
+class ResponseCache:
+    """Cache JSON responses keyed on endpoint + normalized params.
+
+    A cached entry is fresh for the endpoint's TTL. After that it is still
+    served for up to `stale_ttl` more seconds while a background thread
+    fetches a new copy (stale-while-revalidate). Background fetches run
+    inside `background()`, if given, a context manager factory.
+    """
+
+    DEFAULT_TTLS = {
+        "animals": 300,
+        "animals/:id": 900,
+        "organizations": 900,
+        "organizations/:id": 3600,
+        "types": 86400,
+        "types/:id": 86400,
+        "types/:id/breeds": 86400,
+    }
+
+    def __init__(self, fetch, backend=None, ttls=None, default_ttl=300,
+                 stale_ttl=600, refresh_workers=2, background=None):
+        self.fetch = fetch
+        self.background = background
+        self.backend = backend or MemoryBackend()
+        self.ttls = dict(self.DEFAULT_TTLS, **(ttls or {}))
+        self.default_ttl = default_ttl
+        self.stale_ttl = stale_ttl
+        self.hits = self.stale_hits = self.misses = 0
+        self._refreshing = set()
+        self._lock = threading.Lock()
+        self._refresher = ThreadPoolExecutor(
+            max_workers=refresh_workers, thread_name_prefix="cache-refresh"
+        )
+
+    @staticmethod
+    def make_key(path, params=None):
+        """Normalize path and params so equivalent requests share an entry."""
+
+        items = sorted(
+            (str(k), str(v).strip())
+            for k, v in (params or {}).items()
+            if v is not None and str(v).strip() != ""
+        )
+        return json.dumps([path.rstrip("/"), items], separators=(",", ":"))
+
+    def get_json(self, path, params=None):
+        """Return the JSON body for `path`, from cache when possible."""
+
+        key = self.make_key(path, params)
+        entry = self.backend.get(key)
+        now = time.time()
+
+        if entry is not None:
+            value, stored_at, _ = entry
+            if now < stored_at + self.ttl_for(path):
+                self.hits += 1
+            else:
+                self.stale_hits += 1
+                self._refresh_in_background(key, path, params)
+            return json.loads(value)
+
+        self.misses += 1
+        return self._fetch_and_store(key, path, params)
+
+    def prefetch(self, path, params=None):
+        """Warm the entry for `path` in the background if it is not cached."""
+
+        key = self.make_key(path, params)
+        if self.backend.get(key) is None:
+            self._refresh_in_background(key, path, dict(params or {}))
+
+    def ttl_for(self, path):
+        return self.ttls.get(endpoint_name(path), self.default_ttl)
+
+    def invalidate(self, path, params=None):
+        self.backend.delete(self.make_key(path, params))
+
+    def snapshot(self):
+        return {"hits": self.hits, "stale_hits": self.stale_hits, "misses": self.misses}
+
+    def _fetch_and_store(self, key, path, params):
+        data = self.fetch(path, params=params)
+        now = time.time()
+        self.backend.set(
+            key,
+            json.dumps(data, separators=(",", ":")).encode(),
+            now,
+            now + self.ttl_for(path) + self.stale_ttl,
+        )
+        return data
+
+    def _refresh_in_background(self, key, path, params):
+        with self._lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+
+        def refresh():
+            try:
+                if self.background is None:
+                    self._fetch_and_store(key, path, params)
+                else:
+                    with self.background():
+                        self._fetch_and_store(key, path, params)
+            except Exception:
+                # Keep serving the stale copy; the next hit will try again.
+                pass
+            finally:
+                with self._lock:
+                    self._refreshing.discard(key)
+
+        self._refresher.submit(refresh)
+
+
+def cache_from_env(fetch, background=None):
+    """Build the app's response cache from PETFINDER_CACHE_* settings."""
+
+    return ResponseCache(
+        fetch,
+        background=background,
+        backend=backend_from_url(os.environ.get("PETFINDER_CACHE_URL", "memory")),
+        stale_ttl=int(os.environ.get("PETFINDER_CACHE_STALE_TTL", 600)),
+    )
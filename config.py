@@ -0,0 +1,101 @@
+"""Settings for Pet Adopter, one class per environment.
+
+`create_app()` picks the class named by FLASK_ENV ("development" or
+"production", the default) unless it is handed one.
+"""
+
+from datetime import timedelta
+import os
+import tempfile
+
+
+class Config:
+    """Settings shared by every environment."""
+
+    # Get DB_URI from environ variable (useful for production/testing) or,
+    # if not set there, use development local db.
+    SQLALCHEMY_DATABASE_URI = os.environ.get("DATABASE_URL", "postgresql:///adopt_a_pet")
+    SQLALCHEMY_TRACK_MODIFICATIONS = False
+    SQLALCHEMY_ECHO = False
+
+    SECRET_KEY = os.environ.get("SECRET_KEY", "it's a secret")
+    PERMANENT_SESSION_LIFETIME = timedelta(minutes=60)
+
+    # "api" proxies listings to Petfinder; "mirror" serves them from the tables
+    # filled by sync.py and only calls the API when the mirror has nothing.
+    LISTING_SOURCE = os.environ.get("LISTING_SOURCE", "api")
+    # Mirrored animals no sync has seen for this long are left out of
+    # listings; keep it above sync.py's SYNC_REFRESH_HOURS. 0 keeps them.
+    MIRROR_MAX_AGE_HOURS = float(os.environ.get("MIRROR_MAX_AGE_HOURS", 48))
+
+    # bcrypt work factor for new hashes; older hashes are upgraded at login.
+    BCRYPT_LOG_ROUNDS = int(os.environ.get("BCRYPT_LOG_ROUNDS", 12))
+
+    # Processes that hash passwords; 0 hashes on the request thread.
+    PASSWORD_HASH_WORKERS = int(os.environ.get("PASSWORD_HASH_WORKERS", os.cpu_count() or 1))
+
+    # Resized pet photos served by /images; shared by every worker on the box.
+    IMAGE_CACHE_DIR = os.environ.get(
+        "IMAGE_CACHE_DIR", os.path.join(tempfile.gettempdir(), "pet-adopter-images")
+    )
+    IMAGE_CACHE_MAX_BYTES = int(os.environ.get("IMAGE_CACHE_MAX_BYTES", 512 * 1024 * 1024))
+    # Extra hosts, comma separated, the proxy may fetch from.
+    IMAGE_PROXY_HOSTS = [h for h in os.environ.get("IMAGE_PROXY_HOSTS", "").split(",") if h]
+
+    # Rendered listing cards, kept per process (see fragments.py).
+    FRAGMENT_CACHE_TTL = int(os.environ.get("FRAGMENT_CACHE_TTL", 900))
+    FRAGMENT_CACHE_MAX_BYTES = int(os.environ.get("FRAGMENT_CACHE_MAX_BYTES", 16 * 1024 * 1024))
+    # Compile every template at startup instead of on first use, caching
+    # the result on disk for the other workers.
+    PRECOMPILE_TEMPLATES = True
+    TEMPLATE_BYTECODE_DIR = os.environ.get(
+        "TEMPLATE_BYTECODE_DIR", os.path.join(tempfile.gettempdir(), "pet-adopter-templates")
+    )
+
+    # "sql" keeps session data in the sessions table and only an id in the
+    # cookie (see sessions.py); "cookie" is Flask's signed-cookie session.
+    SESSION_STORE = os.environ.get("SESSION_STORE", "sql")
+    # Recently used sessions kept in memory by each worker
+    SESSION_CACHE_MAX_BYTES = int(os.environ.get("SESSION_CACHE_MAX_BYTES", 8 * 1024 * 1024))
+    # ...and read from the table again after this many seconds, so a change
+    # made through another worker (e.g. a logout) is never missed for longer
+    SESSION_CACHE_SECONDS = int(os.environ.get("SESSION_CACHE_SECONDS", 30))
+
+    # Send each request's time split (Petfinder, SQL, templates, bcrypt) in a
+    # Server-Timing header; /metrics has the same split as histograms.
+    SERVER_TIMING = os.environ.get("SERVER_TIMING", "1") == "1"
+    # Requests slower than this are logged with that split, at most
+    # SLOW_REQUEST_SAMPLE_RATE of them to keep the log volume down.
+    SLOW_REQUEST_SECONDS = float(os.environ.get("SLOW_REQUEST_SECONDS", 1.0))
+    SLOW_REQUEST_SAMPLE_RATE = float(os.environ.get("SLOW_REQUEST_SAMPLE_RATE", 1.0))
+
+    DEBUG_TB_ENABLED = False
+
+
+class DevelopmentConfig(Config):
+    DEBUG = True
+    # Template edits should show up on the next reload
+    FRAGMENT_CACHE_MAX_BYTES = 0
+    PRECOMPILE_TEMPLATES = False
+    DEBUG_TB_ENABLED = True
+    DEBUG_TB_INTERCEPT_REDIRECTS = False
+
+
+class ProductionConfig(Config):
+    DEBUG = False
+
+
+configs = {
+    "development": DevelopmentConfig,
+    "production": ProductionConfig,
+}
+
+
+def get_config(config=None):
+    """Config class for `config`: a class, a name in `configs`, or None for $FLASK_ENV."""
+
+    if config is None:
+        config = os.environ.get("FLASK_ENV", "production")
+    if isinstance(config, str):
+        return configs[config]
+    return config
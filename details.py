@@ -0,0 +1,155 @@
+"""Read-through store for animal and organization detail records.
+
+Detail pages read the record's full API payload from the local table
+(one primary-key lookup). A missing record is fetched from Petfinder and
+stored; a stale one is served as is while a background thread refreshes
+it. Petfinder's 404s (adopted or removed animals, unknown ids) are
+remembered for a while so they are not asked about again.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+import json
+import threading
+import time
+
+from sqlalchemy.exc import IntegrityError
+
+from mirror import animal_columns, org_columns
+from models import db, Animal, Organization
+from petfinder import petfinder_cache, petfinder_client, PetfinderError
+from quota import QuotaExhausted, priority
+
+
+class DetailStore:
+    """Payloads of one kind of record (`model`), read through to the API.
+
+    `path` is the API path with a `{}` for the id and `key` the field of
+    the response holding the record.
+    """
+
+    def __init__(self, model, path, key, to_columns, ttl=timedelta(minutes=15),
+                 missing_ttl=3600, refresh_workers=2):
+        self.model = model
+        self.path = path
+        self.key = key
+        self.to_columns = to_columns
+        self.ttl = ttl
+        self.missing_ttl = missing_ttl
+        # 404s are remembered in the response cache's backend, so workers
+        # share them whenever they share the cache.
+        self.missing = petfinder_cache.backend
+        self.app = None
+        self._refreshing = set()
+        self._lock = threading.Lock()
+        self._refresher = ThreadPoolExecutor(
+            max_workers=refresh_workers, thread_name_prefix=f"{key}-refresh"
+        )
+
+    def init_app(self, app):
+        self.app = app
+
+    def get(self, item_id):
+        """The record's payload. Raises PetfinderError (404 if it is gone)."""
+
+        item_id = str(item_id)
+        row = self.model.query.get(item_id)
+        if row is not None and row.payload is not None:
+            if self._is_stale(row):
+                self.refresh_in_background(item_id)
+            return json.loads(row.payload)
+
+        path = self.path.format(item_id)
+        if self.missing.get(self._missing_key(item_id)) is not None:
+            raise PetfinderError(404, path)
+
+        try:
+            payload = petfinder_cache.get_json(path)[self.key]
+        except PetfinderError as e:
+            if e.status_code == 404:
+                self._remember_missing(item_id)
+            raise
+
+        self._store(row, item_id, payload)
+        try:
+            db.session.commit()
+        except IntegrityError:
+            # Another request stored it first; theirs is as good as ours.
+            db.session.rollback()
+        return payload
+
+    def prefetch(self, item_id):
+        """Fetch the record in the background unless it is stored and fresh."""
+
+        row = self.model.query.get(str(item_id))
+        if row is None or row.payload is None or self._is_stale(row):
+            self.refresh_in_background(str(item_id))
+
+    def refresh_in_background(self, item_id):
+        with self._lock:
+            if self.app is None or item_id in self._refreshing:
+                return
+            self._refreshing.add(item_id)
+        self._refresher.submit(self._refresh, item_id)
+
+    def _refresh(self, item_id):
+        try:
+            with self.app.app_context(), priority("background"):
+                try:
+                    payload = petfinder_client.get(self.path.format(item_id))[self.key]
+                except PetfinderError as e:
+                    if e.status_code == 404:
+                        self._forget(item_id)
+                    return
+                except (QuotaExhausted, OSError, KeyError, ValueError):
+                    return
+
+                self._store(self.model.query.get(item_id), item_id, payload)
+                db.session.commit()
+        finally:
+            with self._lock:
+                self._refreshing.discard(item_id)
+
+    def _store(self, row, item_id, payload):
+        if row is None:
+            row = self.model(id=item_id)
+            db.session.add(row)
+        for column, value in self.to_columns(payload).items():
+            setattr(row, column, value)
+        row.updated_at = datetime.utcnow()
+
+    def _forget(self, item_id):
+        """Petfinder no longer has the record: keep the row, drop its payload."""
+
+        row = self.model.query.get(item_id)
+        if row is not None:
+            # The row stays for the likes that point at it, and keeps its
+            # name and picture for saved lists. Without a payload it leaves
+            # mirrored listings and detail pages answer 404.
+            row.payload = None
+            row.updated_at = datetime.utcnow()
+            db.session.commit()
+        self._remember_missing(item_id)
+
+    def _is_stale(self, row):
+        return row.updated_at is None or row.updated_at < datetime.utcnow() - self.ttl
+
+    def _missing_key(self, item_id):
+        return f"missing:{self.key}:{item_id}"
+
+    def _remember_missing(self, item_id):
+        now = time.time()
+        self.missing.set(self._missing_key(item_id), b"1", now, now + self.missing_ttl)
+
+
+animal_store = DetailStore(Animal, "/animals/{}", "animal", animal_columns)
+
+organization_store = DetailStore(
+    Organization, "/organizations/{}", "organization", org_columns,
+    ttl=timedelta(hours=1),
+)
+
+
+def init_app(app):
+    animal_store.init_app(app)
+    organization_store.init_app(app)
@@ -0,0 +1,110 @@
+"""Cached HTML for listing cards.
+
+A page of animals or organizations is 42 cards that look the same for
+every user but for the like button. Each card is rendered once per
+version of its upstream record and kept in memory; per request only the
+like button's class is filled in.
+"""
+
+import hashlib
+import json
+import os
+import time
+
+from flask import current_app
+from jinja2 import FileSystemBytecodeCache
+from markupsafe import Markup
+
+from cache import MemoryBackend
+
+# Stands in for the like button's class in cached cards
+LIKE_SLOT = "__like_class__"
+
+
+def animal_version(animal):
+    """Petfinder bumps status_changed_at when an animal's listing changes."""
+
+    return animal.get("status_changed_at") or animal.get("published_at")
+
+
+def org_version(org):
+    """Organizations have no timestamp, so use what the card shows."""
+
+    photo = org["photos"][0].get("medium") if org.get("photos") else None
+    fields = [org.get("name"), org.get("mission_statement"), photo, org.get("distance")]
+    return hashlib.md5(json.dumps(fields).encode()).hexdigest()
+
+
+class FragmentCache:
+    """Renders a card once per (item id, version) and reuses the HTML.
+
+    `template` defines a macro `card(item, like_class)` that prints
+    `like_class` as the like button's class. Entries also expire after
+    `ttl` seconds, to pick up edits that do not change the version.
+    """
+
+    def __init__(self, template, version, ttl=900, max_bytes=16 * 1024 * 1024):
+        self.template = template
+        self.version = version
+        self.ttl = ttl
+        self.backend = MemoryBackend(max_bytes)
+
+    def init_app(self, app):
+        self.ttl = app.config.get("FRAGMENT_CACHE_TTL", self.ttl)
+        self.backend = MemoryBackend(
+            app.config.get("FRAGMENT_CACHE_MAX_BYTES", self.backend.max_bytes)
+        )
+
+    def render(self, items, liked):
+        """HTML for every card in `items`; ids in `liked` get a red heart."""
+
+        card = None
+        cards = []
+        for item in items:
+            key = f"{item['id']}:{self.version(item)}"
+            entry = self.backend.get(key)
+            if entry is not None:
+                html = entry[0]
+            else:
+                if card is None:
+                    card = current_app.jinja_env.get_template(self.template).module.card
+                html = str(card(item, LIKE_SLOT))
+                now = time.time()
+                self.backend.set(key, html, now, now + self.ttl)
+
+            # The slot is the last thing in the card that comes from a
+            # template rather than upstream text, so rpartition finds it.
+            head, _, tail = html.rpartition(LIKE_SLOT)
+            like_class = "btn-danger" if str(item["id"]) in liked else "btn-secondary"
+            cards.append(head + like_class + tail)
+
+        return Markup("\n".join(cards))
+
+
+animal_cards = FragmentCache("animals/card.html", animal_version)
+org_cards = FragmentCache("organizations/card.html", org_version)
+
+
+def precompile_templates(app):
+    """Compile every template now rather than on the first request for it.
+
+    With TEMPLATE_BYTECODE_DIR set, compiled templates are also kept on
+    disk, so later workers and restarts load them instead of compiling.
+    """
+
+    env = app.jinja_env
+    directory = app.config.get("TEMPLATE_BYTECODE_DIR")
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+        env.bytecode_cache = FileSystemBytecodeCache(directory)
+    for name in env.list_templates(extensions=["html"]):
+        env.get_template(name)
+
+
+def init_app(app):
+    animal_cards.init_app(app)
+    org_cards.init_app(app)
+    app.add_template_global(animal_cards, "animal_cards")
+    app.add_template_global(org_cards, "org_cards")
+    if app.config.get("PRECOMPILE_TEMPLATES"):
+        precompile_templates(app)
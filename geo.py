@@ -0,0 +1,207 @@
+"""Offline geocoding and "near me" radius search."""
+
+from collections import defaultdict
+import csv
+import gzip
+import math
+import os
+import threading
+import time
+
+from models import db, Organization
+
+ZIP_CENTROIDS_PATH = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "data", "zip_centroids.csv.gz"
+)
+
+EARTH_RADIUS_MILES = 3958.8
+
+
+class Gazetteer:
+    """ZIP code and city centroids from the bundled ZIP table."""
+
+    def __init__(self, path=ZIP_CENTROIDS_PATH):
+        self.path = path
+        self._zips = None
+        self._cities = None
+        self._lock = threading.Lock()
+
+    def geocode(self, postcode=None, city=None, state=None):
+        """(lat, lon) for a ZIP code, or else for a city + state; None if unknown."""
+
+        self._load()
+
+        if postcode:
+            point = self._zips.get(str(postcode).strip()[:5])
+            if point:
+                return point
+        if city and state:
+            return self._cities.get((city.strip().lower(), state.strip().upper()))
+        return None
+
+    def parse(self, location):
+        """Geocode free text like "78701" or "Austin, TX"."""
+
+        if not location:
+            return None
+        location = location.strip()
+        if location[:5].isdigit():
+            return self.geocode(postcode=location)
+        if "," in location:
+            city, state = location.rsplit(",", 1)
+            return self.geocode(city=city, state=state)
+        return None
+
+    def _load(self):
+        if self._zips is not None:
+            return
+
+        with self._lock:
+            if self._zips is not None:
+                return
+
+            zips = {}
+            city_points = defaultdict(list)
+            with gzip.open(self.path, "rt", newline="") as f:
+                for row in csv.DictReader(f):
+                    point = (float(row["lat"]), float(row["lon"]))
+                    zips[row["zip"]] = point
+                    city_points[(row["city"].lower(), row["state"])].append(point)
+
+            self._cities = {
+                key: (
+                    sum(lat for lat, _ in points) / len(points),
+                    sum(lon for _, lon in points) / len(points),
+                )
+                for key, points in city_points.items()
+            }
+            self._zips = zips
+
+
+def distance_miles(lat1, lon1, lat2, lon2):
+    """Great-circle (haversine) distance between two points."""
+
+    lat1, lon1, lat2, lon2 = map(math.radians, (lat1, lon1, lat2, lon2))
+    a = (
+        math.sin((lat2 - lat1) / 2) ** 2
+        + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_MILES * math.asin(math.sqrt(a))
+
+
+class GridIndex:
+    """In-memory spatial index: points bucketed into lat/lon grid cells.
+
+    A radius query only looks at the cells overlapping the circle's
+    bounding box, then checks exact distances for the points in them.
+    """
+
+    def __init__(self, cell_degrees=0.25):
+        self.cell_degrees = cell_degrees
+        self.size = 0
+        self._cells = defaultdict(list)
+
+    def insert(self, key, lat, lon):
+        self._cells[self._cell(lat, lon)].append((key, lat, lon))
+        self.size += 1
+
+    def within(self, lat, lon, radius_miles, limit=None):
+        """[(distance, key)] for points within `radius_miles`, nearest first."""
+
+        lat_span = radius_miles / 69.0
+        lon_span = radius_miles / max(69.0 * math.cos(math.radians(lat)), 1e-6)
+        min_row, min_col = self._cell(lat - lat_span, lon - lon_span)
+        max_row, max_col = self._cell(lat + lat_span, lon + lon_span)
+
+        found = []
+        for row in range(min_row, max_row + 1):
+            for col in range(min_col, max_col + 1):
+                for key, p_lat, p_lon in self._cells.get((row, col), ()):
+                    if abs(p_lat - lat) > lat_span or abs(p_lon - lon) > lon_span:
+                        continue
+                    distance = distance_miles(lat, lon, p_lat, p_lon)
+                    if distance <= radius_miles:
+                        found.append((distance, key))
+
+        found.sort()
+        return found[:limit] if limit else found
+
+    def _cell(self, lat, lon):
+        return (
+            math.floor(lat / self.cell_degrees),
+            math.floor(lon / self.cell_degrees),
+        )
+
+
+class OrganizationLocator:
+    """Radius queries over organizations that have coordinates.
+
+    Uses PostGIS when the database has it, otherwise a GridIndex built
+    from the organizations table and rebuilt every `max_age` seconds.
+    """
+
+    def __init__(self, max_age=900):
+        self.max_age = max_age
+        self._index = None
+        self._built_at = 0
+        self._postgis = None
+        self._lock = threading.Lock()
+
+    def nearby(self, lat, lon, radius_miles, limit=None):
+        """[(distance, org_id)] within `radius_miles`, nearest first."""
+
+        if self._has_postgis():
+            return self._nearby_postgis(lat, lon, radius_miles, limit)
+        return self._grid().within(lat, lon, radius_miles, limit)
+
+    def invalidate(self):
+        self._built_at = 0
+
+    def _grid(self):
+        if self._index is None or time.time() - self._built_at > self.max_age:
+            with self._lock:
+                if self._index is None or time.time() - self._built_at > self.max_age:
+                    index = GridIndex()
+                    for org_id, lat, lon in db.session.query(
+                        Organization.id, Organization.latitude, Organization.longitude
+                    ).filter(Organization.latitude.isnot(None)):
+                        index.insert(org_id, lat, lon)
+                    self._index = index
+                    self._built_at = time.time()
+        return self._index
+
+    def _has_postgis(self):
+        if self._postgis is None:
+            self._postgis = db.engine.dialect.name == "postgresql" and bool(
+                db.session.execute(
+                    "SELECT 1 FROM pg_extension WHERE extname = 'postgis'"
+                ).scalar()
+            )
+        return self._postgis
+
+    def _nearby_postgis(self, lat, lon, radius_miles, limit):
+        # Matches the ix_organizations_geog expression index.
+        rows = db.session.execute(
+            """
+            SELECT ST_Distance(geog, here) / 1609.344 AS miles, id FROM (
+                SELECT id,
+                       geography(ST_SetSRID(ST_MakePoint(longitude, latitude), 4326)) AS geog,
+                       geography(ST_SetSRID(ST_MakePoint(:lon, :lat), 4326)) AS here
+                FROM organizations
+                WHERE latitude IS NOT NULL
+                  AND ST_DWithin(
+                      geography(ST_SetSRID(ST_MakePoint(longitude, latitude), 4326)),
+                      geography(ST_SetSRID(ST_MakePoint(:lon, :lat), 4326)),
+                      :meters)
+            ) AS near
+            ORDER BY miles
+            LIMIT :limit
+            """,
+            {"lat": lat, "lon": lon, "meters": radius_miles * 1609.344,
+             "limit": limit or 1000000},
+        )
+        return [(miles, org_id) for miles, org_id in rows]
+
+
+gazetteer = Gazetteer()
+organization_locator = OrganizationLocator()
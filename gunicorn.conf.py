@@ -0,0 +1,49 @@
+"""Gunicorn settings for production: `gunicorn -c gunicorn.conf.py wsgi:app`.
+
+Workers are gevent workers by default. Most of a listing or detail
+request is spent waiting on Petfinder, and a gevent worker serves other
+requests during that wait instead of sitting idle, so one process keeps
+hundreds of upstream calls in flight. The worker patches the standard
+library before the app is imported, so requests, threading and
+time.sleep yield to other requests; psycopg2 is made cooperative in
+`post_fork`.
+
+sqlite3 is not: it blocks in C, so a worker waiting on another
+process's lock on one of the SQLite files (cache, quota, login throttle,
+image index) stalls every request it is serving, for up to the 5 s busy
+timeout. Each of those stores uses one connection per process (see
+cache.SQLiteConnection), not one per request greenlet, and requests in a
+worker take turns on it through a lock that gevent does make
+cooperative. Where the cross-worker waits matter, the response cache and
+login throttle can use their memory backends (state then per worker).
+
+GUNICORN_WORKER_CLASS=sync goes back to one request per worker process.
+"""
+
+import os
+
+bind = os.environ.get("GUNICORN_BIND", f"0.0.0.0:{os.environ.get('PORT', 8000)}")
+worker_class = os.environ.get("GUNICORN_WORKER_CLASS", "gevent")
+workers = int(os.environ.get("WEB_CONCURRENCY", (os.cpu_count() or 1) + 1))
+# Requests a gevent worker serves at once
+worker_connections = int(os.environ.get("GUNICORN_WORKER_CONNECTIONS", 500))
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", 30))
+keepalive = 5
+
+if worker_class == "gevent":
+    # With sync workers these cap the whole process at a few upstream calls
+    # at a time; a gevent worker needs room for many. Petfinder's rate limit
+    # is still enforced by the quota (PETFINDER_RATE_PER_SECOND).
+    os.environ.setdefault("PETFINDER_MAX_CONCURRENCY", "100")
+    os.environ.setdefault("PETFINDER_POOL_SIZE", "100")
+
+
+def post_fork(server, worker):
+    if worker_class != "gevent":
+        return
+    try:
+        from psycogreen.gevent import patch_psycopg
+        patch_psycopg()
+    except ImportError:
+        # No psycopg2 (e.g. SQLite) or no psycogreen: nothing to patch.
+        pass
@@ -0,0 +1,152 @@
+"""HTTP caching and compression: cache policies, ETags, static fingerprints."""
+
+from datetime import timezone
+import gzip
+import hashlib
+import json
+import os
+
+from flask import current_app, g, make_response, render_template, request, session
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Fingerprinted static files never change under the same URL
+STATIC_IMMUTABLE = "public, max-age=31536000, immutable"
+STATIC_DEFAULT = "public, max-age=3600"
+# Pages show the logged-in user, so only the browser may keep them, and it
+# has to revalidate (cheaply, via the ETag) before reuse.
+PAGE_DEFAULT = "private, no-cache"
+
+COMPRESSIBLE = {
+    "text/html", "text/plain", "application/json", "text/css", "application/javascript",
+}
+MIN_COMPRESS_BYTES = 500
+
+_fingerprints = {}
+
+
+def static_url(filename):
+    """URL for a file under static/ that changes whenever the file does."""
+
+    path = os.path.join(current_app.static_folder, filename)
+    try:
+        mtime = os.path.getmtime(path)
+    except OSError:
+        return f"/static/{filename}"
+
+    cached = _fingerprints.get(path)
+    if cached is None or cached[0] != mtime:
+        with open(path, "rb") as f:
+            cached = _fingerprints[path] = (mtime, hashlib.md5(f.read()).hexdigest()[:10])
+    return f"/static/{filename}?v={cached[1]}"
+
+
+def templates_version(app):
+    """Digest of every template, so ETags change when a deploy changes pages."""
+
+    digest = hashlib.md5()
+    for root, _, files in sorted(os.walk(os.path.join(app.root_path, app.template_folder))):
+        for name in sorted(files):
+            with open(os.path.join(root, name), "rb") as f:
+                digest.update(f.read())
+    return digest.hexdigest()[:10]
+
+
+def render_conditional(template, data, last_modified=None, **context):
+    """Render `template` for upstream `data`, or answer 304 Not Modified.
+
+    The ETag covers `data`, the logged-in user and the templates, so it
+    only matches while the page would render byte-for-byte the same.
+    Pages carrying flashed messages are always rendered.
+    """
+
+    user = g.get("user")
+    etag = hashlib.md5(
+        json.dumps(
+            [data, user.id if user else None, current_app.config["TEMPLATES_VERSION"]],
+            sort_keys=True,
+        ).encode()
+    ).hexdigest()
+
+    if "_flashes" not in session and _not_modified(etag, last_modified):
+        response = make_response("", 304)
+    else:
+        response = make_response(render_template(template, **context))
+
+    response.set_etag(etag, weak=True)
+    if last_modified is not None:
+        response.last_modified = last_modified
+    return response
+
+
+def _not_modified(etag, last_modified):
+    if request.if_none_match:
+        return request.if_none_match.contains_weak(etag)
+
+    since = request.if_modified_since
+    if last_modified is None or since is None:
+        return False
+    if since.tzinfo is not None:
+        since = since.astimezone(timezone.utc).replace(tzinfo=None)
+    return last_modified.replace(microsecond=0) <= since
+
+
+def set_cache_policy(response):
+    """Cache-Control for every response that did not choose its own."""
+
+    if request.endpoint == "static":
+        response.headers["Cache-Control"] = (
+            STATIC_IMMUTABLE if request.args.get("v") else STATIC_DEFAULT
+        )
+    elif "Cache-Control" not in response.headers:
+        response.headers["Cache-Control"] = PAGE_DEFAULT
+    return response
+
+
+def compress(response):
+    """gzip (or brotli, if installed and accepted) text responses."""
+
+    if (
+        response.direct_passthrough
+        or response.status_code != 200
+        or response.mimetype not in COMPRESSIBLE
+        or "Content-Encoding" in response.headers
+    ):
+        return response
+
+    response.vary.add("Accept-Encoding")
+    accepted = request.accept_encodings
+    if brotli is not None and accepted["br"]:
+        encoding, compressor = "br", lambda body: brotli.compress(body, quality=5)
+    elif accepted["gzip"]:
+        encoding, compressor = "gzip", lambda body: gzip.compress(body, 6)
+    else:
+        return response
+
+    body = response.get_data()
+    if len(body) < MIN_COMPRESS_BYTES:
+        return response
+
+    response.set_data(compressor(body))
+    response.headers["Content-Encoding"] = encoding
+    # The compressed body is a different representation of the same page
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(etag, weak=True)
+    return response
+
+
+def init_app(app):
+    """Register the hooks and the `static_url` template helper.
+
+    Call before registering blueprints so compression runs after their
+    after_request hooks.
+    """
+
+    app.config.setdefault("TEMPLATES_VERSION", templates_version(app))
+    app.add_template_global(static_url)
+    app.after_request(compress)
+    app.after_request(set_cache_policy)
@@ -0,0 +1,129 @@
+"""Batch loading of saved animals and organizations."""
+
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+import json
+import os
+
+from metrics import timed
+from models import db, Animal, Organization
+from petfinder import petfinder_cache, PetfinderError
+from quota import QuotaExhausted
+
+DEFAULT_IMG_URL = "https://img.freepik.com/free-vector/cute-dog-sitting-cartoon-vector-icon-illustration-animal-nature-icon-concept-isolated-premium-vector-flat-cartoon-style_138676-3671.jpg"
+
+# Shared by every request; PetfinderClient caps how many calls are in flight.
+fetch_pool = ThreadPoolExecutor(
+    max_workers=int(os.environ.get("PETFINDER_MAX_CONCURRENCY", 8)),
+    thread_name_prefix="hydrate",
+)
+
+
+# What a fetch returns when Petfinder answers 404
+GONE = object()
+
+
+def animal_fields(j_animal):
+    """Columns we keep for an animal, from its API payload."""
+
+    return {
+        "name": j_animal["name"],
+        "description": j_animal["description"],
+        "img_url": j_animal["photos"][0]["medium"] if j_animal["photos"] else DEFAULT_IMG_URL,
+    }
+
+
+def org_fields(j_org):
+    """Columns we keep for an organization, from its API payload."""
+
+    return {
+        "name": j_org["name"],
+        "mission_statement": j_org["mission_statement"],
+        "img_url": j_org["photos"][0]["medium"] if j_org["photos"] else DEFAULT_IMG_URL,
+    }
+
+
+def hydrate_animals(animal_ids, max_age=timedelta(days=1), loaded=None):
+    """Return {id: Animal} for `animal_ids`, refreshing missing or stale rows.
+
+    Pass rows the caller already has in `loaded` to skip looking them up.
+    """
+
+    return _hydrate(
+        Animal, animal_ids, "/animals/{}", "animal", animal_fields, max_age, loaded
+    )
+
+
+def hydrate_organizations(org_ids, max_age=timedelta(days=1), loaded=None):
+    """Return {id: Organization} for `org_ids`, refreshing missing or stale rows.
+
+    Pass rows the caller already has in `loaded` to skip looking them up.
+    """
+
+    return _hydrate(
+        Organization, org_ids, "/organizations/{}", "organization", org_fields,
+        max_age, loaded,
+    )
+
+
+def _hydrate(model, ids, path, key, to_fields, max_age, loaded=None):
+    """Look rows up locally, then fetch all misses concurrently.
+
+    Rows are only read and written on the calling thread; the pool threads
+    do nothing but the HTTP calls.
+    """
+
+    ids = list(dict.fromkeys(str(i) for i in ids))
+    if not ids:
+        return {}
+
+    rows = {row.id: row for row in loaded or ()}
+    unknown = [i for i in ids if i not in rows]
+    if unknown:
+        rows.update(
+            (row.id, row) for row in model.query.filter(model.id.in_(unknown)).all()
+        )
+    cutoff = datetime.utcnow() - max_age
+    misses = [
+        i for i in ids
+        if i not in rows or rows[i].updated_at is None or rows[i].updated_at < cutoff
+    ]
+
+    def fetch(item_id):
+        try:
+            return petfinder_cache.get_json(path.format(item_id))[key]
+        except PetfinderError as e:
+            return GONE if e.status_code == 404 else None
+        except (QuotaExhausted, OSError, KeyError, ValueError):
+            return None
+
+    # The fetches run on pool threads, outside the request, so time the
+    # wait for all of them here.
+    with timed("petfinder", count=len(misses)):
+        payloads = list(fetch_pool.map(fetch, misses))
+
+    now = datetime.utcnow()
+    for item_id, payload in zip(misses, payloads):
+        if payload is None:
+            continue
+        row = rows.get(item_id)
+        if payload is GONE:
+            # Adopted or removed: keep the row for the like and its name and
+            # picture, but don't ask again until it is `max_age` old.
+            if row is not None:
+                row.payload = None
+                row.updated_at = now
+            continue
+        if row is None:
+            row = rows[item_id] = model(id=item_id)
+            db.session.add(row)
+        for column, value in to_fields(payload).items():
+            setattr(row, column, value)
+        # Lets the detail pages use the row too (see details.py)
+        row.payload = json.dumps(payload)
+        row.updated_at = now
+
+    if misses:
+        db.session.commit()
+
+    return rows
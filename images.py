@@ -0,0 +1,290 @@
+"""Image proxy for pet and shelter photos.
+
+Photos are fetched once from an allowed host, resized to the sizes the
+pages actually show, re-encoded as WebP and kept in a content-addressed
+cache on disk, so later requests (and upstream URL changes) never reach
+the CDN again. Templates link to them with `image_url(url, size)`.
+"""
+
+import hashlib
+import hmac
+import io
+import os
+import tempfile
+import threading
+import time
+from urllib.parse import quote, urljoin, urlparse
+
+from flask import abort, redirect, send_file
+from PIL import Image, ImageOps
+import requests
+from requests.adapters import HTTPAdapter
+
+from cache import SQLiteConnection
+from http_cache import STATIC_IMMUTABLE
+
+# name: (width, height, crop). Twice the CSS size, for high-DPI screens.
+SIZES = {
+    "card": (140, 140, True),      # .card-image, 70px circle
+    "thumb": (96, 96, True),       # .timeline-image, 48px circle
+    "hero": (700, 252, True),      # .card-hero, full card width
+    "detail": (572, 1144, False),  # detail pages, 286px wide
+}
+
+DEFAULT_HOSTS = (
+    "photos.petfinder.com",
+    "dl5zpyw5k3jeb.cloudfront.net",
+    "img.freepik.com",
+    "colorfully.eu",
+)
+
+MAX_SOURCE_BYTES = 10 * 1024 * 1024
+MAX_REDIRECTS = 3
+WEBP_QUALITY = 80
+
+
+class ImageStore:
+    """Resized images on disk, evicted least-recently-used past `max_bytes`.
+
+    Files are named after the digest of their contents, so renditions that
+    come out identical (placeholders, re-uploaded photos) are stored once.
+    A SQLite index maps each (size, source URL) to its file and records
+    when it was last served. Every worker on the box shares the directory.
+    """
+
+    # Only record a hit if the last one is older than this, to keep reads cheap
+    TOUCH_INTERVAL = 300
+
+    def __init__(self, directory, max_bytes=512 * 1024 * 1024):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(os.path.join(directory, "objects"), exist_ok=True)
+        self._db = SQLiteConnection(
+            os.path.join(directory, "index.sqlite"),
+            "PRAGMA journal_mode=WAL", "PRAGMA synchronous=NORMAL",
+        )
+        with self._db.connect() as conn:
+            conn.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS images (
+                    key TEXT PRIMARY KEY,
+                    digest TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    accessed_at REAL NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS images_accessed_at ON images (accessed_at);
+                CREATE INDEX IF NOT EXISTS images_digest ON images (digest);
+                """
+            )
+
+    def path(self, digest):
+        return os.path.join(self.directory, "objects", digest[:2], f"{digest}.webp")
+
+    def get(self, key):
+        """Path of the stored image for `key`, or None."""
+
+        with self._db.connect() as conn:
+            row = conn.execute(
+                "SELECT digest, accessed_at FROM images WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+
+            path = self.path(row[0])
+            if not os.path.exists(path):
+                conn.execute("DELETE FROM images WHERE key = ?", (key,))
+                return None
+
+            now = time.time()
+            if now - row[1] > self.TOUCH_INTERVAL:
+                conn.execute("UPDATE images SET accessed_at = ? WHERE key = ?", (now, key))
+        return path
+
+    def put(self, key, data):
+        """Store `data` for `key` and return its path."""
+
+        digest = hashlib.sha256(data).hexdigest()
+        path = self.path(digest)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+
+        with self._db.connect() as conn, conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO images VALUES (?, ?, ?, ?)",
+                (key, digest, len(data), time.time()),
+            )
+            self._evict(conn, keep=key)
+        return path
+
+    def total_bytes(self):
+        with self._db.connect() as conn:
+            return conn.execute(
+                "SELECT COALESCE(SUM(size), 0) FROM"
+                " (SELECT MAX(size) AS size FROM images GROUP BY digest)"
+            ).fetchone()[0]
+
+    def _evict(self, conn, keep):
+        total = self.total_bytes()
+        if total <= self.max_bytes:
+            return
+
+        for key, digest, size in conn.execute(
+            "SELECT key, digest, size FROM images WHERE key != ? ORDER BY accessed_at",
+            (keep,),
+        ).fetchall():
+            conn.execute("DELETE FROM images WHERE key = ?", (key,))
+            shared = conn.execute(
+                "SELECT 1 FROM images WHERE digest = ? LIMIT 1", (digest,)
+            ).fetchone()
+            if shared is None:
+                try:
+                    os.remove(self.path(digest))
+                except OSError:
+                    pass
+                total -= size
+            if total <= self.max_bytes:
+                break
+
+
+def resize(data, size):
+    """Re-encode image bytes `data` as WebP at one of the SIZES."""
+
+    width, height, crop = SIZES[size]
+    img = Image.open(io.BytesIO(data))
+    # Let the JPEG decoder scale down while decoding; much cheaper than resizing
+    img.draft("RGB", (width, height))
+    img = ImageOps.exif_transpose(img)
+
+    if img.mode not in ("RGB", "RGBA"):
+        img = img.convert("RGBA" if "transparency" in img.info or "A" in img.mode else "RGB")
+
+    if crop:
+        # Never upscale: shrink the box to fit the source, keeping its shape
+        scale = min(1, img.width / width, img.height / height)
+        box = (max(1, int(width * scale)), max(1, int(height * scale)))
+        img = ImageOps.fit(img, box, Image.LANCZOS)
+    else:
+        img.thumbnail((width, height), Image.LANCZOS)
+
+    out = io.BytesIO()
+    img.save(out, "WEBP", quality=WEBP_QUALITY, method=4)
+    return out.getvalue()
+
+
+class ImageProxy:
+    """Fetches, resizes and serves allowed remote images through our domain.
+
+    URLs are signed with the app's SECRET_KEY, so only images our own
+    pages link to can be pulled into the cache.
+    """
+
+    def __init__(self, app=None, hosts=DEFAULT_HOSTS, timeout=(3.05, 10)):
+        self.hosts = set(hosts)
+        self.timeout = timeout
+        self.store = None
+        self.secret = b""
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=8)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        # One fetch per image at a time; other requests for it wait and reuse it
+        self._locks = [threading.Lock() for _ in range(64)]
+
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.secret = app.config["SECRET_KEY"].encode("utf-8")
+        self.hosts.update(app.config.get("IMAGE_PROXY_HOSTS", ()))
+        self.store = ImageStore(
+            app.config["IMAGE_CACHE_DIR"], app.config["IMAGE_CACHE_MAX_BYTES"]
+        )
+        app.add_template_global(self.image_url, "image_url")
+
+    def image_url(self, url, size):
+        """Our URL for remote image `url` at `size` (a key of SIZES)."""
+
+        if not url or not self.allowed(url):
+            return url
+        return f"/images/{size}/{self.sign(size, url)}?url={quote(url, safe='')}"
+
+    def sign(self, size, url):
+        message = f"{size}:{url}".encode("utf-8")
+        return hmac.new(self.secret, message, hashlib.sha256).hexdigest()[:20]
+
+    def allowed(self, url):
+        parsed = urlparse(url)
+        return parsed.scheme in ("http", "https") and parsed.hostname in self.hosts
+
+    def response(self, size, signature, url):
+        """Serve `url` at `size`, fetching and resizing it on first use."""
+
+        if (
+            size not in SIZES
+            or not url
+            or not hmac.compare_digest(signature, self.sign(size, url))
+            or not self.allowed(url)
+        ):
+            abort(404)
+
+        key = f"{size}:{url}"
+        path = self.store.get(key)
+        if path is None:
+            with self._locks[hash(key) % len(self._locks)]:
+                path = self.store.get(key)
+                if path is None:
+                    path = self._fetch_and_store(key, size, url)
+
+        try:
+            if path is None:
+                raise FileNotFoundError(url)
+            response = send_file(path, mimetype="image/webp", conditional=True)
+        except FileNotFoundError:
+            # Fetch failed, or another worker just evicted the file. Let the
+            # browser try the original, and don't remember the failure.
+            response = redirect(url)
+            response.headers["Cache-Control"] = "no-store"
+            return response
+
+        response.headers["Cache-Control"] = STATIC_IMMUTABLE
+        return response
+
+    def _fetch_and_store(self, key, size, url):
+        data = self._fetch(url)
+        if data is None:
+            return None
+        try:
+            return self.store.put(key, resize(data, size))
+        except (OSError, ValueError, Image.DecompressionBombError):
+            return None
+
+    def _fetch(self, url):
+        """Bytes of the image at `url`, following redirects only to allowed hosts."""
+
+        for _ in range(MAX_REDIRECTS + 1):
+            try:
+                res = self.session.get(
+                    url, timeout=self.timeout, stream=True, allow_redirects=False
+                )
+            except (requests.ConnectionError, requests.Timeout):
+                return None
+
+            with res:
+                if res.is_redirect:
+                    url = urljoin(url, res.headers["Location"])
+                    if not self.allowed(url):
+                        return None
+                    continue
+                if not res.ok or not res.headers.get("Content-Type", "").startswith("image/"):
+                    return None
+
+                data = res.raw.read(MAX_SOURCE_BYTES + 1, decode_content=True)
+                return data if len(data) <= MAX_SOURCE_BYTES else None
+        return None
+
+
+image_proxy = ImageProxy()
@@ -0,0 +1,172 @@
+"""Saved animals and organizations ("likes") for a user.
+
+IDs are always handled as strings: `Animal.id`/`Organization.id` are
+Text columns, while the API returns animal IDs as integers, so templates
+compare with `animal.id|string in animal_likes`.
+"""
+
+import re
+
+from sqlalchemy import func, literal
+from sqlalchemy.orm import selectinload
+
+from models import db, insert_ignore, User, Animal, Organization, SavedAnimals, SavedOrgs
+from popularity import record_saves
+
+# Petfinder animal IDs are integers; organization IDs are short codes
+# like "NJ333". Anything else would only add junk stub rows and counts.
+ANIMAL_ID = re.compile(r"[0-9]{1,12}")
+ORG_ID = re.compile(r"[A-Za-z0-9]{1,16}")
+
+
+def clean_animal_id(value):
+    """`value` as an animal ID string, or None if it can't be one."""
+
+    if isinstance(value, int) and not isinstance(value, bool):
+        value = str(value)
+    if isinstance(value, str) and ANIMAL_ID.fullmatch(value):
+        return value
+    return None
+
+
+def clean_org_id(value):
+    """`value` as an organization ID string, or None if it can't be one."""
+
+    if isinstance(value, str) and ORG_ID.fullmatch(value):
+        return value
+    return None
+
+
+def liked_ids(user_id):
+    """(animal IDs, organization IDs) the user saved, as sets, in one query."""
+
+    likes = db.session.query(literal("animal"), SavedAnimals.animal_id).filter(
+        SavedAnimals.user_id == user_id
+    ).union_all(
+        db.session.query(literal("org"), SavedOrgs.org_id).filter(
+            SavedOrgs.user_id == user_id
+        )
+    )
+
+    animal_ids, org_ids = set(), set()
+    for kind, item_id in likes:
+        (animal_ids if kind == "animal" else org_ids).add(str(item_id))
+    return animal_ids, org_ids
+
+
+def like_counts(user_id):
+    """{"animals": n, "organizations": n} saved by the user, in one query."""
+
+    animal_count = db.session.query(func.count(SavedAnimals.user_id)).filter(
+        SavedAnimals.user_id == user_id
+    ).as_scalar()
+    org_count = db.session.query(func.count(SavedOrgs.user_id)).filter(
+        SavedOrgs.user_id == user_id
+    ).as_scalar()
+    animals, organizations = db.session.query(animal_count, org_count).one()
+    return {"animals": animals, "organizations": organizations}
+
+
+def user_with_liked_animals(user_id):
+    """The user with `animal_likes` eager-loaded, or 404."""
+
+    return User.query.options(selectinload(User.animal_likes)).get_or_404(user_id)
+
+
+def user_with_liked_orgs(user_id):
+    """The user with `org_likes` eager-loaded, or 404."""
+
+    return User.query.options(selectinload(User.org_likes)).get_or_404(user_id)
+
+
+def animal_likes_for(user):
+    """IDs of the animals `user` (a UserContext or None) saved."""
+
+    return user.animal_like_ids if user else frozenset()
+
+
+def org_likes_for(user):
+    """IDs of the organizations `user` (a UserContext or None) saved."""
+
+    return user.org_like_ids if user else frozenset()
+
+
+def save_animal(user_id, animal_id):
+    """Toggle whether the user saved an animal. Returns the new state."""
+
+    return _toggle(SavedAnimals, "animal_id", Animal, "animal", user_id, animal_id)
+
+
+def save_org(user_id, org_id):
+    """Toggle whether the user saved an organization. Returns the new state."""
+
+    return _toggle(SavedOrgs, "org_id", Organization, "organization", user_id, org_id)
+
+
+def save_animals(user_id, animal_ids):
+    """Save every animal in `animal_ids`; ones already saved are left alone."""
+
+    return _save_all(SavedAnimals, "animal_id", Animal, "animal", user_id, animal_ids)
+
+
+def save_orgs(user_id, org_ids):
+    """Save every organization in `org_ids`; ones already saved are left alone."""
+
+    return _save_all(SavedOrgs, "org_id", Organization, "organization", user_id, org_ids)
+
+
+def _toggle(likes, column, model, kind, user_id, item_id):
+    """DELETE the like, or INSERT it if there was nothing to delete.
+
+    A handful of statements and one commit however many items the user
+    has saved; the (user_id, item) primary key makes a concurrent
+    double-save a no-op instead of a duplicate row. The item's save count
+    only moves when a row was really deleted or inserted.
+    """
+
+    item_id = str(item_id)
+    deleted = likes.query.filter(
+        likes.user_id == user_id, getattr(likes, column) == item_id
+    ).delete(synchronize_session=False)
+
+    if deleted:
+        record_saves(kind, [item_id], -1)
+    else:
+        insert_ignore(model.__table__, [_stub(item_id)])
+        if insert_ignore(likes.__table__, [{"user_id": user_id, column: item_id}]):
+            record_saves(kind, [item_id], 1)
+
+    db.session.commit()
+    return not deleted
+
+
+def _save_all(likes, column, model, kind, user_id, item_ids):
+    item_ids = list(dict.fromkeys(str(i) for i in item_ids))
+    if item_ids:
+        insert_ignore(model.__table__, [_stub(i) for i in item_ids])
+        # One row per INSERT so we know which ones were new saves
+        added = [
+            i for i in item_ids
+            if insert_ignore(likes.__table__, [{"user_id": user_id, column: i}])
+        ]
+        record_saves(kind, added, 1)
+        db.session.commit()
+    return item_ids
+
+
+def _stub(item_id):
+    # No upstream call here: a row with no updated_at is filled in by
+    # hydrate.py the next time a liked page shows it.
+    return {"id": item_id, "updated_at": None}
+
+
+def forget_saves(user_id):
+    """Take a user's saves off the save counts, before the user is deleted.
+
+    Their like rows go with the user (ON DELETE CASCADE); the counters
+    would not.
+    """
+
+    animal_ids, org_ids = liked_ids(user_id)
+    record_saves("animal", animal_ids, -1)
+    record_saves("organization", org_ids, -1)
@@ -0,0 +1,270 @@
+"""Per-request timings: Server-Timing headers, /metrics and slow-request logs.
+
+Each request's time is split into the parts we can attribute:
+
+- "petfinder": waiting on the Petfinder API, retries included
+- "db": running SQL statements
+- "template": rendering templates
+- "bcrypt": hashing and checking passwords
+
+The split is sent back in a Server-Timing header, added to per-route
+histograms that /metrics exports in Prometheus' text format, and logged
+for requests slower than SLOW_REQUEST_SECONDS. Like /status/petfinder,
+the histograms cover the worker process that answers.
+"""
+
+from contextlib import contextmanager
+import random
+import threading
+import time
+
+from flask import current_app, g, has_request_context, request
+from flask.signals import before_render_template, template_rendered
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+COMPONENTS = ("petfinder", "db", "template", "bcrypt")
+# What Server-Timing counts for each component, when it counts anything
+COUNTED = {"petfinder": "calls", "db": "queries"}
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, float("inf"))
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, float("inf"))
+
+PREFIX = "petadopter"
+
+
+def add_time(component, seconds, count=1):
+    """Charge `seconds` (and `count` calls) to the current request's `component`."""
+
+    if not count or not has_request_context():
+        return
+    timings = g.setdefault("timings", {})
+    counts = g.setdefault("timing_counts", {})
+    timings[component] = timings.get(component, 0.0) + seconds
+    counts[component] = counts.get(component, 0) + count
+
+
+@contextmanager
+def timed(component, count=1):
+    """Charge the time spent in the block to the current request's `component`.
+
+    Outside a request (background threads, sync.py) this does nothing.
+    """
+
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        add_time(component, time.perf_counter() - start, count)
+
+
+class Histogram:
+    """Cumulative bucket counts, as Prometheus expects them."""
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.sum += value
+        self.count += 1
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+
+
+class RequestMetrics:
+    """Per-route request histograms for this process."""
+
+    def __init__(self):
+        self.durations = {}
+        self.components = {}
+        self.queries = {}
+        self.responses = {}
+        self.slow_requests = 0
+        self._lock = threading.Lock()
+
+    def record(self, route, status, total, timings, queries, slow=False):
+        with self._lock:
+            self.slow_requests += int(slow)
+            self._histogram(self.durations, route, DURATION_BUCKETS).observe(total)
+            for component in COMPONENTS:
+                self._histogram(
+                    self.components, (route, component), DURATION_BUCKETS
+                ).observe(timings.get(component, 0.0))
+            self._histogram(self.queries, route, QUERY_BUCKETS).observe(queries)
+            key = (route, status)
+            self.responses[key] = self.responses.get(key, 0) + 1
+
+    def exposition(self):
+        """Everything recorded so far in Prometheus' text format."""
+
+        lines = []
+        with self._lock:
+            lines += [
+                f"# HELP {PREFIX}_requests_total Responses sent, by route and status.",
+                f"# TYPE {PREFIX}_requests_total counter",
+            ]
+            for (route, status), count in sorted(self.responses.items()):
+                lines.append(
+                    f'{PREFIX}_requests_total{{route="{_escape(route)}",status="{status}"}} {count}'
+                )
+
+            lines += _histogram_lines(
+                f"{PREFIX}_request_duration_seconds", "Time to handle a request.",
+                {(("route", route),): h for route, h in self.durations.items()},
+            )
+            lines += _histogram_lines(
+                f"{PREFIX}_request_component_seconds",
+                "Time a request spent on the Petfinder API, SQL, templates and bcrypt.",
+                {
+                    (("route", route), ("component", component)): h
+                    for (route, component), h in self.components.items()
+                },
+            )
+            lines += _histogram_lines(
+                f"{PREFIX}_request_queries", "SQL statements run by a request.",
+                {(("route", route),): h for route, h in self.queries.items()},
+            )
+            lines += [
+                f"# HELP {PREFIX}_slow_requests_total Requests over SLOW_REQUEST_SECONDS.",
+                f"# TYPE {PREFIX}_slow_requests_total counter",
+                f"{PREFIX}_slow_requests_total {self.slow_requests}",
+            ]
+        return "\n".join(lines) + "\n"
+
+    @staticmethod
+    def _histogram(histograms, key, buckets):
+        histogram = histograms.get(key)
+        if histogram is None:
+            histogram = histograms[key] = Histogram(buckets)
+        return histogram
+
+
+def _escape(value):
+    return str(value).replace("\\", r"\\").replace('"', r"\"").replace("\n", r"\n")
+
+
+def _histogram_lines(name, help_text, histograms):
+    lines = [f"# HELP {name} {help_text}", f"# TYPE {name} histogram"]
+    for labels, histogram in sorted(histograms.items()):
+        label_text = ",".join(f'{k}="{_escape(v)}"' for k, v in labels)
+        for bound, count in zip(histogram.buckets, histogram.counts):
+            le = "+Inf" if bound == float("inf") else repr(float(bound))
+            lines.append(f'{name}_bucket{{{label_text},le="{le}"}} {count}')
+        lines.append(f"{name}_sum{{{label_text}}} {histogram.sum:.6f}")
+        lines.append(f"{name}_count{{{label_text}}} {histogram.count}")
+    return lines
+
+
+request_metrics = RequestMetrics()
+
+
+##############################################################################
+# Hooks
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _query_started(conn, cursor, statement, parameters, context, executemany):
+    if has_request_context():
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _query_finished(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info.get("query_started")
+    if started and has_request_context():
+        add_time("db", time.perf_counter() - started.pop())
+
+
+def _template_started(sender, template, context, **extra):
+    g.setdefault("templates_started", []).append(time.perf_counter())
+
+
+def _template_finished(sender, template, context, **extra):
+    started = g.get("templates_started")
+    if started:
+        add_time("template", time.perf_counter() - started.pop())
+
+
+def start_timer():
+    g.request_started = time.perf_counter()
+
+
+def finish_timer(response):
+    """Add Server-Timing and X-Query-Count, record the request, log it if slow."""
+
+    started = g.get("request_started")
+    if started is None:
+        return response
+    total = time.perf_counter() - started
+    timings = g.get("timings", {})
+    counts = g.get("timing_counts", {})
+    queries = counts.get("db", 0)
+
+    response.headers["X-Query-Count"] = str(queries)
+    if current_app.config.get("SERVER_TIMING", True):
+        response.headers["Server-Timing"] = server_timing(total, timings, counts)
+
+    config = current_app.config
+    slow = total >= config.get("SLOW_REQUEST_SECONDS", 1.0)
+    route = request.url_rule.rule if request.url_rule else "unmatched"
+    request_metrics.record(route, response.status_code, total, timings, queries, slow)
+
+    if slow and random.random() < config.get("SLOW_REQUEST_SAMPLE_RATE", 1.0):
+        current_app.logger.warning(
+            "Slow request: %s %s -> %s in %.3fs (%s)",
+            request.method, request.full_path.rstrip("?"), response.status_code,
+            total, breakdown(total, timings, counts),
+        )
+    return response
+
+
+def server_timing(total, timings, counts):
+    """Server-Timing header value for a request's timings."""
+
+    parts = []
+    for component in COMPONENTS:
+        if component not in timings:
+            continue
+        part = f"{component};dur={timings[component] * 1000:.1f}"
+        if component in COUNTED:
+            part += f';desc="{counts.get(component, 0)} {COUNTED[component]}"'
+        parts.append(part)
+    parts.append(f"total;dur={total * 1000:.1f}")
+    return ", ".join(parts)
+
+
+def breakdown(total, timings, counts):
+    """Readable split of a request's time, for the slow-request log."""
+
+    parts = []
+    for component in COMPONENTS:
+        seconds = timings.get(component, 0.0)
+        part = f"{component} {seconds:.3f}s"
+        if component in COUNTED:
+            part += f" / {counts.get(component, 0)} {COUNTED[component]}"
+        parts.append(part)
+    other = total - sum(timings.get(component, 0.0) for component in COMPONENTS)
+    parts.append(f"other {max(other, 0.0):.3f}s")
+    return ", ".join(parts)
+
+
+def metrics_view():
+    """Prometheus scrape target."""
+
+    return current_app.response_class(
+        request_metrics.exposition(), mimetype="text/plain; version=0.0.4"
+    )
+
+
+def init_app(app):
+    """Register the timing hooks and the /metrics route."""
+
+    app.before_request(start_timer)
+    app.after_request(finish_timer)
+    before_render_template.connect(_template_started, app)
+    template_rendered.connect(_template_finished, app)
+    app.add_url_rule("/metrics", "metrics", metrics_view)
@@ -0,0 +1,71 @@
+"""Baseline: the schema seed.py created before migrations were added.
+
+Revision ID: 0001_baseline
+Revises:
+Create Date: 2026-10-18 09:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0001_baseline'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'users',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('email', sa.Text(), nullable=False),
+        sa.Column('username', sa.Text(), nullable=False),
+        sa.Column('password', sa.Text(), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('email'),
+        sa.UniqueConstraint('username'),
+    )
+    op.create_table(
+        'organizations',
+        sa.Column('id', sa.Text(), nullable=False),
+        sa.Column('name', sa.Text(), nullable=True),
+        sa.Column('img_url', sa.Text(), nullable=True),
+        sa.Column('mission_statement', sa.Text(), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_table(
+        'animals',
+        sa.Column('id', sa.Text(), nullable=False),
+        sa.Column('name', sa.Text(), nullable=True),
+        sa.Column('img_url', sa.Text(), nullable=True),
+        sa.Column('description', sa.Text(), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_table(
+        'org_likes',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=True),
+        sa.Column('org_id', sa.Text(), nullable=True),
+        sa.ForeignKeyConstraint(['org_id'], ['organizations.id'], ondelete='cascade'),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='cascade'),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_table(
+        'animal_likes',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=True),
+        sa.Column('animal_id', sa.Text(), nullable=True),
+        sa.ForeignKeyConstraint(['animal_id'], ['animals.id'], ondelete='cascade'),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='cascade'),
+        sa.PrimaryKeyConstraint('id'),
+    )
+
+
+def downgrade():
+    op.drop_table('animal_likes')
+    op.drop_table('org_likes')
+    op.drop_table('animals')
+    op.drop_table('organizations')
+    op.drop_table('users')
@@ -0,0 +1,124 @@
+"""Mirror columns and indexes, pet_types and sync_checkpoints.
+
+Everything the Petfinder cache, taxonomy and mirror sync added to the
+schema before migrations existed.
+
+Revision ID: 0002_mirror_and_taxonomy
+Revises: 0001_baseline
+Create Date: 2026-10-18 09:05:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0002_mirror_and_taxonomy'
+down_revision = '0001_baseline'
+branch_labels = None
+depends_on = None
+
+
+SHARED_COLUMNS = [
+    ('updated_at', sa.DateTime),
+    ('city', sa.Text),
+    ('state', sa.Text),
+    ('postcode', sa.Text),
+    ('latitude', sa.Float),
+    ('longitude', sa.Float),
+    ('payload', sa.Text),
+    ('synced_at', sa.DateTime),
+]
+
+ANIMAL_COLUMNS = [
+    ('organization_id', sa.Text),
+    ('type', sa.Text),
+    ('breed', sa.Text),
+    ('color', sa.Text),
+    ('gender', sa.Text),
+    ('age', sa.Text),
+    ('size', sa.Text),
+    ('status', sa.Text),
+    ('published_at', sa.DateTime),
+]
+
+ANIMAL_INDEXES = [
+    ('ix_animals_status_published', ['status', 'published_at', 'id']),
+    ('ix_animals_status_type_published', ['status', 'type', 'published_at', 'id']),
+    (
+        'ix_animals_status_type_gender_published',
+        ['status', 'type', 'gender', 'published_at', 'id'],
+    ),
+    ('ix_animals_organization_status', ['organization_id', 'status']),
+]
+
+
+def upgrade():
+    with op.batch_alter_table('organizations') as batch_op:
+        for name, type_ in SHARED_COLUMNS:
+            batch_op.add_column(sa.Column(name, type_(), nullable=True))
+
+    with op.batch_alter_table('animals') as batch_op:
+        for name, type_ in SHARED_COLUMNS + ANIMAL_COLUMNS:
+            batch_op.add_column(sa.Column(name, type_(), nullable=True))
+
+    for name, columns in ANIMAL_INDEXES:
+        op.create_index(name, 'animals', columns)
+
+    if op.get_bind().dialect.name == 'postgresql':
+        op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        op.execute(
+            "CREATE INDEX ix_animals_name_trgm ON animals USING gin (name gin_trgm_ops)"
+        )
+        op.execute(
+            "CREATE INDEX ix_animals_description_fts ON animals "
+            "USING gin (to_tsvector('english', coalesce(description, '')))"
+        )
+        op.execute("""
+            DO $$ BEGIN
+                IF EXISTS (SELECT 1 FROM pg_extension WHERE extname = 'postgis') THEN
+                    CREATE INDEX ix_organizations_geog ON organizations USING gist (
+                        (geography(ST_SetSRID(ST_MakePoint(longitude, latitude), 4326)))
+                    );
+                END IF;
+            END $$;
+        """)
+
+    op.create_table(
+        'pet_types',
+        sa.Column('name', sa.Text(), nullable=False),
+        sa.Column('position', sa.Integer(), nullable=False),
+        sa.Column('data', sa.Text(), nullable=False),
+        sa.Column('fetched_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('name'),
+    )
+    op.create_table(
+        'sync_checkpoints',
+        sa.Column('key', sa.Text(), nullable=False),
+        sa.Column('high_water', sa.DateTime(), nullable=True),
+        sa.Column('page', sa.Integer(), nullable=False),
+        sa.Column('run_high_water', sa.DateTime(), nullable=True),
+        sa.Column('completed_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('key'),
+    )
+
+
+def downgrade():
+    op.drop_table('sync_checkpoints')
+    op.drop_table('pet_types')
+
+    if op.get_bind().dialect.name == 'postgresql':
+        op.execute("DROP INDEX IF EXISTS ix_organizations_geog")
+        op.execute("DROP INDEX IF EXISTS ix_animals_description_fts")
+        op.execute("DROP INDEX IF EXISTS ix_animals_name_trgm")
+
+    for name, _ in reversed(ANIMAL_INDEXES):
+        op.drop_index(name, table_name='animals')
+
+    with op.batch_alter_table('animals') as batch_op:
+        for name, _ in reversed(SHARED_COLUMNS + ANIMAL_COLUMNS):
+            batch_op.drop_column(name)
+
+    with op.batch_alter_table('organizations') as batch_op:
+        for name, _ in reversed(SHARED_COLUMNS):
+            batch_op.drop_column(name)
@@ -0,0 +1,67 @@
+"""Key the like tables on (user, item) and index the reverse lookup.
+
+Drops the surrogate id from org_likes and animal_likes, removes duplicate
+and half-empty rows, makes (user_id, item) the primary key and adds an
+(item, user_id) index for "who saved this".
+
+Revision ID: 0003_like_keys
+Revises: 0002_mirror_and_taxonomy
+Create Date: 2026-10-18 09:10:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0003_like_keys'
+down_revision = '0002_mirror_and_taxonomy'
+branch_labels = None
+depends_on = None
+
+
+LIKE_TABLES = [
+    ('org_likes', 'org_id', 'ix_org_likes_org_user'),
+    ('animal_likes', 'animal_id', 'ix_animal_likes_animal_user'),
+]
+
+
+def upgrade():
+    for table, item, index in LIKE_TABLES:
+        op.execute(
+            f"DELETE FROM {table} WHERE user_id IS NULL OR {item} IS NULL"
+        )
+        op.execute(
+            f"DELETE FROM {table} WHERE id NOT IN "
+            f"(SELECT MIN(id) FROM {table} GROUP BY user_id, {item})"
+        )
+
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.drop_column('id')
+            batch_op.alter_column('user_id', existing_type=sa.Integer(), nullable=False)
+            batch_op.alter_column(item, existing_type=sa.Text(), nullable=False)
+            batch_op.create_primary_key(f'{table}_pkey', ['user_id', item])
+
+        op.create_index(index, table, [item, 'user_id'])
+
+
+def downgrade():
+    # Rebuild each table with a surrogate id rather than altering keys in
+    # place, which SQLite cannot do.
+    for table, item, index in LIKE_TABLES:
+        parent = 'organizations' if item == 'org_id' else 'animals'
+        op.create_table(
+            f'{table}_old',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('user_id', sa.Integer(), nullable=True),
+            sa.Column(item, sa.Text(), nullable=True),
+            sa.ForeignKeyConstraint([item], [f'{parent}.id'], ondelete='cascade'),
+            sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='cascade'),
+            sa.PrimaryKeyConstraint('id'),
+        )
+        op.execute(
+            f"INSERT INTO {table}_old (user_id, {item}) SELECT user_id, {item} FROM {table}"
+        )
+        op.drop_index(index, table_name=table)
+        op.drop_table(table)
+        op.rename_table(f'{table}_old', table)
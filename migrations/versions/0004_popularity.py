@@ -0,0 +1,55 @@
+"""Sharded save counters and the popularity rollup table.
+
+Existing saves are counted into shard 0 so the leaderboards start out
+right.
+
+Revision ID: 0004_popularity
+Revises: 0003_like_keys
+Create Date: 2026-10-18 10:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0004_popularity'
+down_revision = '0003_like_keys'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'like_counters',
+        sa.Column('kind', sa.Text(), nullable=False),
+        sa.Column('item_id', sa.Text(), nullable=False),
+        sa.Column('shard', sa.Integer(), autoincrement=False, nullable=False),
+        sa.Column('count', sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint('kind', 'item_id', 'shard'),
+    )
+    op.create_table(
+        'popularity',
+        sa.Column('kind', sa.Text(), nullable=False),
+        sa.Column('item_id', sa.Text(), nullable=False),
+        sa.Column('saves', sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint('kind', 'item_id'),
+    )
+    op.create_index(
+        'ix_popularity_kind_saves', 'popularity', ['kind', 'saves', 'item_id']
+    )
+
+    op.execute(
+        "INSERT INTO like_counters (kind, item_id, shard, count) "
+        "SELECT 'animal', animal_id, 0, COUNT(*) FROM animal_likes GROUP BY animal_id"
+    )
+    op.execute(
+        "INSERT INTO like_counters (kind, item_id, shard, count) "
+        "SELECT 'organization', org_id, 0, COUNT(*) FROM org_likes GROUP BY org_id"
+    )
+
+
+def downgrade():
+    op.drop_index('ix_popularity_kind_saves', table_name='popularity')
+    op.drop_table('popularity')
+    op.drop_table('like_counters')
@@ -0,0 +1,32 @@
+"""Server-side session table.
+
+Revision ID: 0005_sessions
+Revises: 0004_popularity
+Create Date: 2026-10-18 12:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0005_sessions'
+down_revision = '0004_popularity'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'sessions',
+        sa.Column('id', sa.Text(), nullable=False),
+        sa.Column('data', sa.Text(), nullable=False),
+        sa.Column('expires_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index('ix_sessions_expires_at', 'sessions', ['expires_at'])
+
+
+def downgrade():
+    op.drop_index('ix_sessions_expires_at', table_name='sessions')
+    op.drop_table('sessions')
@@ -0,0 +1,24 @@
+"""Record when each mirror sync last walked every page.
+
+Revision ID: 0006_sync_refresh
+Revises: 0005_sessions
+Create Date: 2026-10-18 15:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0006_sync_refresh'
+down_revision = '0005_sessions'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('sync_checkpoints', sa.Column('refreshed_at', sa.DateTime(), nullable=True))
+
+
+def downgrade():
+    op.drop_column('sync_checkpoints', 'refreshed_at')
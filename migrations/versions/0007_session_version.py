@@ -0,0 +1,27 @@
+"""Keep each server-side session's version with its data.
+
+Sessions saved before this have no version and are no longer accepted,
+so their users log in again once.
+
+Revision ID: 0007_session_version
+Revises: 0006_sync_refresh
+Create Date: 2026-10-18 16:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0007_session_version'
+down_revision = '0006_sync_refresh'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('sessions', sa.Column('version', sa.Text(), nullable=True))
+
+
+def downgrade():
+    op.drop_column('sessions', 'version')
@@ -0,0 +1,208 @@
+"""Local mirror of Petfinder animals and organizations.
+
+`sync.py` fills the mirror; the listing routes can read from it instead
+of calling the API (set LISTING_SOURCE=mirror).
+"""
+
+from datetime import datetime, timedelta, timezone
+import json
+
+from flask import current_app
+from sqlalchemy import func
+
+from geo import gazetteer, organization_locator
+from hydrate import animal_fields, org_fields
+from models import db, Organization, SyncCheckpoint
+from pagination import Page
+from search import search_animals, count_animals
+
+
+def parse_time(value):
+    """Petfinder timestamp ("2019-10-07T19:13:01+0000") as naive UTC."""
+
+    if not value:
+        return None
+    parsed = datetime.strptime(value, "%Y-%m-%dT%H:%M:%S%z")
+    return parsed.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+def animal_columns(payload):
+    """Columns we mirror for an animal, from its API payload."""
+
+    address = payload.get("contact", {}).get("address") or {}
+    return dict(
+        animal_fields(payload),
+        organization_id=payload.get("organization_id"),
+        type=payload.get("type"),
+        breed=(payload.get("breeds") or {}).get("primary"),
+        color=(payload.get("colors") or {}).get("primary"),
+        gender=payload.get("gender"),
+        age=payload.get("age"),
+        size=payload.get("size"),
+        status=payload.get("status"),
+        city=address.get("city"),
+        state=address.get("state"),
+        postcode=address.get("postcode"),
+        **coordinates(address),
+        published_at=parse_time(payload.get("published_at")),
+        payload=json.dumps(payload),
+    )
+
+
+def org_columns(payload):
+    """Columns we mirror for an organization, from its API payload."""
+
+    address = payload.get("address") or {}
+    return dict(
+        org_fields(payload),
+        city=address.get("city"),
+        state=address.get("state"),
+        postcode=address.get("postcode"),
+        **coordinates(address),
+        payload=json.dumps(payload),
+    )
+
+
+def coordinates(address):
+    """latitude/longitude columns for an API address block."""
+
+    point = gazetteer.geocode(
+        postcode=address.get("postcode"), city=address.get("city"), state=address.get("state")
+    )
+    return {"latitude": point[0], "longitude": point[1]} if point else {}
+
+
+def upsert(model, payloads, to_columns):
+    """Insert or update one row per payload. The caller commits."""
+
+    ids = [str(payload["id"]) for payload in payloads]
+    rows = {row.id: row for row in model.query.filter(model.id.in_(ids)).all()}
+    now = datetime.utcnow()
+
+    for item_id, payload in zip(ids, payloads):
+        row = rows.get(item_id)
+        if row is None:
+            row = rows[item_id] = model(id=item_id)
+            db.session.add(row)
+        for column, value in to_columns(payload).items():
+            setattr(row, column, value)
+        row.updated_at = row.synced_at = now
+
+    return list(rows.values())
+
+
+def mirror_ready(kind):
+    """True once at least one sync of `kind` ("animals"/"organizations") finished."""
+
+    return db.session.query(
+        SyncCheckpoint.query.filter(
+            SyncCheckpoint.key.like(f"{kind}:%"),
+            SyncCheckpoint.completed_at.isnot(None),
+        ).exists()
+    ).scalar()
+
+
+def mirror_animals(params, cursor=None):
+    """Page of mirrored adoptable animals matching the listing `params`.
+
+    Takes the same params dict that would be sent to GET /animals, plus an
+    optional keyset `cursor` from a previous page. Returns None when the
+    mirror has not been synced yet.
+    """
+
+    if not mirror_ready("animals"):
+        return None
+
+    filters = {
+        key: params[key] for key in ("type", "breed", "color", "name") if params.get(key)
+    }
+    # Incremental syncs never revisit an animal, so one no full walk has
+    # seen lately has probably been adopted or removed (see sync.py).
+    max_age = current_app.config["MIRROR_MAX_AGE_HOURS"]
+    if max_age:
+        filters["synced_after"] = datetime.utcnow() - timedelta(hours=max_age)
+    if params.get("gender"):
+        filters["gender"] = params["gender"].capitalize()
+
+    if params.get("location"):
+        point = gazetteer.parse(params["location"])
+        if point is None:
+            return None
+        nearby = organization_locator.nearby(*point, radius_miles=params.get("distance", 100))
+        filters["organization_ids"] = [org_id for _, org_id in nearby]
+
+    page, limit = params.get("page", 1), params.get("limit", 42)
+    result = search_animals(filters, cursor=cursor, limit=limit, offset=(page - 1) * limit)
+    return Page(result.items, page, limit, count_animals(filters), result.next_cursor)
+
+
+def mirror_organizations(params):
+    """Page of mirrored organizations matching the listing `params`.
+
+    `location` matches a ZIP code exactly or a city by name. Returns None
+    when the mirror has not been synced yet.
+    """
+
+    if not mirror_ready("organizations"):
+        return None
+
+    page, limit = params.get("page", 1), params.get("limit", 42)
+    offset = (page - 1) * limit
+
+    point = gazetteer.parse(params.get("location"))
+    if point is not None:
+        organizations, total = nearby_organizations(
+            point, params.get("distance", 100), params.get("state"), limit, offset
+        )
+        return Page(organizations, page, limit, total)
+
+    query = db.session.query(Organization.payload).filter(
+        Organization.payload.isnot(None)
+    )
+    if params.get("state"):
+        query = query.filter(Organization.state == params["state"].upper())
+    if params.get("location"):
+        location = params["location"].split(",")[0].strip()
+        query = query.filter(
+            (Organization.postcode == location)
+            | (func.lower(Organization.city) == location.lower())
+        )
+
+    total = query.with_entities(func.count(Organization.id)).scalar()
+    rows = query.order_by(Organization.name, Organization.id).offset(offset).limit(limit)
+    return Page([json.loads(payload) for payload, in rows], page, limit, total)
+
+
+def nearby_organizations(point, radius_miles, state, limit, offset):
+    """Mirrored organizations within `radius_miles` of `point`, nearest first.
+
+    Each payload gets a "distance" in miles, as the API returns when
+    searching by location. Returns (payloads, total matches).
+    """
+
+    nearby = organization_locator.nearby(*point, radius_miles=radius_miles)
+    if state:
+        in_state = {
+            org_id for org_id, in db.session.query(Organization.id).filter(
+                Organization.id.in_([org_id for _, org_id in nearby]),
+                Organization.state == state.upper(),
+            )
+        }
+        nearby = [(miles, org_id) for miles, org_id in nearby if org_id in in_state]
+    total = len(nearby)
+    nearby = nearby[offset:offset + limit]
+
+    payloads = dict(
+        db.session.query(Organization.id, Organization.payload).filter(
+            Organization.id.in_([org_id for _, org_id in nearby]),
+            Organization.payload.isnot(None),
+        )
+    )
+
+    organizations = []
+    for miles, org_id in nearby:
+        if org_id in payloads:
+            organization = json.loads(payloads[org_id])
+            organization["distance"] = round(miles, 1)
+            organizations.append(organization)
+    return organizations, total
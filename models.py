@@ -2,10 +2,13 @@
 
 from datetime import datetime
 
-from flask_bcrypt import Bcrypt
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import DDL, event
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.exc import IntegrityError
+
+from passwords import password_hasher
 
-bcrypt = Bcrypt()
 db = SQLAlchemy()
 
 
@@ -38,7 +41,7 @@ class User(db.Model):
         Hashes password and adds user to system.
         """
 
-        hashed_pwd = bcrypt.generate_password_hash(password).decode("UTF-8")
+        hashed_pwd = password_hasher.hash(password)
 
         user = User(
             username=username, email=email, password=hashed_pwd, 
@@ -56,13 +59,18 @@ class User(db.Model):
         and, if it finds such a user, returns that user object.
 
         If can't find matching user (or if password is wrong), returns False.
+
+        A hash made at an old BCRYPT_LOG_ROUNDS cost is replaced with one at
+        the current cost; the caller commits it.
         """
 
         user = cls.query.filter_by(username=username).first()
 
         if user:
-            is_auth = bcrypt.check_password_hash(user.password, password)
+            is_auth = password_hasher.check(user.password, password)
             if is_auth:
+                if password_hasher.needs_rehash(user.password):
+                    user.password = password_hasher.hash(password)
                 return user
 
         return False
@@ -72,23 +80,36 @@ class SavedOrgs(db.Model):
     """Mapping saved organizations to users."""
 
     __tablename__ = "org_likes"
+    __table_args__ = (
+        # The primary key covers "what did this user save"; this covers
+        # "who saved this organization".
+        db.Index("ix_org_likes_org_user", "org_id", "user_id"),
+    )
 
-    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(
+        db.Integer, db.ForeignKey("users.id", ondelete="cascade"), primary_key=True
+    )
+
+    org_id = db.Column(
+        db.Text, db.ForeignKey("organizations.id", ondelete="cascade"), primary_key=True
+    )
 
-    user_id = db.Column(db.Integer, db.ForeignKey("users.id", ondelete="cascade"))
 
-    org_id = db.Column(db.Text, db.ForeignKey("organizations.id", ondelete="cascade"))
-    
 class SavedAnimals(db.Model):
     """Mapping saved animals to users."""
 
     __tablename__ = "animal_likes"
+    __table_args__ = (
+        db.Index("ix_animal_likes_animal_user", "animal_id", "user_id"),
+    )
 
-    id = db.Column(db.Integer, primary_key=True)
-
-    user_id = db.Column(db.Integer, db.ForeignKey("users.id", ondelete="cascade"))
+    user_id = db.Column(
+        db.Integer, db.ForeignKey("users.id", ondelete="cascade"), primary_key=True
+    )
 
-    animal_id = db.Column(db.Text, db.ForeignKey("animals.id", ondelete="cascade"))   
+    animal_id = db.Column(
+        db.Text, db.ForeignKey("animals.id", ondelete="cascade"), primary_key=True
+    )
 
 
 class Organization(db.Model):
@@ -103,6 +124,25 @@ class Organization(db.Model):
     img_url = db.Column(db.Text, nullable=True)
 
     mission_statement = db.Column(db.Text, nullable=True)
+
+    updated_at = db.Column(db.DateTime, nullable=True, default=datetime.utcnow)
+
+    # Fields below are filled in by the mirror sync (sync.py)
+
+    city = db.Column(db.Text, nullable=True)
+
+    state = db.Column(db.Text, nullable=True)
+
+    postcode = db.Column(db.Text, nullable=True)
+
+    # Geocoded from postcode/city with the bundled ZIP table (geo.py)
+    latitude = db.Column(db.Float, nullable=True)
+
+    longitude = db.Column(db.Float, nullable=True)
+
+    payload = db.Column(db.Text, nullable=True)
+
+    synced_at = db.Column(db.DateTime, nullable=True)
     
     
 class Animal(db.Model):
@@ -110,6 +150,17 @@ class Animal(db.Model):
 
     __tablename__ = "animals"
 
+    __table_args__ = (
+        # Listing filters, each ending in the keyset sort (published_at, id)
+        db.Index("ix_animals_status_published", "status", "published_at", "id"),
+        db.Index("ix_animals_status_type_published", "status", "type", "published_at", "id"),
+        db.Index(
+            "ix_animals_status_type_gender_published",
+            "status", "type", "gender", "published_at", "id",
+        ),
+        db.Index("ix_animals_organization_status", "organization_id", "status"),
+    )
+
     id = db.Column(db.Text, primary_key=True,)
 
     name = db.Column(db.Text, nullable=True)
@@ -118,6 +169,201 @@ class Animal(db.Model):
 
     description = db.Column(db.Text, nullable=True)
 
+    updated_at = db.Column(db.DateTime, nullable=True, default=datetime.utcnow)
+
+    # Fields below are filled in by the mirror sync (sync.py)
+
+    organization_id = db.Column(db.Text, nullable=True)
+
+    type = db.Column(db.Text, nullable=True)
+
+    breed = db.Column(db.Text, nullable=True)
+
+    color = db.Column(db.Text, nullable=True)
+
+    gender = db.Column(db.Text, nullable=True)
+
+    age = db.Column(db.Text, nullable=True)
+
+    size = db.Column(db.Text, nullable=True)
+
+    status = db.Column(db.Text, nullable=True)
+
+    city = db.Column(db.Text, nullable=True)
+
+    state = db.Column(db.Text, nullable=True)
+
+    postcode = db.Column(db.Text, nullable=True)
+
+    latitude = db.Column(db.Float, nullable=True)
+
+    longitude = db.Column(db.Float, nullable=True)
+
+    published_at = db.Column(db.DateTime, nullable=True)
+
+    # Full API payload, so mirrored listings render like live ones
+    payload = db.Column(db.Text, nullable=True)
+
+    synced_at = db.Column(db.DateTime, nullable=True)
+
+
+# Postgres only: a trigram index so name ILIKE '%...%' is indexed, and a
+# full-text index for searching descriptions.
+event.listen(
+    Animal.__table__, "before_create",
+    DDL("CREATE EXTENSION IF NOT EXISTS pg_trgm").execute_if(dialect="postgresql"),
+)
+event.listen(
+    Animal.__table__, "after_create",
+    DDL(
+        "CREATE INDEX ix_animals_name_trgm ON animals USING gin (name gin_trgm_ops)"
+    ).execute_if(dialect="postgresql"),
+)
+event.listen(
+    Animal.__table__, "after_create",
+    DDL(
+        "CREATE INDEX ix_animals_description_fts ON animals "
+        "USING gin (to_tsvector('english', coalesce(description, '')))"
+    ).execute_if(dialect="postgresql"),
+)
+
+# When PostGIS is installed, index organization locations for radius queries.
+event.listen(
+    Organization.__table__, "after_create",
+    DDL("""
+        DO $$ BEGIN
+            IF EXISTS (SELECT 1 FROM pg_extension WHERE extname = 'postgis') THEN
+                CREATE INDEX ix_organizations_geog ON organizations USING gist (
+                    (geography(ST_SetSRID(ST_MakePoint(longitude, latitude), 4326)))
+                );
+            END IF;
+        END $$;
+    """).execute_if(dialect="postgresql"),
+)
+
+
+class PetType(db.Model):
+    """An animal type from the Petfinder taxonomy, with its breeds."""
+
+    __tablename__ = "pet_types"
+
+    name = db.Column(db.Text, primary_key=True,)
+
+    position = db.Column(db.Integer, nullable=False, default=0)
+
+    # JSON of the /types entry (coats, colors, genders) plus its breed names
+    data = db.Column(db.Text, nullable=False)
+
+    fetched_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+
+class SyncCheckpoint(db.Model):
+    """Progress of one mirror sync job, so it can resume where it stopped."""
+
+    __tablename__ = "sync_checkpoints"
+
+    # e.g. "animals:TX"
+    key = db.Column(db.Text, primary_key=True,)
+
+    # Only records published after this are pulled on the next run
+    high_water = db.Column(db.DateTime, nullable=True)
+
+    # Last page committed by a run still in progress; 0 when idle
+    page = db.Column(db.Integer, nullable=False, default=0)
+
+    # Largest published_at seen by the run in progress
+    run_high_water = db.Column(db.DateTime, nullable=True)
+
+    completed_at = db.Column(db.DateTime, nullable=True)
+
+    # When a run last walked every page rather than only new records,
+    # bumping synced_at on every animal still listed
+    refreshed_at = db.Column(db.DateTime, nullable=True)
+
+
+class LikeCounter(db.Model):
+    """One shard of the running save count for an animal or organization.
+
+    Each save/unsave adds +1/-1 to a random shard, so concurrent toggles on
+    a popular animal rarely wait on the same row. An item's count is the
+    sum of its shards.
+    """
+
+    __tablename__ = "like_counters"
+
+    # "animal" or "organization"
+    kind = db.Column(db.Text, primary_key=True,)
+
+    item_id = db.Column(db.Text, primary_key=True,)
+
+    shard = db.Column(db.Integer, primary_key=True, autoincrement=False)
+
+    count = db.Column(db.Integer, nullable=False, default=0)
+
+
+class Popularity(db.Model):
+    """Save counts rolled up from like_counters, for the leaderboards."""
+
+    __tablename__ = "popularity"
+    __table_args__ = (
+        db.Index("ix_popularity_kind_saves", "kind", "saves", "item_id"),
+    )
+
+    kind = db.Column(db.Text, primary_key=True,)
+
+    item_id = db.Column(db.Text, primary_key=True,)
+
+    saves = db.Column(db.Integer, nullable=False)
+
+
+
+class WebSession(db.Model):
+    """Data of one browser session; the cookie only holds its id (see sessions.py)."""
+
+    __tablename__ = "sessions"
+    __table_args__ = (
+        db.Index("ix_sessions_expires_at", "expires_at"),
+    )
+
+    # SHA-256 of the id in the session cookie
+    id = db.Column(db.Text, primary_key=True,)
+
+    # The session dict, as Flask's tagged JSON
+    data = db.Column(db.Text, nullable=False)
+
+    # Changes with every save; the cookie carries the version it was issued with
+    version = db.Column(db.Text, nullable=True)
+
+    expires_at = db.Column(db.DateTime, nullable=False)
+
+def insert_ignore(table, rows):
+    """INSERT rows into `table`, skipping any that collide with a unique key.
+
+    Returns how many rows were inserted when `rows` holds a single row.
+    """
+
+    dialect = db.session.get_bind().dialect.name
+
+    if dialect == "postgresql":
+        stmt = pg_insert(table).on_conflict_do_nothing()
+    elif dialect == "sqlite":
+        stmt = table.insert().prefix_with("OR IGNORE")
+    elif dialect == "mysql":
+        stmt = table.insert().prefix_with("IGNORE")
+    else:
+        inserted = 0
+        for row in rows:
+            try:
+                with db.session.begin_nested():
+                    db.session.execute(table.insert(), row)
+                inserted += 1
+            except IntegrityError:
+                pass
+        return inserted
+
+    return db.session.execute(stmt, rows).rowcount
+
+
 def connect_db(app):
     """Connect this database to provided Flask app.
 
@@ -0,0 +1,67 @@
+"""Pagination for the animal and organization listings."""
+
+import math
+from urllib.parse import urlencode
+
+
+class Page:
+    """One page of listing results plus what is known about the others.
+
+    Built from the API's `pagination` block or from a mirror query.
+    `next_cursor` is set when the next page can be fetched by keyset.
+    """
+
+    def __init__(self, items, number, per_page, total_count=None, next_cursor=None):
+        self.items = items
+        self.number = number
+        self.per_page = per_page
+        self.total_count = total_count
+        self.next_cursor = next_cursor
+        self.prev_url = self.next_url = None
+
+    @classmethod
+    def from_api(cls, data, key, per_page):
+        """Page for an API response such as GET /animals (`key` "animals")."""
+
+        pagination = data.get("pagination") or {}
+        return cls(
+            data[key],
+            pagination.get("current_page", 1),
+            pagination.get("count_per_page", per_page),
+            pagination.get("total_count"),
+        )
+
+    @property
+    def total_pages(self):
+        if self.total_count is None:
+            return None
+        return max(1, math.ceil(self.total_count / self.per_page))
+
+    @property
+    def has_prev(self):
+        return self.number > 1
+
+    @property
+    def has_next(self):
+        if self.next_cursor:
+            return True
+        if self.total_pages is not None:
+            return self.number < self.total_pages
+        return len(self.items) >= self.per_page
+
+    def link(self, base_path, args):
+        """Set prev_url/next_url, carrying every filter in `args` forward.
+
+        `base_path` is the listing path without the page number, e.g.
+        "/animals".
+        """
+
+        args = {k: v for k, v in args.items() if v not in (None, "") and k != "cursor"}
+        query = f"?{urlencode(args)}" if args else ""
+
+        if self.has_prev:
+            self.prev_url = f"{base_path}/{self.number - 1}{query}"
+        if self.has_next:
+            next_args = dict(args, cursor=self.next_cursor) if self.next_cursor else args
+            self.next_url = f"{base_path}/{self.number + 1}?{urlencode(next_args)}".rstrip("?")
+        return self
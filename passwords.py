@@ -0,0 +1,161 @@
+"""Password hashing off the request threads, and login throttling."""
+
+from concurrent.futures import ProcessPoolExecutor
+import json
+import os
+import threading
+import time
+
+import bcrypt
+
+from cache import backend_from_url
+from metrics import timed
+
+
+class HasherBusy(Exception):
+    """Too many hashes are already queued; the caller should retry later."""
+
+
+def _hash(password, rounds):
+    return bcrypt.hashpw(password, bcrypt.gensalt(rounds)).decode("utf-8")
+
+
+def _check(password, hashed):
+    return bcrypt.checkpw(password, hashed)
+
+
+class PasswordHasher:
+    """bcrypt hashing in a bounded process pool.
+
+    `rounds` is the bcrypt work factor (BCRYPT_LOG_ROUNDS). Hashes run in
+    `workers` processes (PASSWORD_HASH_WORKERS, default one per core) so a
+    signup spike uses every core instead of pinning request threads; with
+    0 workers they run inline. At most `max_pending` hashes may be queued
+    at once; past that `HasherBusy` is raised instead of queueing more.
+    """
+
+    def __init__(self, app=None, rounds=12, workers=None, max_pending=None):
+        self.rounds = rounds
+        self.workers = (os.cpu_count() or 1) if workers is None else workers
+        self.max_pending = max_pending
+        self._pool = None
+        self._pending = None
+        self._lock = threading.Lock()
+
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.rounds = app.config.get("BCRYPT_LOG_ROUNDS", self.rounds)
+        self.workers = app.config.get("PASSWORD_HASH_WORKERS", self.workers)
+
+    def hash(self, password):
+        """bcrypt hash of `password` at the configured cost, as text."""
+
+        return self._run(_hash, password.encode("utf-8"), self.rounds)
+
+    def check(self, hashed, password):
+        """Does `password` match `hashed`?"""
+
+        return self._run(_check, password.encode("utf-8"), hashed.encode("utf-8"))
+
+    def needs_rehash(self, hashed):
+        """Was `hashed` made with a different cost than the configured one?"""
+
+        try:
+            return int(hashed.split("$")[2]) != self.rounds
+        except (IndexError, ValueError):
+            return True
+
+    def _run(self, fn, *args):
+        if not self.workers:
+            with timed("bcrypt"):
+                return fn(*args)
+
+        pending = self._semaphore()
+        if not pending.acquire(blocking=False):
+            raise HasherBusy()
+        try:
+            with timed("bcrypt"):
+                return self._executor().submit(fn, *args).result()
+        finally:
+            pending.release()
+
+    def _semaphore(self):
+        if self._pending is None:
+            with self._lock:
+                if self._pending is None:
+                    self._pending = threading.BoundedSemaphore(
+                        self.max_pending or self.workers * 8
+                    )
+        return self._pending
+
+    def _executor(self):
+        # Created on first use, so a pre-forking server starts one pool per
+        # worker process rather than sharing the master's.
+        if self._pool is None:
+            with self._lock:
+                if self._pool is None:
+                    self._pool = ProcessPoolExecutor(max_workers=self.workers)
+        return self._pool
+
+
+class LoginThrottle:
+    """Refuse login attempts before hashing once a client or account is abusive.
+
+    Tracks, per client address, every attempt in the last `window` seconds
+    and, per username, the failed ones. A key over its limit is refused
+    until its oldest counted attempt leaves the window (LOGIN_MAX_PER_CLIENT
+    raises the per-client limit, e.g. behind a NAT). State lives in a
+    cache backend (LOGIN_THROTTLE_URL: "memory" or "sqlite:///path"), so a
+    SQLite file shares it between workers on one box.
+    """
+
+    def __init__(self, backend=None, window=900, max_per_client=30, max_failures=5):
+        self.backend = backend or backend_from_url("memory")
+        self.window = window
+        self.max_per_client = max_per_client
+        self.max_failures = max_failures
+
+    def retry_after(self, client, username):
+        """Seconds until this attempt would be allowed, or 0 if it is now."""
+
+        return max(
+            self._wait(f"client:{client}", self.max_per_client),
+            self._wait(f"user:{username.lower()}", self.max_failures),
+        )
+
+    def attempted(self, client, username, succeeded):
+        """Record an attempt that got as far as checking the password."""
+
+        self._add(f"client:{client}")
+        if succeeded:
+            self.backend.delete(f"user:{username.lower()}")
+        else:
+            self._add(f"user:{username.lower()}")
+
+    def _recent(self, key):
+        entry = self.backend.get(key)
+        cutoff = time.time() - self.window
+        if entry is None:
+            return []
+        return [t for t in json.loads(entry[0]) if t > cutoff]
+
+    def _wait(self, key, limit):
+        recent = self._recent(key)
+        if len(recent) < limit:
+            return 0
+        return max(0, int(recent[-limit] + self.window - time.time()) + 1)
+
+    def _add(self, key):
+        now = time.time()
+        recent = self._recent(key)[-(self.max_per_client - 1):] + [now]
+        self.backend.set(key, json.dumps(recent).encode(), now, now + self.window)
+
+
+password_hasher = PasswordHasher()
+
+login_throttle = LoginThrottle(
+    backend=backend_from_url(os.environ.get("LOGIN_THROTTLE_URL", "memory")),
+    max_per_client=int(os.environ.get("LOGIN_MAX_PER_CLIENT", 30)),
+)
@@ -0,0 +1,344 @@
+"""Petfinder API access for Pet Adopter."""
+
+from email.utils import parsedate_to_datetime
+import json
+import os
+import random
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from cache import cache_from_env
+from metrics import timed
+from quota import current_priority, priority, quota_from_env, QuotaExhausted
+
+BASE_URL = os.environ.get("PETFINDER_BASE_URL", "https://api.petfinder.com/v2")
+
+TOKEN_REQUEST = {
+    "grant_type": "client_credentials",
+    "client_id": os.environ.get(
+        "PETFINDER_CLIENT_ID", "LCoVVX137txFqzFIgK9dfOLACO3fPyUxgxGkeqG0JcC5pzOzav"
+    ),
+    "client_secret": os.environ.get(
+        "PETFINDER_CLIENT_SECRET", "3IziiMSRjQiLrniOuKOKXi1VPQ8zRd7hqxEU69eh"
+    ),
+}
+
+
+class TokenManager:
+    """Process-wide holder for the Petfinder OAuth token.
+
+    One token is shared by every request in the process. It is refreshed
+    `refresh_margin` seconds before it expires, and only one thread does
+    the refresh while the others wait for its result (single-flight).
+
+    If `shared_path` is given, the token is also written to that file so
+    other workers on the same box can reuse it instead of fetching their own.
+    """
+
+    def __init__(self, token_url=None, credentials=None, refresh_margin=120,
+                 shared_path=None):
+        self.token_url = token_url or f"{BASE_URL}/oauth2/token"
+        self.credentials = credentials or TOKEN_REQUEST
+        self.refresh_margin = refresh_margin
+        self.shared_path = shared_path
+        self.refresh_count = 0
+        self._token = None
+        self._expires_at = 0
+        # Last token the API refused, so it isn't read back from the shared file
+        self._rejected = None
+        self._lock = threading.Lock()
+
+    def get_token(self):
+        """Return a valid token, refreshing it if it is about to expire."""
+
+        if self._is_fresh():
+            return self._token
+
+        with self._lock:
+            # Another thread may have refreshed while we waited for the lock.
+            if self._is_fresh():
+                return self._token
+
+            if not self._load_shared():
+                self._refresh()
+
+            return self._token
+
+    def invalidate(self, token=None):
+        """Drop `token` (default: the current one), e.g. after the API answered 401.
+
+        The next `get_token()` fetches a new token even if the shared file
+        still holds the refused one, and rewrites the file.
+        """
+
+        with self._lock:
+            token = token or self._token
+            self._rejected = token
+            # Another thread may already have replaced it with a good one.
+            if token == self._token:
+                self._token = None
+                self._expires_at = 0
+
+    def _is_fresh(self):
+        return (
+            self._token is not None
+            and time.time() < self._expires_at - self.refresh_margin
+        )
+
+    def _refresh(self):
+        res = requests.post(self.token_url, json=self.credentials, timeout=10)
+        res.raise_for_status()
+        data = res.json()
+
+        self._token = data["access_token"]
+        self._expires_at = time.time() + data.get("expires_in", 3600)
+        self.refresh_count += 1
+        self._store_shared()
+
+    def _load_shared(self):
+        """Adopt a token another worker wrote to the shared file, if still fresh."""
+
+        if not self.shared_path:
+            return False
+
+        try:
+            with open(self.shared_path) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return False
+
+        if data.get("access_token") == self._rejected:
+            return False
+        self._token = data.get("access_token")
+        self._expires_at = data.get("expires_at", 0)
+        return self._is_fresh()
+
+    def _store_shared(self):
+        if not self.shared_path:
+            return
+
+        tmp_path = f"{self.shared_path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, "w") as f:
+                json.dump(
+                    {"access_token": self._token, "expires_at": self._expires_at}, f
+                )
+            os.chmod(tmp_path, 0o600)
+            os.replace(tmp_path, self.shared_path)
+        except OSError:
+            pass
+
+
+class PetfinderError(Exception):
+    """The Petfinder API answered with an error status."""
+
+    def __init__(self, status_code, url):
+        super().__init__(f"Petfinder API returned {status_code} for {url}")
+        self.status_code = status_code
+        self.url = url
+
+
+class ClientStats:
+    """Thread-safe counters for calls made through a PetfinderClient."""
+
+    LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, float("inf"))
+
+    def __init__(self):
+        self.requests = 0
+        self.retries = 0
+        self.errors = 0
+        self.latency_buckets = [0] * len(self.LATENCY_BUCKETS)
+        self.latency_sum = 0.0
+        self._lock = threading.Lock()
+
+    def record(self, elapsed, retries, failed):
+        with self._lock:
+            self.requests += 1
+            self.retries += retries
+            self.errors += int(failed)
+            self.latency_sum += elapsed
+            for i, bound in enumerate(self.LATENCY_BUCKETS):
+                if elapsed <= bound:
+                    self.latency_buckets[i] += 1
+                    break
+
+
+class PetfinderClient:
+    """Pooled, keep-alive HTTP client for the Petfinder API.
+
+    All calls share one `requests.Session`, so TCP and TLS connections are
+    reused between requests. Every call has a connect/read timeout, and
+    429 and 5xx responses are retried a bounded number of times with
+    jittered exponential backoff, honoring `Retry-After` when it is sent.
+
+    Each attempt is first cleared with `quota` (see quota.py), which raises
+    QuotaExhausted instead of letting the call through.
+
+    Interactive calls (a user is waiting) spend at most
+    `interactive_max_wait` seconds in all on waits between attempts. A
+    429 that asks for longer raises QuotaExhausted instead, so listings
+    fall back to the mirror (stale cache entries are served without
+    calling the API at all) and other pages answer 503 with Retry-After.
+    """
+
+    RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+    def __init__(self, base_url=BASE_URL, tokens=None, quota=None, pool_size=10,
+                 connect_timeout=3.05, read_timeout=10, max_retries=3,
+                 backoff=0.5, max_backoff=8, max_concurrency=8, interactive_max_wait=2.0):
+        self.base_url = base_url.rstrip("/")
+        self.tokens = tokens or token_manager
+        self.quota = quota or petfinder_quota
+        self.timeout = (connect_timeout, read_timeout)
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.interactive_max_wait = interactive_max_wait
+        self.stats = ClientStats()
+        # Caps in-flight calls from all threads so fan-outs stay under
+        # Petfinder's rate limit.
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+
+        self.adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session = requests.Session()
+        self.session.mount("https://", self.adapter)
+        self.session.mount("http://", self.adapter)
+
+    def get(self, path, params=None):
+        """GET `path` (e.g. "/animals") and return the decoded JSON body."""
+
+        with timed("petfinder"):
+            res = self.request("GET", path, params=params)
+        if not res.ok:
+            raise PetfinderError(res.status_code, res.url)
+        return res.json()
+
+    def request(self, method, path, params=None, data=None):
+        """Send a request, retrying throttled and failed calls.
+
+        Returns the final `requests.Response`, whatever its status.
+        """
+
+        url = f"{self.base_url}{path}"
+        start = time.perf_counter()
+        attempt = 0
+        refreshed_token = False
+        waited = 0.0
+        max_wait = (
+            self.interactive_max_wait if current_priority() == "interactive" else None
+        )
+
+        while True:
+            token = self.tokens.get_token()
+            headers = {"Authorization": f"Bearer {token}"}
+            self.quota.acquire()
+            try:
+                with self._slots:
+                    res = self.session.request(
+                        method, url, headers=headers, params=params, data=data,
+                        timeout=self.timeout,
+                    )
+            except (requests.ConnectionError, requests.Timeout) as e:
+                if attempt >= self.max_retries:
+                    self.stats.record(time.perf_counter() - start, attempt, True)
+                    raise
+                res, error = None, e
+
+            if res is not None and res.status_code == 401 and not refreshed_token:
+                # Token was revoked or expired early; get a fresh one and retry once
+                self.tokens.invalidate(token)
+                refreshed_token = True
+                continue
+
+            if res is not None and (
+                res.status_code not in self.RETRY_STATUSES
+                or attempt >= self.max_retries
+            ):
+                self.stats.record(time.perf_counter() - start, attempt, not res.ok)
+                return res
+
+            delay = self._retry_delay(attempt, res)
+            if max_wait is not None and waited + delay > max_wait:
+                # Don't hold a user's request (and a worker) for long.
+                self.stats.record(time.perf_counter() - start, attempt, True)
+                if res is None:
+                    raise error
+                if res.status_code == 429:
+                    raise QuotaExhausted("interactive", max(1, int(delay) + 1))
+                return res
+            time.sleep(delay)
+            waited += delay
+            attempt += 1
+
+    def connection_reuse_rate(self):
+        """Fraction of requests that went over an already open connection."""
+
+        opened = sent = 0
+        pools = self.adapter.poolmanager.pools
+        for key in pools.keys():
+            pool = pools.get(key)
+            if pool is not None:
+                opened += pool.num_connections
+                sent += pool.num_requests
+        return 1 - opened / sent if sent else 0.0
+
+    def snapshot(self):
+        """Return the client counters as a plain dict."""
+
+        stats = self.stats
+        quota = self.quota.snapshot()
+        with stats._lock:
+            return {
+                "requests": stats.requests,
+                "retries": stats.retries,
+                "errors": stats.errors,
+                "token_refreshes": self.tokens.refresh_count,
+                "connection_reuse_rate": round(self.connection_reuse_rate(), 4),
+                "quota": quota,
+                "latency_seconds": {
+                    "sum": round(stats.latency_sum, 4),
+                    "buckets": {
+                        str(bound): count
+                        for bound, count in zip(stats.LATENCY_BUCKETS, stats.latency_buckets)
+                    },
+                },
+            }
+
+    def _retry_delay(self, attempt, res):
+        """Seconds to wait before the next attempt."""
+
+        retry_after = res.headers.get("Retry-After") if res is not None else None
+        if retry_after:
+            try:
+                delay = float(retry_after)
+            except ValueError:
+                try:
+                    delay = parsedate_to_datetime(retry_after).timestamp() - time.time()
+                except (TypeError, ValueError):
+                    delay = None
+            if delay is not None:
+                return min(max(delay, 0), self.max_backoff * 4)
+
+        # Full jitter: spread retries from many threads/workers apart.
+        return random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+
+
+token_manager = TokenManager(shared_path=os.environ.get("PETFINDER_TOKEN_FILE"))
+
+petfinder_quota = quota_from_env()
+
+petfinder_client = PetfinderClient(
+    pool_size=int(os.environ.get("PETFINDER_POOL_SIZE", 10)),
+    connect_timeout=float(os.environ.get("PETFINDER_CONNECT_TIMEOUT", 3.05)),
+    read_timeout=float(os.environ.get("PETFINDER_READ_TIMEOUT", 10)),
+    max_retries=int(os.environ.get("PETFINDER_MAX_RETRIES", 3)),
+    max_concurrency=int(os.environ.get("PETFINDER_MAX_CONCURRENCY", 8)),
+    interactive_max_wait=float(os.environ.get("PETFINDER_INTERACTIVE_MAX_WAIT", 2.0)),
+)
+
+petfinder_cache = cache_from_env(
+    petfinder_client.get, background=lambda: priority("background")
+)
@@ -0,0 +1,121 @@
+"""Save counts for animals and organizations, and the "most saved" lists.
+
+Saves bump sharded counters (`record_saves`). The popularity table the
+lists read is rebuilt from them by `rollup()`, which runs from cron
+(`python sync.py popularity`, e.g. every minute), never in a request.
+"""
+
+from datetime import datetime, timedelta
+import os
+import random
+import threading
+import time
+
+from sqlalchemy import func
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from models import db, insert_ignore, LikeCounter, Popularity, SyncCheckpoint
+
+COUNTER_SHARDS = int(os.environ.get("LIKE_COUNTER_SHARDS", 8))
+
+ROLLUP_KEY = "popularity"
+
+
+def record_saves(kind, item_ids, delta):
+    """Add `delta` to the save count of each item, in the caller's transaction.
+
+    `kind` is "animal" or "organization".
+    """
+
+    counters = LikeCounter.__table__
+    postgres = db.session.get_bind().dialect.name == "postgresql"
+
+    for item_id in item_ids:
+        key = {"kind": kind, "item_id": str(item_id), "shard": random.randrange(COUNTER_SHARDS)}
+
+        if postgres:
+            db.session.execute(
+                pg_insert(counters).values(count=delta, **key).on_conflict_do_update(
+                    index_elements=["kind", "item_id", "shard"],
+                    set_={"count": counters.c.count + delta},
+                )
+            )
+            continue
+
+        bump = counters.update().where(
+            (counters.c.kind == key["kind"])
+            & (counters.c.item_id == key["item_id"])
+            & (counters.c.shard == key["shard"])
+        ).values(count=counters.c.count + delta)
+        if not db.session.execute(bump).rowcount:
+            insert_ignore(counters, [dict(key, count=0)])
+            db.session.execute(bump)
+
+
+def rollup(max_age=60):
+    """Rebuild the popularity table from the counter shards.
+
+    Skipped unless the last rollup is older than `max_age` seconds. The
+    claim is a conditional UPDATE of a sync_checkpoints row, so runs that
+    overlap (a slow one and the next cron tick) don't both do the work.
+    """
+
+    now = datetime.utcnow()
+    insert_ignore(
+        SyncCheckpoint.__table__,
+        [{"key": ROLLUP_KEY, "page": 0, "completed_at": datetime(1970, 1, 1)}],
+    )
+    claimed = SyncCheckpoint.query.filter(
+        SyncCheckpoint.key == ROLLUP_KEY,
+        SyncCheckpoint.completed_at < now - timedelta(seconds=max_age),
+    ).update({"completed_at": now}, synchronize_session=False)
+
+    if not claimed:
+        db.session.commit()
+        return False
+
+    totals = db.session.query(
+        LikeCounter.kind, LikeCounter.item_id, func.sum(LikeCounter.count)
+    ).group_by(LikeCounter.kind, LikeCounter.item_id).having(func.sum(LikeCounter.count) > 0)
+
+    Popularity.query.delete(synchronize_session=False)
+    db.session.execute(
+        Popularity.__table__.insert().from_select(
+            ["kind", "item_id", "saves"], totals.statement
+        )
+    )
+    db.session.commit()
+    return True
+
+
+class Leaderboard:
+    """Most saved animals and organizations, cached for `ttl` seconds.
+
+    Counts lag real saves by up to `ttl` seconds plus the time since the
+    last rollup.
+    """
+
+    def __init__(self, ttl=60, size=100):
+        self.ttl = ttl
+        self.size = size
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def top(self, kind, limit=42):
+        """[(item id, saves)] for the most saved items of `kind`, best first."""
+
+        entry = self._entries.get(kind)
+        now = time.time()
+
+        if entry is None or entry[0] < now:
+            rows = db.session.query(Popularity.item_id, Popularity.saves).filter(
+                Popularity.kind == kind
+            ).order_by(Popularity.saves.desc(), Popularity.item_id.desc()).limit(self.size)
+            entry = (now + self.ttl, [tuple(row) for row in rows])
+            with self._lock:
+                self._entries[kind] = entry
+
+        return entry[1][:limit]
+
+
+leaderboard = Leaderboard(ttl=int(os.environ.get("POPULAR_CACHE_TTL", 60)))
@@ -0,0 +1,234 @@
+"""Petfinder request quota: per-second rate limit, daily budget, priorities.
+
+Petfinder allows a fixed number of calls per day and per second. Every
+call the app makes goes through `PetfinderQuota.acquire()`, which takes a
+token from a shared bucket and counts the call against today's budget
+(UTC days).
+
+Calls are made on behalf of one of three priority classes, set with
+`priority()` around the code that makes them:
+
+- "interactive": a user is waiting on the page (the default).
+- "background": cache refreshes and prefetching.
+- "batch": sync.py.
+
+Lower classes stop earlier, so what is left of the day's budget goes to
+pages users are looking at. Once usage passes `degrade_at`, the app
+serves listings from the mirror and cache instead (see `degraded()`).
+"""
+
+from contextlib import contextmanager
+import json
+import os
+import threading
+import time
+
+from cache import SQLiteConnection
+
+# name: (share of the daily budget it may use, seconds it may wait for the
+# per-second limit, share of the burst it must leave for interactive calls)
+PRIORITIES = {
+    "interactive": (1.0, 2.0, 0.0),
+    "background": (0.8, 0.5, 0.25),
+    "batch": (0.6, 30.0, 0.25),
+}
+
+_current = threading.local()
+
+
+@contextmanager
+def priority(name):
+    """Make Petfinder calls on this thread count as priority `name`."""
+
+    if name not in PRIORITIES:
+        raise ValueError(f"Unknown priority: {name}")
+    previous = getattr(_current, "name", None)
+    _current.name = name
+    try:
+        yield
+    finally:
+        _current.name = previous
+
+
+def current_priority():
+    return getattr(_current, "name", None) or "interactive"
+
+
+class MemoryQuotaStore:
+    """Quota state for this process only."""
+
+    def __init__(self):
+        self._state = {}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def transaction(self):
+        with self._lock:
+            yield self._state
+
+    def read(self):
+        with self._lock:
+            return dict(self._state, used_by=dict(self._state.get("used_by", {})))
+
+
+class SQLiteQuotaStore:
+    """Quota state in a SQLite file, shared by every worker on the box."""
+
+    def __init__(self, path):
+        self.path = path
+        self._db = SQLiteConnection(path, "PRAGMA journal_mode=WAL")
+        with self._db.connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS petfinder_quota"
+                " (id INTEGER PRIMARY KEY CHECK (id = 1), state TEXT NOT NULL)"
+            )
+
+    @contextmanager
+    def transaction(self):
+        with self._db.connect() as conn:
+            # Take the write lock up front so two workers can't both spend
+            # the last token.
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = conn.execute("SELECT state FROM petfinder_quota WHERE id = 1").fetchone()
+                state = json.loads(row[0]) if row else {}
+                yield state
+                conn.execute(
+                    "INSERT OR REPLACE INTO petfinder_quota VALUES (1, ?)", (json.dumps(state),)
+                )
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+
+    def read(self):
+        with self._db.connect() as conn:
+            row = conn.execute("SELECT state FROM petfinder_quota WHERE id = 1").fetchone()
+        return json.loads(row[0]) if row else {}
+
+
+def store_from_url(url):
+    """Build a store from a setting like "memory" or "sqlite:////tmp/quota.db"."""
+
+    if not url or url == "memory":
+        return MemoryQuotaStore()
+    if url.startswith("sqlite:///"):
+        return SQLiteQuotaStore(url[len("sqlite:///"):])
+    raise ValueError(f"Unknown quota store: {url}")
+
+
+class QuotaExhausted(Exception):
+    """No call may be made to Petfinder at this priority right now."""
+
+    def __init__(self, priority, retry_after):
+        super().__init__(f"Petfinder quota exhausted for {priority} calls")
+        self.priority = priority
+        self.retry_after = retry_after
+
+
+class PetfinderQuota:
+    """Token bucket plus daily budget, kept in a (possibly shared) store."""
+
+    def __init__(self, store=None, daily_budget=1000, per_second=50, burst=None,
+                 degrade_at=0.9):
+        self.store = store or MemoryQuotaStore()
+        self.daily_budget = daily_budget
+        self.per_second = per_second
+        self.burst = burst or per_second
+        self.degrade_at = degrade_at
+        self.denied = dict.fromkeys(PRIORITIES, 0)
+        self.waited_seconds = 0.0
+
+    def acquire(self, name=None):
+        """Account for one call, waiting briefly for the rate limit if needed.
+
+        Raises QuotaExhausted if the call would take this priority past
+        its share of the day's budget, or would wait too long.
+        """
+
+        name = name or current_priority()
+        share, max_wait, reserve = PRIORITIES[name]
+        limit = int(self.daily_budget * share)
+        floor = 1 + self.burst * reserve
+        deadline = time.time() + max_wait
+
+        while True:
+            now = time.time()
+            with self.store.transaction() as state:
+                self._roll_over(state, now)
+                if state["used"] >= limit:
+                    self.denied[name] += 1
+                    raise QuotaExhausted(name, self._seconds_to_midnight(now))
+
+                tokens = min(
+                    self.burst,
+                    state["tokens"] + (now - state["refilled_at"]) * self.per_second,
+                )
+                state["refilled_at"] = now
+                if tokens >= floor:
+                    state["tokens"] = tokens - 1
+                    state["used"] += 1
+                    state["used_by"][name] = state["used_by"].get(name, 0) + 1
+                    return
+                state["tokens"] = tokens
+
+            wait = (floor - tokens) / self.per_second
+            if now + wait > deadline:
+                self.denied[name] += 1
+                raise QuotaExhausted(name, max(1, int(wait) + 1))
+            self.waited_seconds += wait
+            time.sleep(wait)
+
+    def degraded(self):
+        """Is today's budget nearly spent, so pages should avoid the API?"""
+
+        state = self.store.read()
+        if state.get("day") != self._today(time.time()):
+            return False
+        return state.get("used", 0) >= self.daily_budget * self.degrade_at
+
+    def snapshot(self):
+        """Budget usage as a plain dict, for /status/petfinder."""
+
+        now = time.time()
+        state = self.store.read()
+        if state.get("day") != self._today(now):
+            state = {}
+        used = state.get("used", 0)
+        return {
+            "day": self._today(now),
+            "daily_budget": self.daily_budget,
+            "used": used,
+            "remaining": max(0, self.daily_budget - used),
+            "used_by_priority": state.get("used_by", {}),
+            "degraded": used >= self.daily_budget * self.degrade_at,
+            "resets_in_seconds": self._seconds_to_midnight(now),
+            "denied": dict(self.denied),
+            "rate_limit_wait_seconds": round(self.waited_seconds, 3),
+        }
+
+    def _roll_over(self, state, now):
+        today = self._today(now)
+        if state.get("day") != today:
+            state.update(day=today, used=0, used_by={})
+        state.setdefault("tokens", self.burst)
+        state.setdefault("refilled_at", now)
+
+    @staticmethod
+    def _today(now):
+        return time.strftime("%Y-%m-%d", time.gmtime(now))
+
+    @staticmethod
+    def _seconds_to_midnight(now):
+        return int(86400 - now % 86400) + 1
+
+
+def quota_from_env():
+    """Build the app's quota from PETFINDER_QUOTA_* settings."""
+
+    return PetfinderQuota(
+        store=store_from_url(os.environ.get("PETFINDER_QUOTA_URL", "memory")),
+        daily_budget=int(os.environ.get("PETFINDER_DAILY_BUDGET", 1000)),
+        per_second=float(os.environ.get("PETFINDER_RATE_PER_SECOND", 50)),
+        degrade_at=float(os.environ.get("PETFINDER_DEGRADE_AT", 0.9)),
+    )
@@ -0,0 +1,106 @@
+"""Indexed search over the local animal mirror."""
+
+import base64
+from collections import namedtuple
+from datetime import datetime
+import json
+
+from sqlalchemy import func, tuple_
+
+from models import db, Animal
+
+SearchResult = namedtuple("SearchResult", ["items", "next_cursor"])
+
+
+def encode_cursor(published_at, animal_id):
+    """Opaque keyset cursor for the row sorted just before the next page."""
+
+    raw = json.dumps([published_at.isoformat(), animal_id]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    """Inverse of `encode_cursor`; raises ValueError on a malformed cursor."""
+
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        published_at, animal_id = json.loads(raw)
+        return datetime.fromisoformat(published_at), str(animal_id)
+    except (TypeError, ValueError, UnicodeDecodeError) as e:
+        raise ValueError(f"Bad cursor: {cursor!r}") from e
+
+
+def animal_query(filters):
+    """Query for mirrored animals matching every filter in `filters`.
+
+    Filter values are expected in Petfinder's canonical form ("Dog",
+    "Female", ...), so each one is a plain equality the composite
+    indexes on `animals` can serve. Supported keys: type, gender, breed,
+    color, organization_id, organization_ids (any of), status (default
+    "adoptable"), synced_after (last seen by sync.py since), name
+    (substring) and q (words in the description).
+    """
+
+    query = db.session.query(Animal.published_at, Animal.id, Animal.payload).filter(
+        Animal.payload.isnot(None),
+        Animal.published_at.isnot(None),
+        Animal.status == filters.get("status", "adoptable"),
+    )
+
+    for key in ("type", "gender", "breed", "color", "organization_id"):
+        if filters.get(key):
+            query = query.filter(getattr(Animal, key) == filters[key])
+
+    if filters.get("synced_after"):
+        query = query.filter(Animal.synced_at >= filters["synced_after"])
+
+    if "organization_ids" in filters:
+        query = query.filter(Animal.organization_id.in_(filters["organization_ids"] or [""]))
+
+    if filters.get("name"):
+        query = query.filter(Animal.name.ilike(f"%{filters['name']}%"))
+
+    if filters.get("q"):
+        if db.engine.dialect.name == "postgresql":
+            document = func.to_tsvector("english", func.coalesce(Animal.description, ""))
+            query = query.filter(
+                document.op("@@")(func.plainto_tsquery("english", filters["q"]))
+            )
+        else:
+            query = query.filter(Animal.description.ilike(f"%{filters['q']}%"))
+
+    return query
+
+
+def search_animals(filters, cursor=None, limit=42, offset=0):
+    """Newest-first page of animal payloads matching `filters`.
+
+    Pass the previous page's `next_cursor` to get the following page with
+    a keyset seek instead of an OFFSET scan; `offset` is only used when
+    there is no cursor.
+    """
+
+    query = animal_query(filters).order_by(Animal.published_at.desc(), Animal.id.desc())
+
+    if cursor:
+        published_at, animal_id = decode_cursor(cursor)
+        query = query.filter(
+            tuple_(Animal.published_at, Animal.id) < tuple_(published_at, animal_id)
+        )
+    elif offset:
+        query = query.offset(offset)
+
+    rows = query.limit(limit + 1).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1].published_at, rows[-1].id)
+
+    return SearchResult([json.loads(row.payload) for row in rows], next_cursor)
+
+
+def count_animals(filters):
+    """Number of mirrored animals matching `filters`."""
+
+    return animal_query(filters).with_entities(func.count(Animal.id)).scalar()
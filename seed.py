@@ -1,11 +1,22 @@
 """Seed database with sample data from CSV Files."""
 
 from csv import DictReader
-from app import db
-from models import User, SavedOrgs, Organization, Animal, SavedAnimals
+import os
 
+from flask_migrate import upgrade
 
-db.drop_all()
-db.create_all()
+from app import create_app
+from models import db, User, SavedOrgs, Organization, Animal, SavedAnimals
 
-db.session.commit()
+MIGRATIONS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "migrations")
+
+app = create_app()
+
+with app.app_context():
+    db.drop_all()
+    # drop_all leaves Alembic's bookkeeping behind, which would make
+    # upgrade() think the emptied database is already current.
+    db.engine.execute("DROP TABLE IF EXISTS alembic_version")
+    upgrade(directory=MIGRATIONS)
+
+    db.session.commit()
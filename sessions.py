@@ -0,0 +1,271 @@
+"""Server-side sessions: the cookie holds an opaque id, the data a table.
+
+Flask's default session puts the whole session (user id, CSRF token,
+flashed messages) in a signed cookie that the browser sends with every
+request and that is verified and decoded on every request. Here the
+cookie is just `<id>.<version>`: a random id and a version that changes
+whenever the data does. The data and its version live in the `sessions`
+table, keyed by a hash of the id, and each worker keeps recently used
+sessions in an LRU, so most requests touch neither the table nor any
+crypto. A cookie with a newer version than the cached one makes a worker
+read the row again, so changes made through one worker are seen by all
+of them; a version newer than the row's is refused. Cached sessions are
+read again after SESSION_CACHE_SECONDS, which bounds how long another
+worker can go on serving data the session has since changed (e.g.
+still logged in after a logout).
+
+Sessions expire PERMANENT_SESSION_LIFETIME after they were last saved or
+touched; each worker deletes expired rows every quarter of that.
+
+SESSION_STORE=cookie goes back to Flask's signed cookie.
+"""
+
+from datetime import datetime
+import hashlib
+import re
+import secrets
+import threading
+import time
+
+from flask import request, session
+from flask.json.tag import TaggedJSONSerializer
+from flask.sessions import SecureCookieSession, SessionInterface
+from sqlalchemy.exc import IntegrityError
+
+from cache import MemoryBackend
+from models import db, WebSession
+
+
+def _key(sid):
+    # Only a hash of the id is stored, so the table alone can't be used to
+    # take over sessions.
+    return hashlib.sha256(sid.encode()).hexdigest()
+
+
+# Fixed width, so versions compare the same as strings and as numbers
+VERSION = re.compile(r"[0-9a-f]{16}")
+
+
+def _new_version():
+    return format(int(time.time() * 1000000), "016x")
+
+
+class ServerSession(SecureCookieSession):
+    """Session data plus the id and version it was loaded under."""
+
+    def __init__(self, initial=None, sid=None, version=None, expires_at=None):
+        super().__init__(initial)
+        self.sid = sid
+        self.version = version
+        self.expires_at = expires_at
+        self.previous_sid = None
+
+    def regenerate(self):
+        """Keep the data but move it to a new id."""
+
+        if self.sid is not None and self.previous_sid is None:
+            self.previous_sid = self.sid
+        self.sid = None
+        self.modified = True
+
+
+class SessionStore:
+    """Serialized sessions in the `sessions` table, with an LRU in front.
+
+    The LRU holds one entry per session: its data, version and expiry as
+    last read or written by this worker.
+    """
+
+    def __init__(self, cache_bytes=8 * 1024 * 1024, cache_seconds=30):
+        self.cache = MemoryBackend(cache_bytes)
+        self.cache_seconds = cache_seconds
+        self.table = WebSession.__table__
+        self._next_sweep = 0
+        self._lock = threading.Lock()
+
+    def load(self, key, version):
+        """(data, version, expires_at) for a session, or None if there is none.
+
+        `version` comes from the cookie. One older than the stored version
+        is fine (of two requests that changed the session at once, the
+        browser may keep either cookie) and gets the stored data; a newer
+        or malformed one is refused.
+        """
+
+        if not VERSION.fullmatch(version):
+            return None
+
+        entry = self.cache.get(key)
+        if entry is not None:
+            stored_version, expires_at, data = entry[0].split(" ", 2)
+            if version <= stored_version:
+                return data, stored_version, float(expires_at)
+
+        with db.engine.connect() as conn:
+            row = conn.execute(
+                self.table.select().where(self.table.c.id == key)
+            ).fetchone()
+        if row is None or row.version is None or version > row.version:
+            return None
+        expires_at = _timestamp(row.expires_at)
+        if expires_at <= time.time():
+            return None
+        self._remember(key, row.data, row.version, expires_at)
+        return row.data, row.version, expires_at
+
+    def save(self, key, data, version, expires_at, new=False):
+        """Store a session's data under `version`, unless the row has a newer one."""
+
+        values = dict(data=data, version=version,
+                      expires_at=datetime.utcfromtimestamp(expires_at))
+        updated = 0
+        if not new:
+            with db.engine.begin() as conn:
+                updated = conn.execute(
+                    self.table.update()
+                    .where(self.table.c.id == key)
+                    .where((self.table.c.version < version) | self.table.c.version.is_(None))
+                    .values(**values)
+                ).rowcount
+        if not updated:
+            try:
+                with db.engine.begin() as conn:
+                    conn.execute(self.table.insert().values(id=key, **values))
+            except IntegrityError:
+                # A concurrent request saved a newer version; it stands.
+                self.cache.delete(key)
+                return
+        self._remember(key, data, version, expires_at)
+
+    def touch(self, key, data, version, expires_at):
+        """Push back a session's expiry without changing its data."""
+
+        with db.engine.begin() as conn:
+            conn.execute(
+                self.table.update().where(self.table.c.id == key)
+                .values(expires_at=datetime.utcfromtimestamp(expires_at))
+            )
+        self._remember(key, data, version, expires_at)
+
+    def delete(self, key):
+        with db.engine.begin() as conn:
+            conn.execute(self.table.delete().where(self.table.c.id == key))
+        self.cache.delete(key)
+
+    def _remember(self, key, data, version, expires_at):
+        now = time.time()
+        self.cache.set(
+            key, f"{version} {expires_at!r} {data}", now,
+            min(expires_at, now + self.cache_seconds),
+        )
+
+    def sweep(self):
+        """Delete expired sessions; returns how many there were."""
+
+        with db.engine.begin() as conn:
+            return conn.execute(
+                self.table.delete().where(self.table.c.expires_at < datetime.utcnow())
+            ).rowcount
+
+    def maybe_sweep(self, interval):
+        now = time.time()
+        with self._lock:
+            if now < self._next_sweep:
+                return
+            self._next_sweep = now + interval
+        self.sweep()
+
+
+def _timestamp(naive_utc):
+    return (naive_utc - datetime(1970, 1, 1)).total_seconds()
+
+
+class ServerSessionInterface(SessionInterface):
+    """Flask session interface on top of a SessionStore."""
+
+    serializer = TaggedJSONSerializer()
+    session_class = ServerSession
+
+    def __init__(self, store):
+        self.store = store
+
+    def open_session(self, app, request):
+        sid, _, version = request.cookies.get(app.session_cookie_name, "").partition(".")
+        if sid and version:
+            entry = self.store.load(_key(sid), version)
+            if entry is not None:
+                data, version, expires_at = entry
+                return self.session_class(
+                    self.serializer.loads(data), sid, version, expires_at
+                )
+        return self.session_class()
+
+    def save_session(self, app, session, response):
+        name = app.session_cookie_name
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+        lifetime = app.permanent_session_lifetime.total_seconds()
+
+        if session.previous_sid is not None:
+            self.store.delete(_key(session.previous_sid))
+
+        if not session:
+            if session.sid is not None:
+                self.store.delete(_key(session.sid))
+            if name in request.cookies:
+                response.delete_cookie(name, domain=domain, path=path)
+            return
+
+        if session.accessed:
+            response.vary.add("Cookie")
+
+        now = time.time()
+        if session.sid is None or session.modified:
+            new = session.sid is None
+            if new:
+                session.sid = secrets.token_urlsafe(24)
+            session.version = _new_version()
+            session.expires_at = now + lifetime
+            self.store.save(
+                _key(session.sid), self.serializer.dumps(dict(session)), session.version,
+                session.expires_at, new,
+            )
+            response.set_cookie(
+                name,
+                f"{session.sid}.{session.version}",
+                expires=self.get_expiration_time(app, session),
+                httponly=self.get_cookie_httponly(app),
+                domain=domain,
+                path=path,
+                secure=self.get_cookie_secure(app),
+                samesite=app.config.get("SESSION_COOKIE_SAMESITE"),
+            )
+        elif session.expires_at - now < lifetime / 2:
+            # Active sessions stay alive, at one write per half lifetime.
+            session.expires_at = now + lifetime
+            self.store.touch(
+                _key(session.sid), self.serializer.dumps(dict(session)), session.version,
+                session.expires_at,
+            )
+
+        self.store.maybe_sweep(lifetime / 4)
+
+
+def regenerate():
+    """Give the current session a new id, keeping its data.
+
+    Call when a user logs in, so an id planted in their browser beforehand
+    (session fixation) is not the one that ends up logged in.
+    """
+
+    move = getattr(session, "regenerate", None)
+    if move is not None:
+        move()
+
+
+def init_app(app):
+    if app.config.get("SESSION_STORE", "sql") == "sql":
+        app.session_interface = ServerSessionInterface(SessionStore(
+            app.config.get("SESSION_CACHE_MAX_BYTES", 8 * 1024 * 1024),
+            app.config.get("SESSION_CACHE_SECONDS", 30),
+        ))
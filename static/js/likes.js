@@ -0,0 +1,28 @@
+// Save/unsave without reloading the page: post the heart form with fetch
+// and flip the button colour to whatever the server says the state is now.
+document.addEventListener("submit", async function (evt) {
+  const form = evt.target;
+  if (!form.classList.contains("like-form")) return;
+  evt.preventDefault();
+
+  const button = form.querySelector("button");
+  button.disabled = true;
+  try {
+    const resp = await fetch(form.action, {
+      method: "POST",
+      headers: { Accept: "application/json" },
+      credentials: "same-origin",
+    });
+    if (resp.status === 401) {
+      window.location = "/login";
+      return;
+    }
+    if (!resp.ok) return;
+
+    const { saved } = await resp.json();
+    button.classList.toggle("btn-danger", saved);
+    button.classList.toggle("btn-secondary", !saved);
+  } finally {
+    button.disabled = false;
+  }
+});
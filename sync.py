@@ -0,0 +1,159 @@
+"""Mirror Petfinder animals and organizations into the local database.
+
+The tables come from the migrations, so run `flask db upgrade` first.
+Meant to be run from cron, e.g.:
+
+    python sync.py animals --location TX --location CA
+    python sync.py organizations --location TX
+    python sync.py animals --location TX --full
+
+`python sync.py popularity` (no Petfinder calls; every minute or so)
+rebuilds the table behind the "most saved" lists from the save counters.
+
+Animals are pulled incrementally: each run only asks for animals
+published after the newest one seen by the previous run (`after` with
+`sort=recent`). That never revisits animals already mirrored, so once
+every `--refresh-hours` (SYNC_REFRESH_HOURS, default 24) a run walks all
+pages instead. Every animal still adoptable gets its status and
+`synced_at` updated; mirrored listings leave out animals that no walk has
+seen for MIRROR_MAX_AGE_HOURS, i.e. ones adopted or removed since.
+
+Progress is checkpointed after every page, so a run that dies part way
+resumes at the next page. Runs count as "batch" calls against the
+Petfinder quota and stop once that share is used up.
+"""
+
+import argparse
+from datetime import datetime, timedelta
+import os
+
+from app import create_app
+from mirror import upsert, animal_columns, org_columns, parse_time
+from models import db, Animal, Organization, SyncCheckpoint
+from petfinder import petfinder_client
+from popularity import rollup
+from quota import QuotaExhausted, priority
+
+PAGE_SIZE = 100
+
+
+def sync(kind, location, full=False, max_pages=None, refresh_after=timedelta(hours=24)):
+    """Pull one region; returns the number of records stored.
+
+    An animals run that isn't resuming walks every page (like `full`) if
+    the last such walk finished more than `refresh_after` ago.
+    """
+
+    key = f"{kind}:{location}"
+    checkpoint = SyncCheckpoint.query.get(key)
+    if checkpoint is None:
+        checkpoint = SyncCheckpoint(key=key, page=0)
+        db.session.add(checkpoint)
+
+    if kind == "animals" and checkpoint.page == 0 and refresh_after and (
+        checkpoint.refreshed_at is None
+        or checkpoint.refreshed_at < datetime.utcnow() - refresh_after
+    ):
+        full = True
+
+    if full:
+        checkpoint.high_water = checkpoint.run_high_water = None
+        checkpoint.page = 0
+
+    params = {"location": location, "limit": PAGE_SIZE}
+    if kind == "animals":
+        model, to_columns = Animal, animal_columns
+        params["sort"] = "recent"
+        if checkpoint.high_water:
+            params["after"] = checkpoint.high_water.strftime("%Y-%m-%dT%H:%M:%S+00:00")
+    else:
+        # Organizations have no publish date to sync from, so every run
+        # walks all pages.
+        model, to_columns = Organization, org_columns
+        params["sort"] = "name"
+
+    stored = pages = 0
+    page = checkpoint.page + 1
+
+    while True:
+        params["page"] = page
+        data = petfinder_client.get(f"/{kind}", params=params)
+        records = data[kind]
+
+        upsert(model, records, to_columns)
+        stored += len(records)
+
+        for record in records:
+            published = parse_time(record.get("published_at"))
+            if published and (
+                checkpoint.run_high_water is None or published > checkpoint.run_high_water
+            ):
+                checkpoint.run_high_water = published
+
+        checkpoint.page = page
+        db.session.commit()
+        pages += 1
+
+        if not records or page >= data["pagination"]["total_pages"]:
+            break
+        if max_pages and pages >= max_pages:
+            # Stop here; the next run picks up at the following page.
+            return stored
+        page += 1
+
+    if checkpoint.high_water is None:
+        # No `after` filter: this run (or the runs it resumed) saw every page.
+        checkpoint.refreshed_at = datetime.utcnow()
+    checkpoint.high_water = checkpoint.run_high_water or checkpoint.high_water
+    checkpoint.run_high_water = None
+    checkpoint.page = 0
+    checkpoint.completed_at = datetime.utcnow()
+    db.session.commit()
+    return stored
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("kind", choices=["animals", "organizations", "popularity"])
+    parser.add_argument(
+        "--location", action="append",
+        help="state, city or ZIP to mirror; repeatable (default: $SYNC_LOCATIONS)",
+    )
+    parser.add_argument("--full", action="store_true", help="ignore the checkpoint")
+    parser.add_argument("--max-pages", type=int, help="stop after this many pages")
+    parser.add_argument(
+        "--refresh-hours", type=float,
+        default=float(os.environ.get("SYNC_REFRESH_HOURS", 24)),
+        help="walk every page if the last full walk is older than this; 0 never does",
+    )
+    args = parser.parse_args()
+
+    if args.kind == "popularity":
+        with create_app().app_context():
+            # Cron decides how often this runs
+            rollup(max_age=0)
+        print("popularity: rolled up")
+        return
+
+    locations = args.location or os.environ.get("SYNC_LOCATIONS", "").split(",")
+    locations = [location.strip() for location in locations if location.strip()]
+    if not locations:
+        parser.error("give at least one --location or set SYNC_LOCATIONS")
+
+    with create_app().app_context(), priority("batch"):
+        for location in locations:
+            try:
+                stored = sync(
+                    args.kind, location, full=args.full, max_pages=args.max_pages,
+                    refresh_after=timedelta(hours=args.refresh_hours),
+                )
+            except QuotaExhausted:
+                # The checkpoint keeps our place; the next run resumes there.
+                db.session.rollback()
+                print(f"{args.kind} {location}: stopped, batch share of the Petfinder quota is used up")
+                break
+            print(f"{args.kind} {location}: {stored} records")
+
+
+if __name__ == "__main__":
+    main()
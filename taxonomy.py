@@ -0,0 +1,131 @@
+"""Petfinder animal types, breeds, colors and coats, served from memory."""
+
+from datetime import datetime, timedelta
+import json
+import threading
+
+from hydrate import fetch_pool
+from metrics import timed
+from models import db, PetType
+from petfinder import petfinder_client
+from quota import current_priority, priority
+
+
+class Taxonomy:
+    """The Petfinder type taxonomy, loaded once and kept in memory.
+
+    On first use the types are read from the `pet_types` table, or fetched
+    from `/types` and `/types/{type}/breeds` when the table is empty. Once
+    the stored copy is older than `refresh_interval`, it keeps being served
+    while a background thread fetches and stores a new one.
+    """
+
+    def __init__(self, app=None, client=None, refresh_interval=timedelta(days=7)):
+        self.client = client or petfinder_client
+        self.refresh_interval = refresh_interval
+        self.app = None
+        self._types = None
+        self._fetched_at = None
+        self._lock = threading.Lock()
+        self._refreshing = False
+
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+
+    def types(self):
+        """List of type dicts: name, coats, colors, genders and breeds."""
+
+        if self._types is None:
+            with self._lock:
+                if self._types is None:
+                    self._load()
+        elif datetime.utcnow() - self._fetched_at > self.refresh_interval:
+            self._refresh_in_background()
+
+        return self._types
+
+    def get(self, type_name):
+        """The type dict named `type_name` (case-insensitive), or None."""
+
+        if not type_name:
+            return None
+        for pet_type in self.types():
+            if pet_type["name"].lower() == type_name.lower():
+                return pet_type
+        return None
+
+    def _load(self):
+        rows = PetType.query.order_by(PetType.position).all()
+
+        if rows:
+            self._types = [json.loads(row.data) for row in rows]
+            self._fetched_at = min(row.fetched_at for row in rows)
+        else:
+            self._store(self._fetch())
+
+    def _fetch(self):
+        types = self.client.get("/types")["types"]
+        # The breed lists are independent, so fetch them all at once rather
+        # than one round trip per type.
+        level = current_priority()
+
+        def fetch_breeds(pet_type):
+            breeds_path = pet_type.get("_links", {}).get("breeds", {}).get("href")
+            if breeds_path:
+                breeds_path = breeds_path[breeds_path.index("/types"):]
+            else:
+                breeds_path = f"/types/{pet_type['name'].lower()}/breeds"
+
+            with priority(level):
+                return self.client.get(breeds_path)["breeds"]
+
+        with timed("petfinder", count=len(types)):
+            all_breeds = list(fetch_pool.map(fetch_breeds, types))
+
+        for pet_type, breeds in zip(types, all_breeds):
+            pet_type["breeds"] = [breed["name"] for breed in breeds]
+            pet_type.pop("_links", None)
+
+        return types
+
+    def _store(self, types):
+        now = datetime.utcnow()
+
+        PetType.query.delete()
+        for position, pet_type in enumerate(types):
+            db.session.add(PetType(
+                name=pet_type["name"],
+                position=position,
+                data=json.dumps(pet_type),
+                fetched_at=now,
+            ))
+        db.session.commit()
+
+        self._types = types
+        self._fetched_at = now
+
+    def _refresh_in_background(self):
+        with self._lock:
+            if self._refreshing or self.app is None:
+                return
+            self._refreshing = True
+
+        def refresh():
+            try:
+                with priority("background"):
+                    types = self._fetch()
+                with self.app.app_context():
+                    self._store(types)
+            except Exception:
+                # Keep the stored copy and try again on a later request.
+                self._fetched_at = datetime.utcnow() - self.refresh_interval + timedelta(hours=1)
+            finally:
+                self._refreshing = False
+
+        threading.Thread(target=refresh, name="taxonomy-refresh", daemon=True).start()
+
+
+taxonomy = Taxonomy()